@@ -0,0 +1,72 @@
+#!/Users/jayhack/anaconda/bin/python
+import sys
+import argparse
+from timeit import default_timer
+import numpy as np
+from DBZHost import GestureClassifier
+from DBZHost.GestureIndex import GestureIndex
+from DBZHost.CompiledClassifier import compile_estimator
+
+SIZES = [1000, 10000, 100000]
+NUM_FEATURES = 54
+
+
+def time_learn(classifier, batch, calls):
+	"""
+		returns the mean milliseconds classifier.learn takes to add batch
+		random poses to its index, once the first call has made the
+		partial_fit buffers
+	"""
+	classifier.SNAPSHOT_INTERVAL = float('inf')
+	rng = np.random.RandomState(0)
+	classifier.learn(rng.normal(size=(batch, NUM_FEATURES)), rng.randint(0, 4, batch))
+	start = default_timer()
+	for i in range(calls):
+		classifier.learn(rng.normal(size=(batch, NUM_FEATURES)), rng.randint(0, 4, batch))
+	return (default_timer() - start) / calls * 1000.
+
+
+def make_classifier(size, compiled):
+	"""
+		returns a GestureClassifier whose live model is an index of size
+		random references
+	"""
+	rng = np.random.RandomState(1)
+	index = GestureIndex(n_neighbors=2).fit(rng.normal(size=(size, NUM_FEATURES)), rng.randint(0, 3, size))
+	classifier = GestureClassifier(data_dir='/nonexistent')
+	classifier.classifier = compile_estimator(index) if compiled else index
+	classifier.classifier_loaded = True
+	return classifier
+
+
+
+if __name__ == '__main__':
+
+	#==========[ ARGPARSING	]==========
+	parser = argparse.ArgumentParser()
+	parser.add_argument(	'-b', '--batch',
+							metavar='B', type=int, dest='batch', required=False,
+							default=10, help='poses added per learn() call',
+							action='store')
+	parser.add_argument(	'-n', '--calls',
+							metavar='N', type=int, dest='calls', required=False,
+							default=200, help='learn() calls timed per index size',
+							action='store')
+	parser.add_argument(	'--max_growth',
+							metavar='X', type=float, dest='max_growth', required=False,
+							default=3., help='fail if learn() gets this many times slower from the smallest index to the largest',
+							action='store')
+	args = parser.parse_args ()
+
+	#=====[ learn() must cost O(new samples), whatever the size of the index	]=====
+	failed = False
+	print '%-12s %10s %14s' % ('model', 'references', 'learn (ms)')
+	for compiled in (False, True):
+		name = 'compiled' if compiled else 'index'
+		timings = [time_learn(make_classifier(size, compiled), args.batch, args.calls) for size in SIZES]
+		for size, ms in zip(SIZES, timings):
+			print '%-12s %10d %14.3f' % (name, size, ms)
+		if timings[-1] > args.max_growth * timings[0]:
+			print 'FAIL: %s learn() grew %.1fx from %d to %d references' % (name, timings[-1] / timings[0], SIZES[0], SIZES[-1])
+			failed = True
+	sys.exit(1 if failed else 0)
@@ -0,0 +1,247 @@
+#!/Users/jayhack/anaconda/bin/python
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from timeit import default_timer
+from collections import defaultdict
+import numpy as np
+from DBZHost import DBZController, Skeleton
+from DBZHost.Skeleton import JOINT_NAMES, COORD_NAMES, ORIENTATION_NAMES
+from DBZHost.Recording import load_video
+from DBZHost.ReplayReceiver import ReplayReceiver
+from DBZHost.DeviceReceiver import DeviceReceiver
+from DBZHost import WireFormat
+from DBZHost.StateFormat import PlayerState, StateEncoder
+
+#=====[ track: SkeletonTracker.update, i.e. assigning skeletons to players and transforming them	]=====
+STAGES = ['receive_decode', 'update_skeletons', 'track', 'classify', 'predict', 'send_state', 'frame']
+PERCENTILES = [50, 95, 99]
+NONE_SUBSTITUTE = '1.17549435e-38'
+
+
+class SinkSocket:
+	"""
+		stands in for StateBroadcaster and CommunicationHost: serializes
+		every message like they would (for clients that want encoding),
+		then throws it away
+	"""
+	encoding = 'json'
+
+	def __init__(self, *args, **kwargs):
+		self.num_messages = 0
+		self.num_bytes = 0
+		self.encoders = defaultdict(StateEncoder)
+
+	def send(self, topic, msg):
+		self.num_messages += 1
+		if self.encoding == 'compact' and isinstance(msg, PlayerState):
+			self.num_bytes += len(self.encoders[topic].encode(msg))
+		else:
+			self.num_bytes += len(json.dumps(msg.to_message() if isinstance(msg, PlayerState) else msg))
+		return 1
+
+	def send_frame(self, frame):
+		return self.send(None, frame)
+
+	def publish_frame(self, seq, timestamp, skeletons, players):
+		self.num_messages += 1 + len(players)
+
+	def has_subscribers(self, topic):
+		return False
+
+	def poll(self, timeout=0):
+		pass
+
+	def close(self):
+		pass
+
+
+
+################################################################################
+####################[ WIRE ENCODING ]###########################################
+################################################################################
+
+def wire_value(value):
+	return NONE_SUBSTITUTE if value is None or value != value else str(value)
+
+
+def encode_json(frame):
+	"""
+		raw frame -> message body as primesense_receiver sends it in json mode
+	"""
+	message = {}
+	for s_name, s_frame in frame.items():
+		skeleton = s_frame if isinstance(s_frame, Skeleton) else Skeleton.from_dict(s_frame, s_name)
+		message[s_name] = {}
+		for ix, joint_name in enumerate(JOINT_NAMES):
+			orientation = [np.nan] * 4 if skeleton.orientations is None else skeleton.orientations[ix].tolist()
+			message[s_name]['JOINT_' + joint_name.upper()] = {
+				'REAL_WORLD_POSITION':{c:wire_value(v) for c, v in zip(COORD_NAMES, skeleton.positions[ix].tolist())},
+				'ORIENTATION':{c:wire_value(v) for c, v in zip(ORIENTATION_NAMES, orientation)}
+			}
+	return json.dumps(message)
+
+
+def encode_binary(frame):
+	"""
+		raw frame -> message body as primesense_receiver sends it with --binary
+	"""
+	skeletons = [s_frame if isinstance(s_frame, Skeleton) else Skeleton.from_dict(s_frame, s_name) for s_name, s_frame in sorted(frame.items())]
+	return WireFormat.encode_frame(skeletons)
+
+
+WIRES = {
+			'raw':(None, None),
+			'json':(encode_json, lambda message: DeviceReceiver.format_frame_primesense(json.loads(message))),
+			'binary':(encode_binary, lambda message: WireFormat.decode_frame(message)[1])
+		}
+
+
+
+################################################################################
+####################[ TIMING ]##################################################
+################################################################################
+
+def timed(timings, stage, function):
+	"""
+		wraps function so that every call's duration is appended to timings[stage]
+	"""
+	def wrapper(*args, **kwargs):
+		start = default_timer()
+		result = function(*args, **kwargs)
+		timings[stage].append(default_timer() - start)
+		return result
+	return wrapper
+
+
+def summarize(durations, warmup):
+	"""
+		durations (seconds) -> {count, mean, p50, p95, p99, max} in milliseconds
+	"""
+	durations = np.array(durations[warmup:]) * 1000.
+	if len(durations) == 0:
+		return {'count':0}
+	summary = {'count':len(durations), 'mean':durations.mean(), 'max':durations.max()}
+	for p, value in zip(PERCENTILES, np.percentile(durations, PERCENTILES)):
+		summary['p%d' % p] = value
+	return summary
+
+
+def benchmark(video_path, num_players, wire, loops, warmup):
+	"""
+		replays video_path through DBZController.update_game as fast as
+		possible, loops times over; returns its results
+	"""
+	#=====[ Step 1: frames as they come off the wire	]=====
+	video = load_video(video_path)
+	encode, decode = WIRES[wire]
+	frames = video if encode is None else [encode(frame) for frame in video]
+
+	#=====[ Step 2: controller with every stage timed	]=====
+	timings = defaultdict(list)
+	receiver = ReplayReceiver(frames, pacing='max_speed', loop=loops > 1, end_frame=len(frames), decode=decode)
+	receiver.get_record = timed(timings, 'receive_decode', receiver.get_record)
+	controller = DBZController(num_players=num_players, receiver=receiver, data_dir='../data')
+	controller.update_skeletons = timed(timings, 'update_skeletons', controller.update_skeletons)
+	controller.update_gestures = timed(timings, 'classify', controller.update_gestures)
+	classifier = controller.gesture_classifier
+	classifier.predict_batch = timed(timings, 'predict', classifier.predict_batch)
+	controller.skeleton_tracker.update = timed(timings, 'track', controller.skeleton_tracker.update)
+	for player in controller.players:
+		player.send_state = timed(timings, 'send_state', player.send_state)
+	timings.clear()
+
+	#=====[ Step 3: replay	]=====
+	num_frames = loops * len(frames) - receiver.num_received
+	start = time.time()
+	for i in range(num_frames):
+		frame_start = default_timer()
+		controller.update_game(realtime=True)
+		timings['frame'].append(default_timer() - frame_start)
+	elapsed = time.time() - start
+
+	return {
+				'video':video_path,
+				'num_players':num_players,
+				'frames':num_frames,
+				'seconds':elapsed,
+				'fps':num_frames / elapsed,
+				'bytes_sent':controller.broadcaster.num_bytes,
+				'stages':{stage:summarize(timings[stage], warmup) for stage in STAGES}
+			}
+
+
+def git_revision():
+	try:
+		return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=open(os.devnull, 'w')).strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+
+
+if __name__ == '__main__':
+
+	#==========[ ARGPARSING	]==========
+	parser = argparse.ArgumentParser()
+	parser.add_argument(	'videos',
+							metavar='V', type=str, nargs='*',
+							default=['../data/jay_alone.vid:1', '../data/twoplayer_test_1.pkl:2'],
+							help='recordings to replay, as path:num_players')
+	parser.add_argument(	'-w', '--wire',
+							metavar='W', type=str, dest='wire', required=False,
+							default='json', choices=sorted(WIRES.keys()), help='wire format frames are decoded from',
+							action='store')
+	parser.add_argument(	'-e', '--encoding',
+							metavar='E', type=str, dest='encoding', required=False,
+							default='json', choices=['json', 'compact'], help='encoding player states are sent in',
+							action='store')
+	parser.add_argument(	'-l', '--loops',
+							metavar='L', type=int, dest='loops', required=False,
+							default=3, help='number of times to replay each recording',
+							action='store')
+	parser.add_argument(	'--warmup',
+							metavar='N', type=int, dest='warmup', required=False,
+							default=10, help='calls of each stage to leave out of the stats',
+							action='store')
+	parser.add_argument(	'-o', '--output',
+							metavar='O', type=str, dest='output', required=False,
+							default=None, help='write results here as json',
+							action='store')
+	args = parser.parse_args ()
+
+	#=====[ sockets go to a local sink, per-frame prints to /dev/null	]=====
+	sys.modules['DBZHost.DBZController'].StateBroadcaster = SinkSocket
+	sys.modules['DBZHost.DBZController'].CommunicationHost = SinkSocket
+	SinkSocket.encoding = args.encoding
+	results = {'time':time.time(), 'revision':git_revision(), 'wire':args.wire, 'encoding':args.encoding, 'loops':args.loops, 'runs':[]}
+	failed = False
+	for video in args.videos:
+		video_path, num_players = video.rsplit(':', 1)
+		stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+		try:
+			run = benchmark(video_path, int(num_players), args.wire, args.loops, args.warmup)
+		finally:
+			sys.stdout = stdout
+		results['runs'].append(run)
+
+		#=====[ report	]=====
+		print '===[ %s: %d frames, %.1f fps, %.0f bytes sent/frame ]===' % (video_path, run['frames'], run['fps'], run['bytes_sent'] / float(max(run['frames'], 1)))
+		print '%-18s %8s %8s %8s %8s %8s' % ('stage (ms)', 'count', 'p50', 'p95', 'p99', 'max')
+		for stage in STAGES:
+			s = run['stages'][stage]
+			if s['count'] > 0:
+				print '%-18s %8d %8.3f %8.3f %8.3f %8.3f' % (stage, s['count'], s['p50'], s['p95'], s['p99'], s['max'])
+
+		#=====[ a stage nothing timed means its hook no longer sits on the frame's path	]=====
+		missing = [stage for stage in STAGES if run['stages'][stage]['count'] == 0]
+		if len(missing) > 0:
+			print 'FAIL: no samples for %s' % ', '.join(missing)
+			failed = True
+
+	if not args.output is None:
+		json.dump(results, open(args.output, 'w'), indent=4)
+		print "[[ SAVED: %s ]]" % args.output
+	sys.exit(1 if failed else 0)
@@ -0,0 +1,95 @@
+#!/Users/jayhack/anaconda/bin/python
+import sys
+import json
+import argparse
+import subprocess
+import numpy as np
+
+#=====[ modules only evaluation/plotting should need; playing must not load them	]=====
+HEAVY_MODULES = ['matplotlib', 'matplotlib.pyplot', 'sklearn', 'pandas']
+
+#=====[ runs in a fresh interpreter: times the import (and the controller), prints json	]=====
+CHILD = """
+import sys
+import json
+from timeit import default_timer
+start = default_timer()
+from DBZHost import DBZController
+imported = default_timer()
+video, data_dir, num_players = sys.argv[1:4]
+if video:
+	from DBZHost.Recording import load_video
+	from DBZHost.ReplayReceiver import ReplayReceiver
+	controller = DBZController(num_players=int(num_players), receiver=ReplayReceiver(load_video(video)), data_dir=data_dir, debug=True)
+	controller.broadcaster.close()
+	controller.communication_host.close()
+ready = default_timer()
+print json.dumps({'import':imported - start, 'controller':ready - imported, 'modules':sorted(sys.modules.keys())})
+"""
+
+
+def run_child(video, data_dir, num_players):
+	"""
+		returns the results of CHILD, run once in a new interpreter
+	"""
+	output = subprocess.check_output([sys.executable, '-c', CHILD, video or '', data_dir, str(num_players)])
+	return json.loads(output.strip().splitlines()[-1])
+
+
+def benchmark(runs, video, data_dir, num_players):
+	"""
+		cold-starts runs interpreters; returns their timings (ms) and the
+		heavy modules any of them loaded
+	"""
+	results = [run_child(video, data_dir, num_players) for i in range(runs)]
+	timings = {stage:np.array([r[stage] for r in results]) * 1000. for stage in ('import', 'controller')}
+	timings['total'] = timings['import'] + timings['controller']
+	loaded = sorted(set(m for r in results for m in r['modules'] if m in HEAVY_MODULES))
+	return timings, loaded, len(results[-1]['modules'])
+
+
+
+if __name__ == '__main__':
+
+	#==========[ ARGPARSING	]==========
+	parser = argparse.ArgumentParser()
+	parser.add_argument(	'-n', '--runs',
+							metavar='N', type=int, dest='runs', required=False,
+							default=5, help='number of cold starts to time',
+							action='store')
+	parser.add_argument(	'-v', '--video',
+							metavar='V', type=str, dest='video', required=False,
+							default=None, help='also build a DBZController replaying this recording',
+							action='store')
+	parser.add_argument(	'-d', '--data_dir',
+							metavar='D', type=str, dest='data_dir', required=False,
+							default='../data', help='data directory, for the classifier',
+							action='store')
+	parser.add_argument(	'-p', '--num_players',
+							metavar='P', type=int, dest='num_players', required=False,
+							default=1, help='players the controller is built with',
+							action='store')
+	parser.add_argument(	'--max_ms',
+							metavar='MS', type=float, dest='max_ms', required=False,
+							default=None, help='fail if the median total startup takes longer than this',
+							action='store')
+	args = parser.parse_args ()
+
+	timings, loaded, num_modules = benchmark(args.runs, args.video, args.data_dir, args.num_players)
+
+	#=====[ report	]=====
+	print '===[ startup: %d cold starts, %d modules loaded ]===' % (args.runs, num_modules)
+	print '%-12s %8s %8s %8s' % ('stage (ms)', 'min', 'median', 'max')
+	for stage in ('import', 'controller', 'total'):
+		t = timings[stage]
+		print '%-12s %8.1f %8.1f %8.1f' % (stage, t.min(), np.median(t), t.max())
+
+	#=====[ regressions	]=====
+	failed = False
+	if len(loaded) > 0:
+		print 'FAIL: startup loaded %s' % ', '.join(loaded)
+		failed = True
+	if not args.max_ms is None and np.median(timings['total']) > args.max_ms:
+		print 'FAIL: median startup %.1f ms > %.1f ms' % (np.median(timings['total']), args.max_ms)
+		failed = True
+	sys.exit(1 if failed else 0)
@@ -0,0 +1,55 @@
+#!/Users/jayhack/anaconda/bin/python
+import sys
+import pickle
+import argparse
+import numpy as np
+from DBZHost import GestureClassifier
+from DBZHost.CompiledClassifier import CompiledClassifier, compile_estimator, check_parity, LATENCY_TARGET_MS
+
+if __name__ == '__main__':
+
+	#==========[ ARGPARSING	]==========
+	parser = argparse.ArgumentParser()
+	parser.add_argument(	'-c', '--classifier_name',
+							metavar='C', type=str, dest='classifier_name', required=False,
+							default='clf.pkl', help='pickled classifier to check the export of',
+							action='store')
+	parser.add_argument(	'-d', '--data_dir',
+							metavar='D', type=str, dest='data_dir', required=False,
+							default='../data/', help='data directory (classifiers and gesture dataset)',
+							action='store')
+	parser.add_argument(	'--noise',
+							metavar='MM', type=float, dest='noise', required=False,
+							default=20., help='also check poses jittered by this much (mm)',
+							action='store')
+	args = parser.parse_args ()
+
+	#=====[ Step 1: the original estimator and its export (compiled now if it was never exported)	]=====
+	classifier = GestureClassifier(data_dir=args.data_dir, classifier_name=args.classifier_name)
+	original = pickle.load(open(classifier.classifier_path, 'r'))
+	try:
+		compiled = CompiledClassifier.load(classifier.compiled_path)
+		print '[[ LOADED: %s ]]' % classifier.compiled_path
+	except IOError:
+		compiled = compile_estimator(original)
+		print '[[ NOT EXPORTED: compiled %s in memory ]]' % type(original).__name__
+
+	#=====[ Step 2: parity on the dataset, as is and jittered	]=====
+	classifier.load_data()
+	X = np.asarray(classifier.X, dtype=np.float64)
+	jittered = X + np.random.RandomState(0).normal(0, args.noise, X.shape)
+	failed = False
+	for name, X_check in (('dataset', X), ('jittered', jittered)):
+		result = check_parity(original, compiled, X_check)
+		print '===[ %s: %d poses ]===' % (name, len(X_check))
+		print 'label agreement:     %.4f' % result['agreement']
+		print 'max proba diff:      %.2e' % result['max_proba_diff']
+		print 'original p50/p95 ms: %.3f / %.3f' % tuple(result['original_ms'])
+		print 'compiled p50/p95 ms: %.3f / %.3f (target %.3f)' % (tuple(result['compiled_ms']) + (LATENCY_TARGET_MS,))
+		if result['agreement'] < 1. or result['max_proba_diff'] > 1e-6:
+			print 'FAIL: compiled classifier disagrees with the original'
+			failed = True
+		if result['compiled_ms'][0] > LATENCY_TARGET_MS:
+			print 'FAIL: compiled classifier over its latency target'
+			failed = True
+	sys.exit(1 if failed else 0)
@@ -0,0 +1,16 @@
+#!/Users/jayhack/anaconda/bin/python
+import time
+from DBZHost import GestureClassifier
+
+if __name__ == '__main__':
+
+	#=====[ CONVERT .pose FILES -> data/gesture_dataset	]=====
+	classifier = GestureClassifier(data_dir='../data/')
+	start = time.time()
+	dataset = classifier.convert_data()
+	print "[[ CONVERTED: %d poses of %d gestures in %.2fs ]]" % (len(dataset), len(dataset.gesture_names), time.time() - start)
+
+	#=====[ LOAD IT BACK	]=====
+	start = time.time()
+	classifier.load_data()
+	print "[[ LOADED: X %s in %.3fs ]]" % (str(classifier.X.shape), time.time() - start)
@@ -0,0 +1,20 @@
+#!/Users/jayhack/anaconda/bin/python
+import os
+import pickle
+import argparse
+from DBZHost.Recording import Recording
+
+if __name__ == '__main__':
+
+	#==========[ ARGPARSING	]==========
+	parser = argparse.ArgumentParser()
+	parser.add_argument(	'videos',
+							metavar='V', type=str, nargs='+',
+							help='pickled videos to convert, ex: ../data/jay_alone.vid')
+	args = parser.parse_args ()
+
+	#=====[ CONVERT: ../data/jay_alone.vid -> ../data/jay_alone.rec	]=====
+	for video_path in args.videos:
+		recording_path = os.path.splitext(video_path)[0] + Recording.EXTENSION
+		recording = Recording.from_frames(pickle.load(open(video_path, 'r')), recording_path)
+		print "[[ CONVERTED: %s -> %s (%d frames) ]]" % (video_path, recording_path, len(recording))
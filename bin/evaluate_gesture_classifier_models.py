@@ -10,9 +10,25 @@ if __name__ == '__main__':
 							metavar='O', type=str, nargs=1, dest='classifier_name', required=False,
 							default='clf.pkl', help='path to output directory (local filesystem)', 
 							action='store')
+	parser.add_argument(	'-j', '--workers',
+							metavar='J', type=int, dest='workers', required=False,
+							default=None, help='processes to cross-validate in (default: one per core)',
+							action='store')
+	parser.add_argument(	'-f', '--folds',
+							metavar='F', type=int, dest='folds', required=False,
+							default=3, help='number of cross-validation folds',
+							action='store')
+	parser.add_argument(	'-o', '--output',
+							metavar='O', type=str, dest='output', required=False,
+							default=None, help='write the ranked report here as json',
+							action='store')
+	parser.add_argument(	'--no_plot',
+							dest='plot', required=False, default=True,
+							help="don't plot the best model's confusion matrix",
+							action='store_false')
 	args = parser.parse_args ()
 	classifier_name = args.classifier_name[0]
 
-	#=====[ TRAIN CLASSIFIER	]=====
+	#=====[ EVALUATE CANDIDATE MODELS	]=====
 	classifier = GestureClassifier(data_dir='../data/', classifier_name='clf.pkl')
-	classifier.evaluate_models()
+	classifier.evaluate_models(workers=args.workers, folds=args.folds, output=args.output, plot=args.plot)
@@ -1,22 +1,87 @@
-import pickle
+import time
+import json
+import logging
 import argparse
 from DBZHost import DBZController
+from DBZHost.Metrics import metrics
+from DBZHost.Recording import load_video
+from DBZHost.ReplayReceiver import ReplayReceiver
 
 if __name__ == '__main__':
 
-	sample_video = pickle.load(open('../data/jay_alone.vid','r'))
-	controller = DBZController(num_players=1, video=sample_video, data_dir='../data')
-	
+	#==========[ ARGPARSING	]==========
 	parser = argparse.ArgumentParser()
+	parser.add_argument(	'-v', '--video',
+							metavar='V', type=str, dest='video', required=False,
+							default='../data/jay_alone.vid', help='recording to replay',
+							action='store')
+	parser.add_argument(	'-n', '--num_players',
+							metavar='N', type=int, dest='num_players', required=False,
+							default=1, help='number of players in the recording',
+							action='store')
 	parser.add_argument(	'-r', '--realtime',
-							metavar='O', type=bool, nargs=1, dest='realtime', required=False,
-							default=False, help='wether to do real time or not', 
+							dest='realtime', required=False,
+							default=False, help='run without pressing enter for every frame',
+							action='store_true')
+	parser.add_argument(	'-p', '--pacing',
+							metavar='P', type=str, dest='pacing', required=False,
+							default='max_speed', choices=ReplayReceiver.PACINGS,
+							help='timestamp: as recorded, fps: at --fps, max_speed: as fast as possible',
+							action='store')
+	parser.add_argument(	'--fps',
+							metavar='F', type=float, dest='fps', required=False,
+							default=ReplayReceiver.DEFAULT_FPS, help='frame rate for --pacing fps',
+							action='store')
+	parser.add_argument(	'-s', '--start_frame',
+							metavar='S', type=int, dest='start_frame', required=False,
+							default=0, help='first frame to replay',
+							action='store')
+	parser.add_argument(	'-e', '--end_frame',
+							metavar='E', type=int, dest='end_frame', required=False,
+							default=None, help='frame to stop before',
+							action='store')
+	parser.add_argument(	'-l', '--loop',
+							dest='loop', required=False,
+							default=False, help='replay the range over and over (until ctrl-c or --max_frames)',
+							action='store_true')
+	parser.add_argument(	'-m', '--max_frames',
+							metavar='M', type=int, dest='max_frames', required=False,
+							default=None, help='stop after this many frames',
+							action='store')
+	parser.add_argument(	'--log_level',
+							metavar='L', type=str, dest='log_level', required=False,
+							default='WARNING', help='DEBUG prints every gesture (slows the loop down)',
 							action='store')
+	parser.add_argument(	'--metrics',
+							dest='metrics', required=False,
+							default=False, help='collect per-stage metrics and print them at the end',
+							action='store_true')
 	args = parser.parse_args ()
-	realtime = args.realtime[0]
-	print realtime
+	logging.basicConfig(level=getattr(logging, args.log_level.upper()))
+	if args.metrics:
+		metrics.enable()
 
-	for i in range(len(sample_video) - 2):
-		controller.update_game(realtime=realtime)
+	#=====[ SETUP REPLAY	]=====
+	receiver = ReplayReceiver(	load_video(args.video), pacing=args.pacing, fps=args.fps, loop=args.loop,
+								start_frame=args.start_frame, end_frame=args.end_frame)
+	controller = DBZController(num_players=args.num_players, receiver=receiver, data_dir='../data')
 
+	#=====[ RUN THE PIPELINE OVER IT	]=====
+	num_frames, start = 0, time.time()
+	while receiver.has_frames() and (args.max_frames is None or num_frames < args.max_frames):
+		try:
+			controller.update_game(realtime=args.realtime)
+			num_frames += 1
+		except KeyboardInterrupt:
+			break
+	elapsed = time.time() - start
+	receiver.stop()
+	if receiver.is_alive():
+		receiver.join()
 
+	#=====[ THROUGHPUT	]=====
+	stats = receiver.get_stats()
+	print '===[ REPLAYED: %d frames in %.2fs (%.1f fps) ]===' % (num_frames, elapsed, num_frames / max(elapsed, 1e-9))
+	print 'received: %(received)d, dropped: %(dropped)d, overwritten: %(overwritten)d' % stats
+	if args.metrics:
+		print json.dumps(metrics.snapshot(), indent=4, sort_keys=True)
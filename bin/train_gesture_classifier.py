@@ -18,3 +18,4 @@ if __name__ == '__main__':
 	classifier.train()
 	classifier.evaluate_self()
 	classifier.save()
+	print "[[ SAVED: %s, %s ]]" % (classifier.classifier_path, classifier.compiled_path)
@@ -0,0 +1,87 @@
+#!/Users/jayhack/anaconda/bin/python
+import os
+import argparse
+from collections import Counter
+import numpy as np
+from DBZHost import GestureClassifier, Player
+from DBZHost.SequenceClassifier import SequenceClassifier, labels_path, draft_segments, save_segments
+
+
+def split_in_time(windows, test_fraction):
+	"""
+		given (X, y) per recording, returns (X_train, y_train, X_test, y_test):
+		the last test_fraction of every recording's windows held out, so
+		that test windows don't overlap the ones trained on (bar one window
+		length at each boundary)
+	"""
+	train, test = [], []
+	for X, y in windows:
+		split = int(round(len(X) * (1. - test_fraction)))
+		train.append((X[:split], y[:split]))
+		test.append((X[split:], y[split:]))
+	stack = lambda parts: (np.concatenate([X for X, y in parts if len(X) > 0]), np.concatenate([y for X, y in parts if len(X) > 0]))
+	return stack(train) + stack(test)
+
+
+
+if __name__ == '__main__':
+
+	#==========[ ARGPARSING	]==========
+	parser = argparse.ArgumentParser()
+	parser.add_argument(	'recordings',
+							metavar='R', type=str, nargs='+',
+							help='labelled recordings (see SequenceClassifier.labels_path), as path:num_players')
+	parser.add_argument(	'-d', '--data_dir',
+							metavar='D', type=str, dest='data_dir', required=False,
+							default='../data/', help='data directory; the classifier is saved in its classifiers/',
+							action='store')
+	parser.add_argument(	'-c', '--classifier_name',
+							metavar='C', type=str, dest='classifier_name', required=False,
+							default='seq_clf.pkl', help='file name to save the sequence classifier as',
+							action='store')
+	parser.add_argument(	'-w', '--window_length',
+							metavar='W', type=int, dest='window_length', required=False,
+							default=Player.GESTURE_LENGTH, help='frames per window; live play will use the same',
+							action='store')
+	parser.add_argument(	'--hop',
+							metavar='H', type=int, dest='hop', required=False,
+							default=1, help='frames between training windows',
+							action='store')
+	parser.add_argument(	'-t', '--test_fraction',
+							metavar='T', type=float, dest='test_fraction', required=False,
+							default=0.25, help='fraction of every recording (its end) held out for the accuracy check',
+							action='store')
+	parser.add_argument(	'--draft',
+							dest='draft', action='store_true', default=False,
+							help='write draft labels (from the pose classifier) for recordings that have none, to correct by hand, instead of training')
+	args = parser.parse_args ()
+	recordings = [(path, int(num_players)) for path, num_players in [r.rsplit(':', 1) if ':' in r else (r, 1) for r in args.recordings]]
+	gesture_classifier = GestureClassifier(data_dir=args.data_dir, sequence_classifier_name=args.classifier_name)
+
+	#=====[ DRAFT LABELS	]=====
+	if args.draft:
+		gesture_classifier.load_classifier()
+		for path, num_players in recordings:
+			if os.path.exists(labels_path(path)):
+				print "%s is already labelled" % path
+				continue
+			segments = draft_segments(path, gesture_classifier, num_players, args.window_length)
+			save_segments(segments, labels_path(path))
+			print "[[ SAVED: %s (%d segments) ]]" % (labels_path(path), len(segments))
+		exit(0)
+
+	#=====[ HELD-OUT ACCURACY	]=====
+	classifier = SequenceClassifier(args.window_length, args.hop)
+	windows = classifier.windows(recordings, gesture_classifier)
+	X_train, y_train, X_test, y_test = split_in_time(windows, args.test_fraction)
+	print "WINDOWS: %d train, %d test" % (len(X_train), len(X_test))
+	print "  ", dict(Counter(np.concatenate([y_train, y_test])))
+	predicted = SequenceClassifier(args.window_length, args.hop).fit(X_train, y_train).predict(X_test)
+	print "HELD-OUT ACCURACY: %.3f" % np.mean(predicted == y_test)
+	for gesture in sorted(set(y_test)):
+		print "  %-20s %.3f (%d windows)" % (gesture, np.mean(predicted[y_test == gesture] == gesture), np.sum(y_test == gesture))
+
+	#=====[ TRAIN ON EVERYTHING	]=====
+	classifier.fit(np.concatenate([X_train, X_test]), np.concatenate([y_train, y_test]))
+	classifier.save(gesture_classifier.sequence_classifier_path)
+	print "[[ SAVED: %s ]]" % gesture_classifier.sequence_classifier_path
@@ -1,10 +1,86 @@
 import pickle
+import logging
+import argparse
 from DBZHost import DBZController
+from DBZHost.Metrics import metrics, MetricsServer
+from DBZHost.GameLoop import GameLoop
+from DBZHost.Pipeline import Pipeline
+from DBZHost.CommunicationHost import CommunicationHost, HWM
+from DBZHost.PredictionCache import STEP as CACHE_STEP
+
 
 if __name__ == '__main__':
 
-	controller = DBZController(num_players=2, data_dir='../data')
-	while True:
-		controller.update_game()
+	parser = argparse.ArgumentParser()
+	parser.add_argument(	'-b', '--binary',
+							dest='binary', required=False, default=False,
+							help='receive packed binary frames (run primesense_receiver with --binary)',
+							action='store_true')
+	parser.add_argument(	'--log_level',
+							metavar='L', type=str, dest='log_level', required=False,
+							default='WARNING', help='DEBUG prints every gesture (slows the loop down)',
+							action='store')
+	parser.add_argument(	'--metrics_port',
+							metavar='P', type=int, dest='metrics_port', required=False,
+							default=None, help='serve live metrics as json at http://127.0.0.1:<port>/',
+							action='store')
+	parser.add_argument(	'--stats_interval',
+							metavar='S', type=float, dest='stats_interval', required=False,
+							default=None, help='log a metrics summary every this many seconds',
+							action='store')
+	parser.add_argument(	'-e', '--event_loop',
+							dest='event_loop', required=False, default=False,
+							help='run as an event loop: slow clients drop stale states instead of stalling the game',
+							action='store_true')
+	parser.add_argument(	'--pipeline',
+							metavar='M', type=str, dest='pipeline', required=False,
+							default=None, choices=Pipeline.MODES,
+							help='run tracking, classification and sending as pipelined stages, with the classifier workers as threads or processes',
+							action='store')
+	parser.add_argument(	'-w', '--workers',
+							metavar='W', type=int, dest='workers', required=False,
+							default=Pipeline.WORKERS, help='number of classifier workers for --pipeline',
+							action='store')
+	parser.add_argument(	'--pub_hwm',
+							metavar='H', type=int, dest='pub_hwm', required=False,
+							default=HWM, help='messages queued per subscriber of the published frames before they are dropped',
+							action='store')
+	parser.add_argument(	'-s', '--smooth',
+							dest='smooth', required=False, default=False,
+							help='smooth the joints sent to the phones (One-Euro filter)',
+							action='store_true')
+	parser.add_argument(	'--predict_ms',
+							metavar='MS', type=float, dest='predict_ms', required=False,
+							default=0., help='send joints predicted this far ahead, to make up for latency',
+							action='store')
+	parser.add_argument(	'--cache_size',
+							metavar='N', type=int, dest='cache_size', required=False,
+							default=0, help='cache this many predictions of quantized poses (0: off)',
+							action='store')
+	parser.add_argument(	'--cache_step',
+							metavar='MM', type=float, dest='cache_step', required=False,
+							default=CACHE_STEP, help='quantization step of the prediction cache',
+							action='store')
+	args = parser.parse_args ()
+	device_name = 'primesense_binary' if args.binary else 'primesense'
+
+	#=====[ logging/metrics	]=====
+	logging.basicConfig(level=getattr(logging, args.log_level.upper()))
+	if not args.metrics_port is None or not args.stats_interval is None:
+		metrics.enable(dump_interval=args.stats_interval)
+	if not args.metrics_port is None:
+		metrics_server = MetricsServer(args.metrics_port)
+
+	controller = DBZController(num_players=2, data_dir='../data', device_name=device_name,
+									communication_host=CommunicationHost(hwm=args.pub_hwm),
+									smoothing=args.smooth, prediction_ms=args.predict_ms,
+									cache_size=args.cache_size, cache_step=args.cache_step)
+	if not args.pipeline is None:
+		Pipeline(controller, mode=args.pipeline, workers=args.workers).run()
+	elif args.event_loop:
+		GameLoop(controller).run()
+	else:
+		while True:
+			controller.update_game()
 
 
@@ -1,9 +1,9 @@
-import pickle
 from DBZHost import DBZController
+from DBZHost.Recording import load_video
 
 if __name__ == '__main__':
 
-	sample_video = pickle.load(open('../data/lucas_vs_brandon.vid','r'))
+	sample_video = load_video('../data/lucas_vs_brandon.vid')
 	controller = DBZController(num_players=2, video=sample_video, data_dir='../data')
 	for i in range(len(sample_video) - 2):
 		controller.update_game()
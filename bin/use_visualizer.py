@@ -2,19 +2,19 @@ import pickle
 import random
 from DBZHost import DBZController, GestureClassifier, Visualizer
 
-def get_random_pose(pose_dfs_list):
+def get_random_pose(poses_list):
 	"""
 		returns a random pose 
 	"""
-	return random.choice(pose_dfs_list)
+	return random.choice(poses_list)
 
 
-def visualize_random_pose(visualizer, pose_dfs_list):
+def visualize_random_pose(visualizer, poses_list):
 	"""
 		visualizes a random pose 
 	"""
-	pose_df = get_random_pose(pose_dfs_list)
-	viz.visualize(pose_df)
+	pose = get_random_pose(poses_list)
+	viz.visualize(pose)
 
 if __name__ == '__main__':
 
@@ -22,11 +22,11 @@ if __name__ == '__main__':
 	print '---> Loading data...'
 	gesture_classifier.load_data()
 	data = gesture_classifier.data
-	pose_df = get_random_pose(data['double_blast'])
+	pose = get_random_pose(data['blast']['h_coords'])
 
 	#=====[ Setup Visualizer	]=====
 	viz = Visualizer()
-	viz.visualize(pose_df)
+	viz.visualize(pose)
 	
 
 
@@ -80,8 +80,9 @@ void NI_App::initialize_APIs () {
  * ---------------------
  * - intializes APIs (OpenNI, NiTE)
  * - creates device delegate
+ * binary_frames: send packed binary frames instead of json
  */
-NI_App::NI_App () {
+NI_App::NI_App (bool binary_frames) {
 
 	/*### Step 1: initialize the APIs ###*/
     initialize_APIs ();
@@ -92,7 +93,7 @@ NI_App::NI_App () {
 
     /*### Step 3: initialize the port communication ###*/
     print_status ("Initialization", "Starting Port Communication");
-    port_interface = new PortInterface ();
+    port_interface = new PortInterface (binary_frames);
 
 }
 
@@ -58,7 +58,7 @@ protected:
 public:
 
 	/*--- Constructor/Destructor ---*/
-	NI_App ();
+	NI_App (bool binary_frames=false);
     ~NI_App ();
 
     /*--- Main Loop ---*/
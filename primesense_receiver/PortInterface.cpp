@@ -8,6 +8,8 @@
 #include <stdlib.h>
 #include <time.h>
 #include <string.h>
+#include <cmath>
+#include <cfloat>
 
 /*--- ZeroMQ ---*/
 #include <zmq.hpp>
@@ -27,13 +29,18 @@ using namespace std;
 /* Function: constructor
  * ---------------------
  * sets up everything necessary for send_message to be called 
+ * _binary: send packed binary frames instead of json
  */
-PortInterface::PortInterface () {
+PortInterface::PortInterface (bool _binary) {
 
     /*### Step 1: initialize context/socket, bind to port ###*/
     context = new zmq::context_t (1);
     publisher = new zmq::socket_t (*context, ZMQ_PUB);
     publisher->bind(BIND_PORT);
+
+    /*### Step 2: wire format ###*/
+    binary = _binary;
+    frame_index = 0;
 }
 
 
@@ -62,18 +69,99 @@ string frame_to_string (J_Frame * frame) {
 }
 
 
+/* PARAMETERS: wire_joint_order
+ * ----------------------------
+ * wire_joint_order[i] is the nite::JointType of the ith joint in a 
+ * binary frame (alphabetical by name)
+ */
+static const nite::JointType wire_joint_order[JSKEL_NUM_OF_JOINTS] = {
+                            nite::JOINT_HEAD,
+                            nite::JOINT_LEFT_ELBOW,
+                            nite::JOINT_LEFT_FOOT,
+                            nite::JOINT_LEFT_HAND,
+                            nite::JOINT_LEFT_HIP,
+                            nite::JOINT_LEFT_KNEE,
+                            nite::JOINT_LEFT_SHOULDER,
+                            nite::JOINT_NECK,
+                            nite::JOINT_RIGHT_ELBOW,
+                            nite::JOINT_RIGHT_FOOT,
+                            nite::JOINT_RIGHT_HAND,
+                            nite::JOINT_RIGHT_HIP,
+                            nite::JOINT_RIGHT_KNEE,
+                            nite::JOINT_RIGHT_SHOULDER,
+                            nite::JOINT_TORSO
+                        };
+
+
+/* Function: wire_float
+ * --------------------
+ * joints that were never filled in hold FLT_MIN; these go out as nan
+ * so the receiver doesn't have to substitute anything
+ */
+static float wire_float (float value) {
+    return (value == FLT_MIN) ? nanf ("") : value;
+}
+
+
+/* Function: frame_to_binary
+ * -------------------------
+ * given a frame, returns its packed binary representation: 
+ * SUBSCRIBE_MESSAGE_BINARY, a BinaryFrameHeader, then one 
+ * BinarySkeletonRecord per skeleton (see PortInterface.h)
+ */
+string frame_to_binary (J_Frame * frame, uint32_t frame_index) {
+
+    std::vector<J_Skeleton *> skeletons = frame->get_skeletons ();
+
+    /*### Step 1: header ###*/
+    BinaryFrameHeader header;
+    memcpy (header.magic, BINARY_FRAME_MAGIC, sizeof (header.magic));
+    header.version          = BINARY_FRAME_VERSION;
+    header.num_skeletons    = (uint16_t) skeletons.size ();
+    header.num_joints       = JSKEL_NUM_OF_JOINTS;
+    header.reserved         = 0;
+    header.frame_index      = frame_index;
+
+    string message_string (SUBSCRIBE_MESSAGE_BINARY);
+    message_string.append ((const char *) &header, sizeof (header));
+
+    /*### Step 2: one fixed-size record per skeleton ###*/
+    for (int i=0;i<skeletons.size();i++) {
+        J_Skeleton* skeleton = skeletons.at(i);
+        BinarySkeletonRecord record;
+        record.skeleton_index = i;
+        for (int j=0;j<JSKEL_NUM_OF_JOINTS;j++) {
+            J_Joint * joint                 = skeleton->getJoint (wire_joint_order[j]);
+            nite::Point3f position          = joint->getRWPosition ();
+            nite::Quaternion orientation    = joint->getOrientation ();
+            record.positions[j][0]          = wire_float (position.x);
+            record.positions[j][1]          = wire_float (position.y);
+            record.positions[j][2]          = wire_float (position.z);
+            record.orientations[j][0]       = wire_float (orientation.w);
+            record.orientations[j][1]       = wire_float (orientation.x);
+            record.orientations[j][2]       = wire_float (orientation.y);
+            record.orientations[j][3]       = wire_float (orientation.z);
+            record.confidences[j]           = (float) joint->getPositionConfidence ();
+        }
+        message_string.append ((const char *) &record, sizeof (record));
+    }
+    return message_string;
+}
+
+
 /* Function: send_frame
  * --------------------
  * given a frame, sends it out as a message
  */
 void PortInterface::send_frame (J_Frame * frame) {
 
-    /*=====[ Get string representation (print it) ]=====*/
-    string message_string = frame_to_string (frame);
+    /*=====[ Get string/binary representation ]=====*/
+    string message_string = binary ? frame_to_binary (frame, frame_index) : frame_to_string (frame);
+    frame_index++;
 
-    /*=====[ Convert to zmq message ]=====*/
+    /*=====[ Convert to zmq message (binary frames contain nulls: no sprintf) ]=====*/
     zmq::message_t message (message_string.size());
-    sprintf((char *) message.data(), "%s", message_string.c_str());
+    memcpy (message.data(), message_string.data(), message_string.size());
 
 
     /*=====[ Send zqm message ]=====*/
@@ -11,6 +11,7 @@
 #include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
+#include <stdint.h>
 
 /*--- ZeroMQ ---*/
 #include <zmq.hpp>
@@ -23,6 +24,31 @@
 using namespace std;
 
 
+/* Structs: BinaryFrameHeader, BinarySkeletonRecord
+ * -------------------------------------------------
+ * layout of a binary frame (all little-endian): one header followed by
+ * num_skeletons fixed-size skeleton records. Joints are in wire order
+ * (alphabetical by name), matching DBZHost.Skeleton.JOINT_NAMES.
+ */
+#pragma pack(push, 1)
+struct BinaryFrameHeader {
+    char        magic [4];
+    uint16_t    version;
+    uint16_t    num_skeletons;
+    uint16_t    num_joints;
+    uint16_t    reserved;
+    uint32_t    frame_index;
+};
+
+struct BinarySkeletonRecord {
+    uint32_t    skeleton_index;
+    float       positions       [JSKEL_NUM_OF_JOINTS][3];
+    float       orientations    [JSKEL_NUM_OF_JOINTS][4];  /* w, x, y, z */
+    float       confidences     [JSKEL_NUM_OF_JOINTS];
+};
+#pragma pack(pop)
+
+
 class PortInterface {
 
 private:
@@ -31,9 +57,13 @@ private:
 	zmq::context_t * context;
     zmq::socket_t * publisher;
 
+    /*--- wire format ---*/
+    bool        binary;
+    uint32_t    frame_index;
+
 
 public:
 
-    PortInterface ();
+    PortInterface (bool _binary=false);
    	void send_frame (J_Frame * frame);
 };
\ No newline at end of file
@@ -10,6 +10,7 @@
 #include <stdio.h>
 #include <stdlib.h>
 #include <assert.h>
+#include <string.h>
 
 /*--- My Files ---*/
 #include "Utilities.h"
@@ -21,7 +22,10 @@ using namespace std;
 
 int main(int argc, char** argv)
 {
-    NI_App * ni_app = new NI_App ();
+    /*--- --binary: send packed binary frames instead of json ---*/
+    bool binary_frames = (argc > 1) && (strcmp (argv[1], "--binary") == 0);
+
+    NI_App * ni_app = new NI_App (binary_frames);
     ni_app->main_loop ();
     delete ni_app;
 	return 0;
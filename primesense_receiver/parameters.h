@@ -14,6 +14,9 @@
 #define BIND_PORT "tcp://*:5555"
 #define SUBSCRIBE_MESSAGE "__primesense__"
 #define SUBSCRIBE_MESSAGE_LENGTH 14
+#define SUBSCRIBE_MESSAGE_BINARY "__primesense_bin__"
+#define BINARY_FRAME_MAGIC "DBZF"
+#define BINARY_FRAME_VERSION 1
 
 /*### J_Skeleton ###*/
 #define JSKEL_NUM_OF_JOINTS 15
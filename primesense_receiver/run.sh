@@ -40,7 +40,7 @@ source SetupDevEnvironment.sh
 cd Bin/x64-Release
 require_file_exists "PrimesenseReceiver"
 cd ..
-./x64-Release/PrimesenseReceiver
+./x64-Release/PrimesenseReceiver "$@"
 cd ..
 
 
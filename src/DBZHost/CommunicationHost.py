@@ -1,18 +1,120 @@
 #-------------------------------------------------- #
 # Class: CommunicationHost
 # ------------------------
-# Takes care of sending data over TCP ports to 
+# Takes care of sending data over TCP ports to
 # the listener phones
 #-------------------------------------------------- #
+import json
+import time
 import zmq
+import numpy as np
+from Skeleton import NUM_JOINTS
+from StateBroadcaster import player_topic, GAME_TOPIC
+from Metrics import metrics
+
+PORT = 5556
+
+#=====[ messages queued per subscriber before zmq starts dropping them	]=====
+HWM = 16
+
+SKELETONS_TOPIC = 'skeletons'
+
 
 class CommunicationHost:
+	"""
+		Class: CommunicationHost
+		========================
+		publishes processed frames on a ZMQ PUB socket, so any number of
+		consumers (visualizers, recorders, analysis) can subscribe without
+		the game loop knowing about them. Every message is multipart:
+
+			[topic, json header, array, array, ...]
+
+		the header says what the arrays are ('arrays': [[name, dtype,
+		shape], ...]) along with whatever else the topic has; the arrays go
+		out as their own raw buffers, without being copied (zmq itself
+		still copies ones under the socket's copy_threshold, for which
+		that's cheaper). Topics:
+
+			- 'skeletons': every skeleton in the frame (c_coords)
+			- 'player_<n>': player n's c_coords and h_coords, with its gesture
+			- 'game': json-able dicts (send_frame), header only
+
+		subscribers that can't keep up lose messages once hwm are queued
+		for them (zmq drops them); the game loop never waits.
+
+		Ideal Operation:
+		----------------
+
+			host = CommunicationHost(hwm=4)
+			host.publish('skeletons', {'seq':12}, positions=np.zeros((2, 15, 3)))
 
-	def __init__(self):
-		self.context = zmq.Context()
+			#=====[ consumer	]=====
+			socket.setsockopt(zmq.SUBSCRIBE, 'player_0')
+			topic, header, arrays = CommunicationHost.recv(socket)
+	"""
+
+	def __init__(self, port=PORT, hwm=HWM, context=None):
+		self.context = context or zmq.Context.instance()
 		self.socket = self.context.socket(zmq.PUB)
-		self.socket.bind("tcp://*:5556")
+		self.socket.setsockopt(zmq.SNDHWM, hwm)
+		self.socket.setsockopt(zmq.LINGER, 0)
+		self.socket.bind("tcp://*:%d" % port)
+		self.num_published = 0
+
+
+	def publish(self, topic, header=None, **arrays):
+		"""
+			publishes header (a json-able dict) and the arrays (name=array)
+			on topic; the arrays must not be modified afterwards, as zmq
+			may still be sending them
+		"""
+		arrays = [(name, np.ascontiguousarray(array)) for name, array in sorted(arrays.items())]
+		header = dict(header or {})
+		header['arrays'] = [[name, array.dtype.str, array.shape] for name, array in arrays]
+		with metrics.timer('publisher.send'):
+			self.socket.send(topic, zmq.SNDMORE)
+			self.socket.send(json.dumps(header), zmq.SNDMORE if arrays else 0)
+			for ix, (name, array) in enumerate(arrays):
+				self.socket.send(array, zmq.SNDMORE if ix < len(arrays) - 1 else 0, copy=False)
+		self.num_published += 1
+
+
+	def publish_frame(self, seq, timestamp, skeletons, players):
+		"""
+			publishes a processed frame: its skeletons (a list of
+			Skeletons), and each of the players as of that frame
+		"""
+		header = {'seq':seq, 'timestamp':timestamp or time.time()}
+		positions = np.array([s.positions for s in skeletons], dtype=np.float32).reshape(len(skeletons), NUM_JOINTS, 3)
+		self.publish(SKELETONS_TOPIC, dict(header, names=[s.name for s in skeletons]), positions=positions)
+		for player in players:
+			if not player.c_coords is None:
+				self.publish(player_topic(player.index), dict(header, gesture=player.gesture), c_coords=player.c_coords.positions, h_coords=player.h_coords.positions)
+
 
 	def send_frame(self, frame):
+		"""
+			publishes a json-able dict on the 'game' topic, header only
+		"""
 		assert type(frame) == dict
-		socket.send_json(frame)
+		self.publish(GAME_TOPIC, frame)
+
+
+	@staticmethod
+	def recv(socket, flags=0):
+		"""
+			receives one published message off a SUB socket; returns
+			(topic, header, {name:array}), the arrays being read-only views
+			onto the received buffers
+		"""
+		frames = socket.recv_multipart(flags, copy=False)
+		header = json.loads(frames[1].bytes)
+		arrays = {}
+		for (name, dtype, shape), frame in zip(header.pop('arrays', []), frames[2:]):
+			arrays[name] = np.asarray(frame.buffer).view(np.uint8).view(dtype).reshape(shape)
+		return frames[0].bytes, header, arrays
+
+
+	def close(self):
+		self.socket.close()
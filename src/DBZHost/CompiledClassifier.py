@@ -0,0 +1,297 @@
+#-------------------------------------------------- #
+# Class: CompiledClassifier
+# -------------------------
+# fitted gesture classifiers reduced to plain
+# arrays, for live inference without sklearn
+#-------------------------------------------------- #
+import os
+import numpy as np
+from timeit import default_timer
+from GestureIndex import append_rows
+
+FORMAT_VERSION = 1
+EXTENSION = '.npz'
+
+#=====[ what a single-pose query (predict_batch on one player) should take, at most	]=====
+LATENCY_TARGET_MS = 0.2
+
+KINDS = ('knn', 'linear')
+LINKS = ('ovr', 'softmax', 'binary')		# linear models: how scores become probabilities
+
+
+class CompiledClassifier(object):
+	"""
+		Class: CompiledClassifier
+		=========================
+		a fitted classifier as a handful of numpy arrays, saved to a .npz
+		that loads with numpy alone (no pickle, no sklearn), so it keeps
+		working across sklearn upgrades. Features go through:
+
+			- fill: nan features are replaced by this (the training mean
+				where known), as GestureIndex does
+			- an affine map x.matrix + offset: normalization and/or PCA
+				steps, folded into one (identity if there were none)
+			- the model:
+				- 'knn': brute force n_neighbors nearest references
+					(packed, with their squared norms); confidences are
+					the fraction of votes, ties go to the first class
+				- 'linear': scores = x.weights.T + bias, turned into
+					probabilities by link ('ovr': sigmoids normalized, like
+					sklearn's one-vs-rest LogisticRegression; 'softmax';
+					'binary': one sigmoid)
+
+		query/predict/predict_proba behave like GestureIndex's, and so does
+		partial_fit for 'knn' (linear models have to be retrained). Use
+		compile_estimator to make one from a fitted GestureIndex,
+		KNeighborsClassifier, LogisticRegression, or a Pipeline of PCA
+		steps ending in one of those; check_parity to compare it against
+		the original.
+
+		Ideal Operation:
+		----------------
+
+			compiled = compile_estimator(fitted)
+			compiled.save('clf.npz')
+			labels, confidences = CompiledClassifier.load('clf.npz').query(X)
+	"""
+
+	def __init__(self, kind, classes, fill, matrix, offset, **params):
+		if not kind in KINDS:
+			raise TypeError("Compiled classifier kind not supported: " + kind)
+		self.kind = kind
+		self.classes_ = np.asarray(classes)
+		self.fill = np.asarray(fill, dtype=np.float64)
+		self.matrix = np.asarray(matrix, dtype=np.float64)
+		self.offset = np.asarray(offset, dtype=np.float64)
+		if kind == 'knn':
+			self.references = np.asarray(params['references'], dtype=np.float64)
+			self.codes = np.asarray(params['codes'], dtype=np.int64)
+			self.n_neighbors = int(params['n_neighbors'])
+			self.reference_sqnorms = (self.references ** 2).sum(axis=1)
+		else:
+			self.weights = np.asarray(params['weights'], dtype=np.float64)
+			self.bias = np.asarray(params['bias'], dtype=np.float64)
+			self.link = str(params['link'])
+			if not self.link in LINKS:
+				raise TypeError("Link not supported: " + self.link)
+
+
+
+	################################################################################
+	####################[ SAVING/LOADING ]##########################################
+	################################################################################
+
+	def get_arrays(self):
+		arrays = {'format_version':FORMAT_VERSION, 'kind':self.kind, 'classes':self.classes_, 'fill':self.fill, 'matrix':self.matrix, 'offset':self.offset}
+		if self.kind == 'knn':
+			arrays.update(references=self.references, codes=self.codes, n_neighbors=self.n_neighbors)
+		else:
+			arrays.update(weights=self.weights, bias=self.bias, link=self.link)
+		return arrays
+
+
+	def save(self, path):
+		"""
+			writes the .npz through a temporary file, so that a snapshot
+			being interrupted never leaves a corrupt one behind
+		"""
+		with open(path + '.tmp', 'wb') as f:
+			np.savez(f, **self.get_arrays())
+		os.rename(path + '.tmp', path)
+
+
+	@classmethod
+	def load(cls, path):
+		with np.load(path, allow_pickle=False) as data:
+			arrays = {key:data[key] for key in data.files}
+		version = int(arrays.pop('format_version'))
+		if version != FORMAT_VERSION:
+			raise ValueError("Compiled classifier format %d not supported (expected %d): %s" % (version, FORMAT_VERSION, path))
+		kind = str(arrays.pop('kind'))
+		return cls(kind, **arrays)
+
+
+
+	################################################################################
+	####################[ INFERENCE ]###############################################
+	################################################################################
+
+	def transform(self, X):
+		X = np.array(X, dtype=np.float64).reshape(-1, len(self.fill))
+		missing = np.isnan(X)
+		X[missing] = np.broadcast_to(self.fill, X.shape)[missing]
+		return np.dot(X, self.matrix) + self.offset
+
+
+	def scores(self, X):
+		"""
+			given transformed X, returns its (len(X), num_classes) scores:
+			neighbour votes (knn) or decision values (linear); the highest
+			is the prediction, like sklearn's predict
+		"""
+		if self.kind == 'knn':
+			references = self.references
+			k = min(self.n_neighbors, len(references))
+			distances = self.reference_sqnorms[:len(references)] - 2 * np.dot(X, references.T) + (X ** 2).sum(axis=1)[:, np.newaxis]
+			indices = np.argpartition(distances, k - 1, axis=1)[:, :k]
+			neighbor_codes = self.codes[indices]
+			return (neighbor_codes[:, :, np.newaxis] == np.arange(len(self.classes_))).sum(axis=1)
+		scores = np.dot(X, self.weights.T) + self.bias
+		return np.column_stack([-scores[:, 0], scores[:, 0]]) if self.link == 'binary' else scores
+
+
+	def probabilities(self, scores):
+		if self.kind == 'knn':
+			return scores / scores.sum(axis=1).astype(np.float64)[:, np.newaxis]
+		if self.link == 'binary':
+			p = 1. / (1. + np.exp(-scores[:, 1]))
+			return np.column_stack([1. - p, p])
+		if self.link == 'softmax':
+			probs = np.exp(scores - scores.max(axis=1)[:, np.newaxis])
+		else:
+			probs = 1. / (1. + np.exp(-scores))
+		return probs / probs.sum(axis=1)[:, np.newaxis]
+
+
+	def predict_proba(self, X):
+		return self.probabilities(self.scores(self.transform(X)))
+
+
+	def query(self, X):
+		"""
+			returns (labels, confidences) for every row in X
+		"""
+		scores = self.scores(self.transform(X))
+		best = scores.argmax(axis=1)
+		return self.classes_[best], self.probabilities(scores)[np.arange(len(best)), best]
+
+
+	def predict(self, X):
+		return self.query(X)[0]
+
+
+	def score(self, X, y):
+		return np.mean(self.predict(X) == np.asarray(y))
+
+
+
+	################################################################################
+	####################[ ONLINE LEARNING ]#########################################
+	################################################################################
+
+	def partial_fit(self, X, y):
+		"""
+			knn: adds the rows of X, labelled y, to the references; labels
+			not seen before become new classes, after the existing ones
+		"""
+		if self.kind != 'knn':
+			raise TypeError("Only knn classifiers can learn online; retrain %s ones" % self.kind)
+		X, y = self.transform(X), np.asarray(y)
+		new_classes = [label for label in np.unique(y) if not label in self.classes_]
+		if len(new_classes) > 0:
+			self.classes_ = np.concatenate([self.classes_, np.asarray(new_classes)])
+		code_of = {label:code for code, label in enumerate(self.classes_)}
+		codes = np.array([code_of[label] for label in y], dtype=self.codes.dtype)
+		self.buffers = dict(getattr(self, 'buffers', {}))
+		self.codes = append_rows(self.buffers, 'codes', self.codes, codes)
+		self.reference_sqnorms = append_rows(self.buffers, 'reference_sqnorms', self.reference_sqnorms, (X ** 2).sum(axis=1))
+		self.references = append_rows(self.buffers, 'references', self.references, X)
+		return self
+
+
+
+################################################################################
+####################[ COMPILING ]###############################################
+################################################################################
+
+def compile_estimator(estimator):
+	"""
+		returns the CompiledClassifier equivalent of a fitted estimator;
+		raises TypeError for ones it doesn't know how to compile
+	"""
+	if isinstance(estimator, CompiledClassifier):
+		return estimator
+
+	#=====[ Step 1: fold PCA steps into one affine map	]=====
+	steps = [step for name, step in estimator.steps] if hasattr(estimator, 'steps') else [estimator]
+	model, fill, matrix, offset = steps[-1], None, None, None
+	for step in steps[:-1]:
+		if not hasattr(step, 'components_') or not hasattr(step, 'mean_'):
+			raise TypeError("Can't compile pipeline step: %s" % type(step).__name__)
+		step_matrix = step.components_.T.astype(np.float64)
+		if getattr(step, 'whiten', False):
+			step_matrix = step_matrix / np.sqrt(step.explained_variance_)
+		step_offset = -np.dot(step.mean_, step_matrix)
+		if matrix is None:
+			fill, matrix, offset = step.mean_, step_matrix, step_offset
+		else:
+			matrix, offset = np.dot(matrix, step_matrix), np.dot(offset, step_matrix) + step_offset
+
+	#=====[ Step 2: the model	]=====
+	model_matrix = model_offset = None
+	if hasattr(model, 'references') and hasattr(model, 'codes'):
+		kind, num_features = 'knn', len(model.mean)
+		params = {'references':model.references, 'codes':model.codes, 'n_neighbors':model.n_neighbors}
+		model_matrix, model_offset = np.diag(1. / model.scale), -model.mean / model.scale
+		if matrix is None:
+			fill = model.mean
+	elif hasattr(model, '_fit_X') and hasattr(model, 'n_neighbors'):
+		if model.weights != 'uniform' or model.effective_metric_ != 'euclidean':
+			raise TypeError("Can only compile uniform-weight euclidean KNeighborsClassifiers")
+		kind, num_features = 'knn', model._fit_X.shape[1]
+		params = {'references':model._fit_X, 'codes':model._y, 'n_neighbors':model.n_neighbors}
+	elif hasattr(model, 'coef_') and hasattr(model, 'predict_proba'):
+		kind, num_features = 'linear', model.coef_.shape[1]
+		if len(model.classes_) == 2:
+			link = 'binary'
+		else:
+			link = 'softmax' if getattr(model, 'multi_class', 'ovr') == 'multinomial' else 'ovr'
+		params = {'weights':model.coef_, 'bias':model.intercept_, 'link':link}
+	else:
+		raise TypeError("Can't compile classifier: %s" % type(model).__name__)
+
+	#=====[ Step 3: the knn index's own normalization goes into the map too	]=====
+	if matrix is None:
+		matrix, offset = np.eye(num_features), np.zeros(num_features)
+	if not model_matrix is None:
+		matrix, offset = np.dot(matrix, model_matrix), np.dot(offset, model_matrix) + model_offset
+	if fill is None:
+		fill = np.zeros(len(matrix))
+	return CompiledClassifier(kind, model.classes_, fill, matrix, offset, **params)
+
+
+
+################################################################################
+####################[ PARITY ]##################################################
+################################################################################
+
+def time_queries(classifier, X, repeats=1):
+	"""
+		returns the p50/p95 milliseconds classifier takes to query one row
+		of X, as predict_batch does in the live game
+	"""
+	query = getattr(classifier, 'query', None) or classifier.predict_proba
+	durations = []
+	for i in range(repeats):
+		for row in X:
+			start = default_timer()
+			query(row[np.newaxis])
+			durations.append(default_timer() - start)
+	return np.percentile(np.array(durations) * 1000., [50, 95])
+
+
+def check_parity(estimator, compiled, X):
+	"""
+		compares compiled to the estimator it was compiled from on X;
+		returns {'agreement': fraction of equal labels, 'max_proba_diff',
+		'original_ms'/'compiled_ms': (p50, p95) per single-pose query}
+	"""
+	X = np.asarray(X, dtype=np.float64)
+	agreement = np.mean(np.asarray(estimator.predict(X)) == compiled.predict(X))
+	proba_diff = np.abs(estimator.predict_proba(X) - compiled.predict_proba(X)).max()
+	return {
+				'agreement':float(agreement),
+				'max_proba_diff':float(proba_diff),
+				'original_ms':time_queries(estimator, X).tolist(),
+				'compiled_ms':time_queries(compiled, X).tolist(),
+			}
@@ -7,17 +7,27 @@ import os
 import pickle
 from copy import copy
 import numpy as np
-import scipy as sp
-import pandas as pd
-import zmq
 import hashlib
 import time
+import logging
 
 from StoppableThread import StoppableThread
 from DeviceReceiver import DeviceReceiver
+from ReplayReceiver import ReplayReceiver
+from FrameBuffer import FrameRecord
 from CommunicationHost import CommunicationHost
+from StateBroadcaster import StateBroadcaster, GAME_TOPIC
 from Player import Player
+from SkeletonTracker import SkeletonTracker
+from JointFilter import JointFilter
+from Skeleton import Skeleton
 from GestureClassifier import GestureClassifier
+from PredictionCache import STEP as CACHE_STEP
+from GestureDataset import GestureDataset
+from Recording import Recording
+from Metrics import metrics
+
+logger = logging.getLogger(__name__)
 
 
 class DBZController:
@@ -32,30 +42,37 @@ class DBZController:
 			primesense = PrimeSense()
 			primesense.send_frames()
 
-			p.skeleton_poses: list of dfs representing poses in c_coords 
-			p.skeleton_poses_h: list of dfs reprsenting poses in h_coords
+			p.skeleton_poses_c: list of Skeletons representing poses in c_coords
 	"""
 
-	def __init__(self, num_players=1, data_dir='../data', video=None, debug=False):
+	def __init__(self, num_players=1, data_dir='../data', video=None, debug=False, device_name='primesense',
+					gesture_length=Player.GESTURE_LENGTH, gesture_hop=Player.GESTURE_HOP, receiver=None, communication_host=None,
+					smoothing=False, prediction_ms=0., cache_size=0, cache_step=CACHE_STEP):
 
 		self.data_dir = data_dir
 		self.debug = debug
 
 		#=====[ Step 1: setup receiving data	]=====
-		if video:
-			self.video = video			
-			self.video_mode = True
-			self.video_frame = -1
-			self.receiver = None
-		else:
-			self.receiver = DeviceReceiver('primesense')
-			self.video_mode = False
+		self.frame_seq = -1
+		self.frame_gap = 0
+		self.frame_timestamp = None
+		self.video_frame = -1
+		if receiver is None:
+			receiver = ReplayReceiver(video) if video else DeviceReceiver(device_name)
+		self.receiver = receiver
+		self.video_mode = isinstance(receiver, ReplayReceiver)
 
 		#=====[ Step 2: setup communication	]=====
-		self.communication_host = CommunicationHost()
+		self.communication_host = communication_host or CommunicationHost()
 
 		#=====[ Step 3: try to inialize the game	]=====
 		self.num_players = num_players
+		self.gesture_length = gesture_length
+		self.gesture_hop = gesture_hop
+		self.smoothing = smoothing
+		self.prediction_ms = prediction_ms
+		self.cache_size = cache_size
+		self.cache_step = cache_step
 		self.init_players()
 		if not self.debug:
 			self.init_game ()
@@ -71,66 +88,57 @@ class DBZController:
 	####################[ SKELETONS/DEVICES]########################################
 	################################################################################
 
-	def key_conversion(self, key_name):
+	def update_skeletons(self, input_frame=None, realtime=False):
 		"""
-			ex: JOINT_HEAD_POSITION -> head
+			updates the following variables:
+				- frame_raw: raw frame (dict of skeleton_name -> joint dict or Skeleton)
+				- frame_seq: sequence number of the frame
+				- frame_gap: # of frames between this one and the last one that were never seen
+				- frame_timestamp: time the frame was received
+				- video_frame: frame number within the recording (video mode)
+				- num_skeletons: # of skeletons
+				- skeleton_poses_c: list of Skeletons containing skeleton poses (c_coords)
 		"""
-		return '_'.join(key_name.split('_')[1:-1]).lower()
+		#=====[ Step 1: step through video mode	]=====
+		if not input_frame and self.video_mode and not realtime:
+			key = raw_input('Video Mode [%s]: press enter to continue to next frame, q to quit' % (self.video_frame + 1))
+			if key == 'q':
+				quit()
+
+		#=====[ Step 2: figure out what the input frame is	]=====
+		if input_frame:
+			self.set_skeletons(input_frame)
+		else:
+			with metrics.timer('controller.receive'):
+				record = self.receiver.get_record()
+			if record is None:
+				record = FrameRecord(self.frame_seq + 1, None, {}) #replay is over: empty frames
+			self.set_frame(record)
 
 
-	def dict_to_df(self, d):
+	def set_frame(self, record):
 		"""
-			performs the following conversion:
-				{	
-					joint_name:{'x':..., 'y':..., 'z':...},
-					..
-				}
-				==>
-				df indexed by joint_name -> coordinate 
+			updates the frame variables (see update_skeletons) from a 
+			FrameRecord, as returned by the receiver
 		"""
-		return pd.DataFrame(d)
+		self.frame_gap, self.frame_seq = record.seq - self.frame_seq - 1, record.seq
+		self.frame_timestamp = record.timestamp
+		if self.video_mode:
+			self.video_frame = self.receiver.frame_number(record.seq)
+		metrics.increment('controller.frames_missed', max(self.frame_gap, 0))
+		self.set_skeletons(record.frame)
 
 
-	def update_skeletons(self, input_frame=None, realtime=False):
+	def set_skeletons(self, frame_raw):
 		"""
-			updates the following variables:
-				- frame_raw: raw json 
-				- num_skeletons: # of skeletons
-				- frame_processed: cleaned json
-				- skeleton_poses_c: list of dataframes containing skeleton poses (c_coords)
-				- skeleton_poses_h: list of dataframes containing skeleton poses (h_coords)
+			sets frame_raw, num_skeletons and skeleton_poses_c (Step 3) 
+			from a raw frame
 		"""
-		#=====[ Step 1: deal with video mode	]=====
-		if not input_frame and self.video_mode:
-			self.video_frame += 1
-			if not realtime:
-				key = raw_input('Video Mode [%s]: press enter to continue to next frame, q to quit' % self.video_frame)
-				if key == 'q':
-					quit()
-			self.update_skeletons(input_frame=self.video[self.video_frame])
-			# self.print_game_state()
-			return
-
-		#=====[ Step 2: figure out what the input frame is	]=====
-		if input_frame:
-			self.frame_raw = input_frame
-		else:
-			self.frame_raw = self.receiver.get_frame()
+		self.frame_raw = frame_raw
 		self.num_skeletons = len(self.frame_raw.keys())
 
-		#=====[ Step 3: process the frame	]=====
-		self.frame_processed = {}
-		for s_name, s_frame in self.frame_raw.iteritems():
-			self.frame_processed[s_name] = {}
-			for raw_key in s_frame.keys():
-				if raw_key.endswith('POSITION'):
-					key = self.key_conversion(raw_key)
-					self.frame_processed[s_name][key] = s_frame[raw_key]
-
-		#=====[ Step 4: get skeleton_poses	]=====
-		self.skeleton_poses_c = []
-		for s_name, s_frame in self.frame_processed.items():
-			self.skeleton_poses_c.append(self.dict_to_df(s_frame))
+		#=====[ Step 3: get skeleton_poses	]=====
+		self.skeleton_poses_c = [s_frame if isinstance(s_frame, Skeleton) else Skeleton.from_dict(s_frame, name=s_name) for s_name, s_frame in self.frame_raw.iteritems()]
 
 
 
@@ -147,10 +155,24 @@ class DBZController:
 			initializes players 
 		"""
 		assert self.num_players in [1, 2]
-		self.gesture_classifier = GestureClassifier(data_dir=self.data_dir)
+		self.gesture_classifier = GestureClassifier(data_dir=self.data_dir, cache_size=self.cache_size, cache_step=self.cache_step)
 		self.gesture_classifier.load_classifier()
-		self.players = [Player(ix, self.gesture_classifier) for ix in range(self.num_players)]
-		self.update_skeletons()
+		self.broadcaster = StateBroadcaster(self.num_players)
+		self.skeleton_tracker = SkeletonTracker(Player.DISTANCE_THRESHOLD)
+		self.players = [Player(ix, self.gesture_classifier, self.gesture_length, self.gesture_hop, self.broadcaster, self.make_joint_filter()) for ix in range(self.num_players)]
+		self.update_skeletons(realtime=True)
+
+
+	def make_joint_filter(self):
+		"""
+			returns a JointFilter for a player's sent coordinates (see 
+			Player), or None if neither smoothing nor predicting
+		"""
+		if not self.smoothing and not self.prediction_ms:
+			return None
+		if self.smoothing:
+			return JointFilter(prediction_ms=self.prediction_ms)
+		return JointFilter(prediction_ms=self.prediction_ms, min_cutoff=float('inf'))
 
 
 	def init_game(self):
@@ -159,11 +181,11 @@ class DBZController:
 			until there are at least two players present
 		"""
 		self.game_started = False
-		self.update_skeletons()
+		self.update_skeletons(realtime=True)
 
 		#=====[ Step 1: loop until we see all players	]=====
 		while (self.num_skeletons < self.num_players):
-			self.update_skeletons()
+			self.update_skeletons(realtime=True)
 
 		#=====[ Step 2: initialize (update) all players	]=====
 		self.update_players()
@@ -171,33 +193,81 @@ class DBZController:
 
 	def update_players(self):
 		"""
-			for each player, this will have them choose the 
-			best new location for their skeleton 
+			assigns this frame's skeletons to the players (see 
+			SkeletonTracker), then classifies the gestures of everyone 
+			who got updated
 		"""
 		skeleton_c_coords = copy(self.skeleton_poses_c)
-		for player in self.players:
-			player.update(skeleton_c_coords)
+		with metrics.timer('controller.track'):
+			is_updated = self.skeleton_tracker.update(self.players, skeleton_c_coords, self.frame_seq)
+		self.update_gestures([player for player, u in zip(self.players, is_updated) if u])
+
+
+	def update_gestures(self, players):
+		"""
+			featurizes the h_coords of all the given players into one 
+			matrix and classifies them with a single classifier call,
+			then hands each player its features and label
+		"""
+		if len(players) == 0:
+			return
+		with metrics.timer('controller.classify'):
+			X = self.gesture_classifier.featurize_batch([player.h_coords.positions for player in players])
+			labels, confidences = self.gesture_classifier.predict_batch(X)
+			for player, features, label in zip(players, X, labels):
+				player.update_gesture(features, label)
 
 
 	def send_player_states(self):
 		"""	
 			sends the states of players from Player objects to 
-			the actual phones 
+			the actual phones, and the game state to whoever wants it
 		"""
-		if self.num_players == 1:
-			self.players[0].send_state(None)
-		elif self.num_players == 2:
-			self.players[0].send_state(self.players[1])
-			self.players[1].send_state(self.players[0])			
+		with metrics.timer('controller.send'):
+			if self.num_players == 1:
+				self.players[0].send_state(None)
+			elif self.num_players == 2:
+				self.players[0].send_state(self.players[1])
+				self.players[1].send_state(self.players[0])
+			if self.broadcaster.has_subscribers(GAME_TOPIC):
+				self.broadcaster.send(GAME_TOPIC, self.get_game_state())
+			self.broadcaster.poll(0)
+
+
+	def get_game_state(self):
+		"""
+			returns the state of the whole game: the frame, and every 
+			player's last sent state
+		"""
+		return {
+					'frame_seq':self.frame_seq,
+					'players':[player.state_history[-1].to_message() if player.state_history else None for player in self.players]
+				}
+
+
+	def publish_frame(self, skeletons=None, seq=None, timestamp=None):
+		"""
+			publishes the skeletons and players of the current frame (or
+			of the one given) via self.communication_host
+		"""
+		with metrics.timer('controller.publish'):
+			self.communication_host.publish_frame(	self.frame_seq if seq is None else seq,
+													self.frame_timestamp if timestamp is None else timestamp,
+													self.skeleton_poses_c if skeletons is None else skeletons,
+													self.players)
 
 
 	def update_game(self, realtime=False):
 		"""
 			updates all player locations in the game;
 		"""
-		self.update_skeletons(realtime=realtime)
-		self.update_players()
-		self.send_player_states()
+		with metrics.timer('controller.frame'):
+			self.update_skeletons(realtime=realtime)
+			self.update_players()
+			self.send_player_states()
+			self.publish_frame()
+		metrics.increment('controller.frames')
+		metrics.maybe_dump()
 		# self.print_game_state()
 
 
@@ -230,21 +300,28 @@ class DBZController:
 
 
 	def record(self):
+		"""
+			records frames until KeyboardInterrupt into a Recording in
+			self.data_dir, written out as it goes; returns it loaded
+		"""
+		print "ENTER SAVE NAME: (in ./data/)"
+		save_name = raw_input('--> ')
+		if not save_name.endswith(Recording.EXTENSION):
+			save_name += Recording.EXTENSION
+		recording = Recording(os.path.join(self.data_dir, save_name)).create()
+
 		print "===[ Press Enter to Start ]==="
 		raw_input('--->')
-		raw_frames = []
 		while True:
 			try:
 				self.update_skeletons()
-				raw_frames.append(self.frame_raw)
+				recording.append(self.frame_raw, self.frame_timestamp)
 				print '.'
 			except KeyboardInterrupt:
 				break
 		print '===[ Finished self.debuging ]==='
-		print "ENTER SAVE NAME: (in ./data/)"
-		save_name = raw_input('--> ')
-		pickle.dump(raw_frames, open(os.path.join(self.data_dir, save_name), 'w'))
-		return raw_frames
+		print "[[ SAVED: %s ]]" % recording.path
+		return recording.close().load()
 
 
 	def record_gesture(self):
@@ -259,7 +336,14 @@ class DBZController:
 		if not os.path.exists(gesture_dir):
 			os.mkdir(gesture_dir)
 
-		#=====[ Step 2: self.debug each gesture	]=====
+		#=====[ Step 2: open the consolidated dataset, converting the .pose files if there is none yet	]=====
+		dataset = GestureDataset(os.path.join(self.data_dir, 'gesture_dataset'))
+		if dataset.exists():
+			dataset.load()
+		else:
+			dataset = GestureDataset.from_pose_dirs(gestures_dir, dataset.dataset_dir)
+
+		#=====[ Step 3: self.debug each gesture	]=====
 		player = self.players[0]
 		while True:
 			try:
@@ -272,14 +356,21 @@ class DBZController:
 				print self.skeleton_poses_c[0]
 				player.update(self.skeleton_poses_c)
 
-				h_coords = player.h_coords
-				c_coords = player.c_coords
+				h_coords = player.h_coords.to_df()
+				c_coords = player.c_coords.to_df()
 				coords = {'c_coords':c_coords, 'h_coords':h_coords}
 				filename = hashlib.md5(str(time.time())).hexdigest() + '.pose'
 				pickle.dump(coords, open(os.path.join(gesture_dir, filename), 'w'))
+				dataset.append(gesture_name, player.c_coords, player.h_coords)
+				try:
+					self.gesture_classifier.learn_gesture(gesture_name, [player.h_coords])
+				except TypeError:
+					logger.warning("classifier can't learn online; retrain it to use the new poses")
 				print "[[ SAVED: %s ]]" % os.path.join(gesture_dir, filename)
 			except KeyboardInterrupt:
 				break
+		if self.gesture_classifier.num_unsaved > 0:
+			self.gesture_classifier.save()
 
 
 
@@ -9,40 +9,56 @@ import sys
 import time
 import json
 import zmq
+import logging
 import threading
 from StoppableThread import StoppableThread
+from FrameBuffer import FrameBuffer
+import WireFormat
+from Metrics import metrics
 from parameters import *
 
+logger = logging.getLogger(__name__)
+
 
 class DeviceReceiver (StoppableThread):
     """
         class for receiving frames from a device; runs in its own thread.
         - start () to start getting frames (starts thread)
         - stop () to terminate frame-getting (terminates thread)
-        - get_frame () to get most recent frame
+        - get_frame () to get a frame ('latest', 'every' or 'batch' mode)
+        - get_record () to get the same, as FrameRecord(seq, timestamp, frame)
+        - get_stats () for received/decoded/dropped/overwritten counts
     """
 
     _name = "DeviceReceiver"
 
 
     #==========[ Constructor ]==========
-    def __init__ (self, _device_name):
+    def __init__ (self, _device_name, mode='latest', capacity=64):
         """ 
             PUBLIC: Constructor
             -------------------
             given device name, begins communication with device
+            mode: default read mode for get_frame (see FrameBuffer)
+            capacity: number of frames buffered between thread and reader
         """
         #=====[ Step 1: initialize StoppableThread ]=====
         StoppableThread.__init__ (self, self._name)
 
         #=====[ Step 2: IPC setup ]=====
-        self._new_frame_available = threading.Event ()
-        self.last_frame = None
+        if not mode in FrameBuffer.MODES:
+            raise TypeError ("Read mode not supported: " + mode)
+        self.mode = mode
+        self.frame_buffer = FrameBuffer (capacity)
+        self.num_received = 0
+        self.num_decoded = 0
 
         #===[ Step 3: verify/setup device ]===
         if not _device_name in device_filters.keys ():
             raise TypeError ("Device not supported: " + _device_name)
         self.device_name = _device_name
+        self.device_filter = device_filters[self.device_name]
+        self.wire_format = wire_formats.get (self.device_filter, 'json')
 
         #=====[ Step 4: connect to UDP ]=====
         self.zmq_init ()
@@ -72,7 +88,7 @@ class DeviceReceiver (StoppableThread):
         self.context = zmq.Context ()
         self.socket = self.context.socket(zmq.SUB)
         self.socket.connect (connect_parameters['connect_address'])
-        self.socket.setsockopt(zmq.SUBSCRIBE, device_filters[self.device_name])
+        self.socket.setsockopt(zmq.SUBSCRIBE, self.device_filter)
 
 
     def thread_iteration (self):
@@ -83,12 +99,14 @@ class DeviceReceiver (StoppableThread):
         """
         try:
             self.read_frame ()
-        except:
-            print "*** Note: dropped frame ***"
+        except Exception:
+            metrics.increment ('receiver.decode_errors')
+            logger.debug ("dropped frame (failed to decode %d so far)", self.num_received - self.num_decoded, exc_info=True)
 
 
 
-    def format_coords (self, d):
+    @classmethod
+    def format_coords (cls, d):
         """
             PRIVATE: format_coords
             ----------------------
@@ -97,7 +115,8 @@ class DeviceReceiver (StoppableThread):
         return {k:float(v) if not v in connect_parameters['none_substitutes'] else None for k, v in d.items()}
 
 
-    def format_frame_primesense (self, frame):
+    @classmethod
+    def format_frame_primesense (cls, frame):
         """
             PRIVATE: format_frame_primesense
             ---------------------------------
@@ -109,8 +128,8 @@ class DeviceReceiver (StoppableThread):
         for user, user_frame in frame.iteritems():
             formatted_frame[user] = {}
             for joint_name, data in user_frame.iteritems ():
-                position = self.format_coords(data['REAL_WORLD_POSITION'])
-                orientation = self.format_coords (data['ORIENTATION'])
+                position = cls.format_coords(data['REAL_WORLD_POSITION'])
+                orientation = cls.format_coords (data['ORIENTATION'])
                 formatted_frame[user][joint_name + "_POSITION"] = position
                 formatted_frame[user][joint_name + "_ORIENTATION"] = orientation
 
@@ -119,33 +138,82 @@ class DeviceReceiver (StoppableThread):
 
 
 
+    def decode_frame (self, message):
+        """
+            PRIVATE: decode_frame
+            ---------------------
+            given a zmq message (topic prefix included), returns the frame
+            as a dict mapping skeleton name -> joint dict (json) or 
+            skeleton name -> Skeleton (binary, zero-copy)
+        """
+        if self.wire_format == 'binary':
+            frame_index, frame = WireFormat.decode_frame (message.buffer, len(self.device_filter))
+            return frame
+        else:
+            raw_frame = json.loads (message.bytes[len(self.device_filter):])
+            return self.format_frame_primesense (raw_frame)
+
+
     def read_frame (self):
         """
             PRIVATE: read_frame
             -------------------
             grabs a frame from device communication channel
-            sets self.last_frame, self._new_frame_available
+            and puts it in self.frame_buffer, stamped with its receive time
         """
-        #==========[ Step 1: get raw json dict ]==========
-        raw_frame  = json.loads(self.socket.recv ()[len(device_filters[self.device_name]):])
+        #==========[ Step 1: get raw message ]==========
+        message = self.socket.recv (copy=False)
+        timestamp = time.time ()
+        self.num_received += 1
 
-        #==========[ Step 2: reformat ]==========
-        formatted_frame = self.format_frame_primesense (raw_frame)
+        #==========[ Step 2: decode/reformat ]==========
+        with metrics.timer ('receiver.decode'):
+            formatted_frame = self.decode_frame (message)
+        self.num_decoded += 1
+        metrics.increment ('receiver.decoded')
 
         #==========[ Step 3: store/update ]==========
-        self.last_frame = formatted_frame
-        self._new_frame_available.set()
+        self.frame_buffer.put (formatted_frame, timestamp)
 
 
-    def get_frame (self):
+    def get_record (self, mode=None, timeout=None):
+        """
+            PUBLIC: get_record
+            ------------------
+            blocks until a new frame is available, then returns a 
+            FrameRecord(seq, timestamp, frame) - or a list of them in 
+            'batch' mode. mode defaults to self.mode
+        """
+        return self.frame_buffer.get (mode or self.mode, timeout)
+
+
+    def get_frame (self, mode=None, timeout=None):
         """
             PUBLIC: get_frame
             -----------------
             blocks until a new frame is available, then returns it
+            (a list of frames in 'batch' mode)
+        """
+        record = self.get_record (mode, timeout)
+        if isinstance (record, list):
+            return [r.frame for r in record]
+        return None if record is None else record.frame
+
+
+    def get_stats (self):
+        """
+            PUBLIC: get_stats
+            -----------------
+            returns counts of frames received off the socket, decoded,
+            dropped (skipped by 'latest' reads) and overwritten (lost to
+            the ring wrapping before they were read)
         """
-        self._new_frame_available.wait ()
-        self._new_frame_available.clear ()
-        return self.last_frame
+        return {
+                    'received':self.num_received,
+                    'decoded':self.num_decoded,
+                    'dropped':self.frame_buffer.dropped,
+                    'overwritten':self.frame_buffer.overwritten
+                }
 
 
 
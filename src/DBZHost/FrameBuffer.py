@@ -0,0 +1,135 @@
+#-------------------------------------------------- #
+# Class: FrameBuffer
+# ------------------
+# bounded ring of timestamped, sequence-numbered
+# frames between a receiver thread and the game loop
+#-------------------------------------------------- #
+import time
+import threading
+from collections import namedtuple
+
+FrameRecord = namedtuple('FrameRecord', ['seq', 'timestamp', 'frame'])
+
+
+class FrameBuffer(object):
+	"""
+		Class: FrameBuffer
+		==================
+		single-producer ring buffer; the receiver thread put()s frames, the
+		game loop reads them in one of three modes:
+
+			- 'latest': newest frame only; anything older is counted as dropped
+			- 'every': oldest unread frame, so no frame is skipped unless the
+				ring wrapped around (counted as overwritten)
+			- 'batch': every unread frame at once, oldest first
+
+		No locks on the data path: a slot is filled before write_seq is
+		bumped, and each slot assignment is atomic under the GIL. Readers
+		check a slot's seq to detect frames overwritten while they read.
+		The event is only used to wake up a blocked reader.
+	"""
+	MODES = ('latest', 'every', 'batch')
+
+
+	def __init__(self, capacity=64):
+		self.capacity = capacity
+		self.slots = [None] * capacity
+		self.write_seq = 0		# seq of the next frame to be written
+		self.read_seq = 0		# seq of the next frame to be read
+		self.dropped = 0		# frames skipped over by 'latest' reads
+		self.overwritten = 0	# frames lost to the ring wrapping before being read
+		self._available = threading.Event()
+
+
+	def put(self, frame, timestamp=None):
+		"""
+			adds a frame to the ring, returns its seq
+		"""
+		seq = self.write_seq
+		self.slots[seq % self.capacity] = FrameRecord(seq, timestamp or time.time(), frame)
+		self.write_seq = seq + 1
+		self._available.set()
+		return seq
+
+
+	def wait(self, timeout=None):
+		"""
+			blocks until there is an unread frame; returns False on timeout
+		"""
+		while self.read_seq >= self.write_seq:
+			if not self._available.wait(timeout) and timeout is not None:
+				return False
+			self._available.clear()
+		return True
+
+
+	def skip_overwritten(self):
+		"""
+			moves read_seq past anything the producer has already overwritten
+		"""
+		oldest = self.write_seq - self.capacity
+		if self.read_seq < oldest:
+			self.overwritten += oldest - self.read_seq
+			self.read_seq = oldest
+
+
+	def read_slot(self, seq):
+		"""
+			returns the record for seq, or None if it was overwritten meanwhile
+		"""
+		record = self.slots[seq % self.capacity]
+		if record is None or record.seq != seq:
+			return None
+		return record
+
+
+	def get_latest(self):
+		"""
+			returns the newest record, marking everything older as dropped
+		"""
+		while True:
+			seq = self.write_seq - 1
+			record = self.read_slot(seq)
+			if not record is None:
+				self.dropped += max(0, seq - max(self.read_seq, seq - self.capacity + 1))
+				self.overwritten += max(0, seq - self.capacity + 1 - self.read_seq)
+				self.read_seq = seq + 1
+				return record
+
+
+	def get_next(self):
+		"""
+			returns the oldest unread record
+		"""
+		while True:
+			self.skip_overwritten()
+			record = self.read_slot(self.read_seq)
+			if not record is None:
+				self.read_seq += 1
+				return record
+
+
+	def drain(self):
+		"""
+			returns all unread records, oldest first
+		"""
+		records = []
+		while self.read_seq < self.write_seq:
+			records.append(self.get_next())
+		return records
+
+
+	def get(self, mode='latest', timeout=None):
+		"""
+			blocks until a frame is available, then returns a record (or a
+			list of them for 'batch') according to mode; None on timeout
+		"""
+		if not self.wait(timeout):
+			return None
+		if mode == 'latest':
+			return self.get_latest()
+		elif mode == 'every':
+			return self.get_next()
+		elif mode == 'batch':
+			return self.drain()
+		raise ValueError("Unknown read mode: %s" % mode)
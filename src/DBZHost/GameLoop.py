@@ -0,0 +1,124 @@
+#-------------------------------------------------- #
+# Class: GameLoop
+# ---------------
+# event loop alternative to calling
+# DBZController.update_game in a loop
+#-------------------------------------------------- #
+from collections import deque
+from Metrics import metrics
+
+
+class GameLoop(object):
+	"""
+		Class: GameLoop
+		===============
+		runs a DBZController as a single-threaded, select()-based event
+		loop, with three steps connected by bounded queues:
+
+			- ingest: moves every frame the receiver has into self.frames
+				(at most frame_queue_size; when full, the oldest is dropped)
+			- process: tracks/classifies the oldest queued frame, and queues
+				the states on the controller's StateBroadcaster
+			- fan_out: lets the broadcaster accept clients and write to every
+				client that select() says is writable
+
+		None of the steps block on a client: each client of the broadcaster
+		has its own bounded outbox and drops messages if it is too slow,
+		so the tracker keeps up with the sensor regardless.
+
+		Ideal Operation:
+		----------------
+
+			controller = DBZController(num_players=1)
+			GameLoop(controller).run()
+	"""
+	FRAME_QUEUE_SIZE = 2
+	POLL_INTERVAL = 0.001
+
+
+	def __init__(self, controller, frame_queue_size=FRAME_QUEUE_SIZE, poll_interval=POLL_INTERVAL):
+		self.controller = controller
+		self.frames = deque(maxlen=frame_queue_size)
+		self.poll_interval = poll_interval
+		self.num_processed = 0
+		self.num_dropped = 0
+		self.running = False
+
+
+
+	################################################################################
+	####################[ STEPS ]###################################################
+	################################################################################
+
+	def ingest(self, timeout=0):
+		"""
+			waits up to timeout for the receiver, then queues all of its
+			unread frames
+		"""
+		records = self.controller.receiver.get_record('batch', timeout)
+		for record in records or []:
+			if len(self.frames) == self.frames.maxlen:
+				self.num_dropped += 1
+				metrics.increment('loop.frames_dropped')
+			self.frames.append(record)
+
+
+	def process(self):
+		"""
+			runs the oldest queued frame through tracking/classification and
+			queues the resulting player states
+		"""
+		record = self.frames.popleft()
+		with metrics.timer('controller.frame'):
+			self.controller.set_frame(record)
+			self.controller.update_players()
+			self.controller.send_player_states()
+			self.controller.publish_frame()
+		metrics.increment('controller.frames')
+		self.num_processed += 1
+
+
+	def fan_out(self, timeout=0):
+		"""
+			waits up to timeout for sockets to become ready, then accepts
+			waiting clients and writes to the writable ones
+		"""
+		self.controller.broadcaster.poll(timeout)
+
+
+
+	################################################################################
+	####################[ RUNNING ]#################################################
+	################################################################################
+
+	def step(self):
+		"""
+			one turn of the loop; only waits (up to poll_interval, for the
+			receiver) when there is no frame queued
+		"""
+		self.ingest(0 if len(self.frames) > 0 else self.poll_interval)
+		if len(self.frames) > 0:
+			self.process()
+		self.fan_out(0)
+		metrics.maybe_dump()
+
+
+	def run(self, max_frames=None):
+		"""
+			steps until stop() (or KeyboardInterrupt), max_frames frames were
+			processed, or a replay is over
+		"""
+		self.running = True
+		has_frames = getattr(self.controller.receiver, 'has_frames', lambda: True)
+		try:
+			while self.running and (max_frames is None or self.num_processed < max_frames):
+				if len(self.frames) == 0 and not has_frames():
+					break
+				self.step()
+		except KeyboardInterrupt:
+			pass
+		self.running = False
+
+
+	def stop(self):
+		self.running = False
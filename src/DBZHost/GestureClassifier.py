@@ -1,60 +1,94 @@
 import os
+import time
 import pickle
+import logging
+import threading
+from copy import copy
 import numpy as np
-import pandas as pd
-import sklearn 
-from sklearn import cross_validation
-from sklearn.svm import SVC, NuSVC
-from sklearn.neighbors import KNeighborsClassifier
-from sklearn.linear_model import LogisticRegression
-from sklearn.metrics import confusion_matrix
-from sklearn.decomposition import PCA, SparsePCA, DictionaryLearning
-from sklearn.naive_bayes import MultinomialNB
-import matplotlib.pyplot as plt
+from Skeleton import Skeleton, JOINT_INDEX, NUM_JOINTS
+from GestureIndex import GestureIndex
+from GestureDataset import GestureDataset
+from CompiledClassifier import CompiledClassifier, compile_estimator, EXTENSION as COMPILED_EXTENSION
+from PredictionCache import PredictionCache, STEP as CACHE_STEP
+from Metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+#=====[ features derived from the joints, in order: name, function of (N, NUM_JOINTS, 3) positions -> (N, 3)	]=====
+DERIVED_FEATURES = [
+						('hands_avg', lambda p: (p[:, JOINT_INDEX['right_hand']] + p[:, JOINT_INDEX['left_hand']])/2.),
+						('elbows_avg', lambda p: (p[:, JOINT_INDEX['right_elbow']] + p[:, JOINT_INDEX['left_elbow']])/2.),
+						('hands_diff', lambda p: np.abs(p[:, JOINT_INDEX['right_hand']] - p[:, JOINT_INDEX['left_hand']])),
+					]
+
 
 class GestureClassifier:
 
 	GESTURE_CONFIDENCE_THRESHOLD = 0.9
+	N_NEIGHBORS = 2
+	SNAPSHOT_INTERVAL = 60.		# seconds between snapshots of a classifier that learned online
 
-	def __init__(self, data_dir=os.path.join(os.getcwd(), 'data'), classifier_name='clf.pkl'):
+	def __init__(self, data_dir=os.path.join(os.getcwd(), 'data'), classifier_name='clf.pkl', algorithm='brute', cache_size=0, cache_step=CACHE_STEP, sequence_classifier_name='seq_clf.pkl'):
 		self.data_dir = data_dir
 		self.gestures_dir = os.path.join(self.data_dir, 'gestures')
+		self.dataset_dir = os.path.join(self.data_dir, 'gesture_dataset')
 		self.classifiers_dir = os.path.join(self.data_dir, 'classifiers')
 		self.classifier_path = os.path.join(self.classifiers_dir, classifier_name)
+		self.compiled_path = os.path.splitext(self.classifier_path)[0] + COMPILED_EXTENSION
+		self.sequence_classifier_path = os.path.join(self.classifiers_dir, sequence_classifier_name)
+		self.algorithm = algorithm
+
+		#=====[ motion over a window of frames (see SequenceClassifier); None if none was trained	]=====
+		self.sequence_classifier = None
 
 		self.data_loaded = False
 		self.classifier_loaded = False
 
+		#=====[ online learning	]=====
+		self.learn_lock = threading.Lock()
+		self.num_unsaved = 0
+		self.last_snapshot = time.time()
+
+		#=====[ predictions of (nearly) repeated poses: see PredictionCache; off if cache_size is 0	]=====
+		self.cache = PredictionCache(cache_size, cache_step) if cache_size > 0 else None
+
 	################################################################################
 	####################[ LOADING/FORMATTING DATA ]#################################
 	################################################################################
 
-	def featurize(self, gesture_df):
+	def featurize_batch(self, positions):
 		"""
-			given a gesture represented as a dataframe, this will return a numpy 
-			array as a feature vector
+			given the (N, NUM_JOINTS, 3) joint positions of N poses, returns
+			their (N, num_features) feature matrix: the joints followed by
+			DERIVED_FEATURES, laid out coordinate-major (all x's, then all
+			y's, then all z's) to match the old dataframe featurization.
+			Training and live classification both go through here.
 		"""
-		gesture_df = gesture_df.copy()
+		positions = np.asarray(positions)
+		columns = [positions] + [feature(positions)[:, np.newaxis, :] for name, feature in DERIVED_FEATURES]
+		return np.concatenate(columns, axis=1).transpose(0, 2, 1).reshape(len(positions), -1)
 
-		#=====[ Experiment: relative positions	]=====
-		gesture_df['hands_avg'] = (gesture_df['right_hand'] + gesture_df['left_hand'])/2.
-		gesture_df['elbows_avg'] = (gesture_df['right_elbow'] + gesture_df['left_elbow'])/2.
-		gesture_df['hands_diff'] = np.abs(gesture_df['right_hand'] - gesture_df['left_hand'])
 
-		return np.array(gesture_df).flatten()
+	def featurize(self, gesture):
+		"""
+			given a gesture represented as a Skeleton, this will return a numpy 
+			array as a feature vector (see featurize_batch)
+		"""
+		return self.featurize_batch(gesture.positions[np.newaxis])[0]
 
 
 	def load_gesture_data(self, gesture_name):
 		"""
-			returns c_dfs, h_dfs
-			each is a list of dataframes representing the body in body, human
+			returns c_skeletons, h_skeletons
+			each is a list of Skeletons representing the body in body, human
 			coordinates
 		"""
 		gesture_dir = self.gesture_directories[gesture_name]
 		dicts = [pickle.load(open(os.path.join(gesture_dir, fn))) for fn in os.listdir(gesture_dir)]
-		c_dfs = [d['c_coords'] for d in dicts]
-		h_dfs = [d['h_coords'] for d in dicts]
-		return c_dfs, h_dfs
+		c_skeletons = [Skeleton.from_df(d['c_coords']) for d in dicts]
+		h_skeletons = [Skeleton.from_df(d['h_coords']) for d in dicts]
+		return c_skeletons, h_skeletons
 
 
 	def get_X_y(self):
@@ -62,9 +96,9 @@ class GestureClassifier:
 			goes from self.data -> featurized X and y matrices for prediction 
 		"""
 		Xs, ys = [], []
-		for name, dfs_dict in self.data.items():
-			h_dfs = dfs_dict['h_coords']
-			data = np.matrix([self.featurize(df) for df in h_dfs])
+		for name, skeletons_dict in self.data.items():
+			h_skeletons = skeletons_dict['h_coords']
+			data = self.featurize_batch(np.array([s.positions for s in h_skeletons]).reshape(-1, NUM_JOINTS, 3))
 			Xs.append(data)
 			ys.append(np.array([name]*data.shape[0]))
 		self.X = np.concatenate(Xs)
@@ -75,26 +109,54 @@ class GestureClassifier:
 	def load_data(self):
 		"""
 			sets self.data to a dict mapping as follows:
-				self.data: gesture_name -> numpy matrix
+				self.data: gesture_name -> {'c_coords':[Skeleton], 'h_coords':[Skeleton]}
 			also sets self.X, self.y for training and whatnot
+
+			reads the consolidated dataset in self.dataset_dir if there is one
+			(see convert_data), the .pose files in self.gestures_dir otherwise
 		"""
 		if not self.data_loaded:
-			self.gesture_names = os.listdir(self.gestures_dir)
-			self.gesture_directories = {name:os.path.join(self.gestures_dir, name) for name in os.listdir(self.gestures_dir)}
 			self.data = {}
-			for name in self.gesture_names:
-				c_dfs, h_dfs = self.load_gesture_data(name)
-				self.data[name] = {'c_coords':c_dfs, 'h_coords':h_dfs}
+			dataset = GestureDataset(self.dataset_dir)
+			if dataset.exists():
+				dataset.load()
+				self.gesture_names = dataset.gesture_names
+				for name in self.gesture_names:
+					c_skeletons, h_skeletons = dataset.skeletons(name)
+					self.data[name] = {'c_coords':c_skeletons, 'h_coords':h_skeletons}
+			else:
+				self.gesture_names = os.listdir(self.gestures_dir)
+				self.gesture_directories = {name:os.path.join(self.gestures_dir, name) for name in os.listdir(self.gestures_dir)}
+				for name in self.gesture_names:
+					c_skeletons, h_skeletons = self.load_gesture_data(name)
+					self.data[name] = {'c_coords':c_skeletons, 'h_coords':h_skeletons}
 			self.X, self.y = self.get_X_y ()
 			self.data_loaded = True
 
 
+	def convert_data(self):
+		"""
+			(re)builds the consolidated dataset in self.dataset_dir from the
+			.pose files in self.gestures_dir
+		"""
+		self.data_loaded = False
+		return GestureDataset.from_pose_dirs(self.gestures_dir, self.dataset_dir)
+
+
 	def load_classifier(self):
 		"""
-			loads self.classifier 
+			loads self.classifier: the compiled one (see export) if there
+			is one, which needs neither pickle nor sklearn; the pickled
+			estimator otherwise. Also loads self.sequence_classifier, if
+			one was trained (see bin/train_sequence_classifier.py)
 		"""
 		if not self.classifier_loaded:
-			self.classifier = pickle.load(open(self.classifier_path, 'r'))
+			if os.path.exists(self.compiled_path):
+				self.classifier = CompiledClassifier.load(self.compiled_path)
+			else:
+				self.classifier = pickle.load(open(self.classifier_path, 'r'))
+			if os.path.exists(self.sequence_classifier_path):
+				self.sequence_classifier = pickle.load(open(self.sequence_classifier_path, 'r'))
 			self.classifier_loaded = True
 
 
@@ -110,96 +172,189 @@ class GestureClassifier:
 			trains classifier based on all data available
 		"""
 		self.load_data()
-		self.classifier = KNeighborsClassifier(n_neighbors=2)
+		self.classifier = GestureIndex(n_neighbors=self.N_NEIGHBORS, algorithm=self.algorithm)
 		# self.classifier = LogisticRegression()
 		self.classifier.fit(self.X, self.y)
 		self.classifier_loaded = True
 
 
-	def predict(self, gesture_df):
+	def predict_batch(self, X):
 		"""
-			returns a prediction based on the pose 
+			given a matrix of featurized poses, returns (labels, confidences)
+			from a single classifier query; labels under 
+			GESTURE_CONFIDENCE_THRESHOLD become 'no_gesture'
 		"""
 		assert self.classifier_loaded
-		prob_predicitons = self.classifier.predict_proba(self.featurize(gesture_df))
-		if not np.max(prob_predicitons) > self.GESTURE_CONFIDENCE_THRESHOLD:
-			return ['no_gesture']
-		else:
-			return self.classifier.predict(self.featurize(gesture_df))
+		X = np.atleast_2d(np.asarray(X))
+		classifier = self.classifier		# (learn may swap it in the meantime)
+		with metrics.timer('classifier.predict'):
+			if self.cache is None:
+				labels, confidences = self.query(classifier, X)
+			else:
+				labels, confidences, missing = self.cache.get(classifier, X)
+				if len(missing) > 0:
+					labels[missing], confidences[missing] = self.query(classifier, X[missing])
+					self.cache.put(classifier, X[missing], labels[missing], confidences[missing])
+		labels = labels.astype(object)
+		labels[~(confidences > self.GESTURE_CONFIDENCE_THRESHOLD)] = 'no_gesture'
+		return labels, confidences
+
+
+	@staticmethod
+	def query(classifier, X):
+		"""
+			returns (labels, confidences) of classifier for the rows of X
+		"""
+		if hasattr(classifier, 'query'):
+			return classifier.query(X)
+
+		#=====[ plain sklearn classifiers (e.g. older pickles): one predict_proba	]=====
+		probs = classifier.predict_proba(X)
+		return classifier.classes_[probs.argmax(axis=1)], probs.max(axis=1)
+
+
+	def predict_features(self, features):
+		"""
+			returns a prediction based on an already-featurized pose
+		"""
+		return self.predict_batch(features)[0]
+
+
+	def predict(self, gesture):
+		"""
+			returns a prediction based on the pose (a Skeleton in h_coords)
+		"""
+		return self.predict_features(self.featurize(gesture))
 
 
 	def save(self):
 		"""
-			saves the current classifier 
+			saves the current classifier, pickled and exported (if it can
+			be compiled; a stale export is removed otherwise). One that was
+			loaded compiled is only exported.
 		"""
+		self.num_unsaved, self.last_snapshot = 0, time.time()
+		if isinstance(self.classifier, CompiledClassifier):
+			return self.export()
 		pickle.dump(self.classifier, open(self.classifier_path, 'w'))
+		try:
+			self.export()
+		except TypeError:
+			logger.warning("%s can't be compiled; live play will load the pickle", type(self.classifier).__name__)
+			if os.path.exists(self.compiled_path):
+				os.remove(self.compiled_path)
+
+
+	def export(self):
+		"""
+			compiles the current classifier into a CompiledClassifier and
+			saves it to self.compiled_path; returns it
+		"""
+		assert self.classifier_loaded
+		compiled = compile_estimator(self.classifier)
+		compiled.save(self.compiled_path)
+		return compiled
 
 
 
 
 
 	################################################################################
-	####################[ EVALUATION/CROSSVALIDATION ]##############################
+	####################[ ONLINE LEARNING ]#########################################
 	################################################################################
 
-	def evaluate_models(self):
+	def learn(self, X, y):
 		"""
-			evaluates the model 
+			adds featurized poses X, labelled y, to the live classifier
+			without retraining it (see GestureIndex.partial_fit); a new
+			label adds a gesture. Costs O(len(X)), bar the snapshot.
+
+			the update goes into a copy that then replaces self.classifier,
+			so predictions running meanwhile see either the old model or the
+			new one. Pipeline workers in other processes keep their own copy.
 		"""
-		#=====[ Step 1: Get X, y	]=====
-		self.load_data()
-		X, y = self.X, self.y
+		assert self.classifier_loaded
+		if not hasattr(self.classifier, 'partial_fit'):
+			raise TypeError("%s can't learn online; retrain it" % type(self.classifier).__name__)
+		with self.learn_lock:
+			with metrics.timer('classifier.learn'):
+				classifier = copy(self.classifier)
+				classifier.partial_fit(np.atleast_2d(np.asarray(X)), np.atleast_1d(y))
+				self.classifier = classifier
+			self.num_unsaved += len(np.atleast_1d(y))
+			self.maybe_snapshot()
+
+
+	def learn_gesture(self, gesture_name, h_skeletons):
+		"""
+			adds poses (Skeletons in h_coords) of gesture_name to the live
+			classifier; see learn
+		"""
+		self.learn(self.featurize_batch([s.positions for s in h_skeletons]), [gesture_name] * len(h_skeletons))
 
-		clf_log = LogisticRegression()
-		clf_knn = KNeighborsClassifier(n_neighbors=5)
-		clf_nb = MultinomialNB()
 
-		#=====[ Step 2: Cross Validation	]=====
-		print '===[ RAW DATA ]==='
-		scores_log = cross_validation.cross_val_score(clf_log, X, y)
-		scores_knn = cross_validation.cross_val_score(clf_knn, X, y)
-		print 'LOG: ', scores_log
-		print 'KNN: ', scores_knn
+	def maybe_snapshot(self):
+		"""
+			saves the classifier if it learned something and the last
+			snapshot is over SNAPSHOT_INTERVAL old
+		"""
+		if self.num_unsaved > 0 and time.time() - self.last_snapshot >= self.SNAPSHOT_INTERVAL:
+			logger.info("snapshotting classifier (%d new samples)", self.num_unsaved)
+			self.save()
 
-		
 
 
-		######[ DIMENSIONALITY REDUCTION: PCA	]#####
-		print '===[ With PCA ]==='
-		X_PCA = PCA(n_components=10).fit_transform(X)
-		scores_log = cross_validation.cross_val_score(clf_log, X_PCA, y)
-		scores_knn = cross_validation.cross_val_score(clf_knn, X_PCA, y)
-		print 'LOG: ', scores_log
-		print 'KNN: ', scores_knn
 
-		# print '===[ With Dictionary Learning ]==='
-		# X_DL = DictionaryLearning(n_components=10).fit_transform(X)
-		# scores_log = cross_validation.cross_val_score(clf_log, X_DL, y)
-		# scores_knn = cross_validation.cross_val_score(clf_knn, X_DL, y)
-		# scores_nb = cross_validation.cross_val_score(clf_nb, X_DL, y)
-		# print 'LOG: ', scores_log
-		# print 'KNN: ', scores_knn
-		# print 'NB: ', scores_nb
 
+	################################################################################
+	####################[ EVALUATION/CROSSVALIDATION ]##############################
+	################################################################################
+	# (sklearn and matplotlib are only imported here, so that playing doesn't
+	# have to load them)
+
+	def evaluate_models(self, workers=None, folds=3, output=None, plot=True):
+		"""
+			cross-validates the candidate models (see ModelSelection) in
+			parallel and prints them ranked by accuracy and latency; writes
+			the report to output (json) if given, and plots the confusion
+			matrix of the top-ranked one on its held-out fold if plot
+		"""
+		from ModelSelection import ModelSelector
+		from sklearn.metrics import confusion_matrix
+
+		#=====[ Step 1: Get X, y	]=====
+		self.load_data()
+
+		#=====[ Step 2: Cross Validation	]=====
+		selector = ModelSelector(self.X, self.y, folds=folds, workers=workers)
+		selector.run()
+		selector.print_report()
+		if not output is None:
+			selector.save(output)
+			print "[[ SAVED: %s ]]" % output
 
 		#=====[ Step 3: check out confusion matrix	]=====
-		X_train, X_test, y_train, y_test = cross_validation.train_test_split(X, y, test_size=0.4, random_state=0)
-		y_pred = clf_log.fit(X_train, y_train).predict(X_test)
-		cm = confusion_matrix(y_test, y_pred)
-		plt.matshow(cm)
-		plt.title('Confusion matrix')
-		plt.colorbar()
-		plt.ylabel('True label')
-		plt.xlabel('Predicted label')
-		plt.show()
+		if plot:
+			import matplotlib.pyplot as plt
+			name, estimator = selector.best()
+			test = selector.folds[0][1]
+			cm = confusion_matrix(self.y[test], estimator.predict(self.X[test]))
+			plt.matshow(cm)
+			plt.title('Confusion matrix: ' + name)
+			plt.colorbar()
+			plt.ylabel('True label')
+			plt.xlabel('Predicted label')
+			plt.show()
+		return selector.report
 
 
 	def evaluate_self(self):
 		"""
 			evaluates only the currently loaded classifier 
 		"""
+		from sklearn.model_selection import cross_val_score
 		assert self.classifier_loaded
-		scores = cross_validation.cross_val_score(self.classifier, self.X, self.y)
+		scores = cross_val_score(self.classifier, self.X, self.y)
 		print "CROSS VALIDATION SCORES:"
 		print scores
 
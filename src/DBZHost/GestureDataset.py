@@ -0,0 +1,215 @@
+#-------------------------------------------------- #
+# Class: GestureDataset
+# ---------------------
+# consolidated, memory-mapped on-disk store of
+# recorded gesture poses
+#-------------------------------------------------- #
+import os
+import json
+import pickle
+import numpy as np
+from Skeleton import Skeleton, JOINT_NAMES, NUM_JOINTS, COORD_NAMES
+
+
+class GestureDataset(object):
+	"""
+		Class: GestureDataset
+		=====================
+		all recorded poses of a gesture in one flat float32 file,
+		<dataset_dir>/<gesture_name>.f32, of shape (num_poses, 2, NUM_JOINTS, 3):
+		c_coords then h_coords positions of every pose, rows in JOINT_NAMES
+		order. index.json holds the gesture names and the record layout.
+
+		Files are append-only: a pose is one contiguous record written at
+		the end, and the number of poses is read off the file size, so a
+		record cut short by a crash is simply ignored.
+
+		Ideal Operation:
+		----------------
+
+			dataset = GestureDataset.from_pose_dirs('../data/gestures', '../data/gesture_dataset')
+			dataset = GestureDataset('../data/gesture_dataset').load()
+			dataset.h_coords('blast')		# -> memmap of shape (num_poses, NUM_JOINTS, 3)
+			dataset.append('blast', c_coords, h_coords)
+	"""
+	VERSION = 1
+	DTYPE = np.float32
+	RECORD_SHAPE = (2, NUM_JOINTS, 3)
+	INDEX_NAME = 'index.json'
+	EXTENSION = '.f32'
+
+
+	def __init__(self, dataset_dir):
+		self.dataset_dir = dataset_dir
+		self.index_path = os.path.join(dataset_dir, self.INDEX_NAME)
+		self.record_size = int(np.prod(self.RECORD_SHAPE)) * np.dtype(self.DTYPE).itemsize
+		self.gesture_names = []
+		self.arrays = {}
+
+
+	def exists(self):
+		return os.path.exists(self.index_path)
+
+
+	def gesture_path(self, gesture_name):
+		return os.path.join(self.dataset_dir, gesture_name + self.EXTENSION)
+
+
+
+	################################################################################
+	####################[ INDEX ]###################################################
+	################################################################################
+
+	def read_index(self):
+		"""
+			loads self.gesture_names from index.json, checking the layout
+		"""
+		index = json.load(open(self.index_path))
+		if index['version'] != self.VERSION or tuple(index['joint_names']) != JOINT_NAMES:
+			raise ValueError("Incompatible gesture dataset: %s" % self.index_path)
+		self.gesture_names = [str(name) for name in index['gesture_names']]
+
+
+	def write_index(self):
+		"""
+			writes index.json; goes through a temporary file so that an
+			interrupted write never leaves a corrupt index behind
+		"""
+		index = {
+					'version':self.VERSION,
+					'dtype':np.dtype(self.DTYPE).name,
+					'record_shape':self.RECORD_SHAPE,
+					'joint_names':JOINT_NAMES,
+					'coord_names':COORD_NAMES,
+					'gesture_names':self.gesture_names
+				}
+		tmp_path = self.index_path + '.tmp'
+		json.dump(index, open(tmp_path, 'w'), indent=4)
+		os.rename(tmp_path, self.index_path)
+
+
+	def create(self):
+		"""
+			makes an empty dataset at self.dataset_dir
+		"""
+		if not os.path.exists(self.dataset_dir):
+			os.makedirs(self.dataset_dir)
+		self.gesture_names = []
+		self.arrays = {}
+		self.write_index()
+		return self
+
+
+
+	################################################################################
+	####################[ READING ]#################################################
+	################################################################################
+
+	def load(self):
+		"""
+			memory-maps every gesture's file; nothing is read until used
+		"""
+		self.read_index()
+		self.arrays = {name:self.map_gesture(name) for name in self.gesture_names}
+		return self
+
+
+	def map_gesture(self, gesture_name):
+		"""
+			returns a read-only memmap over the complete records of gesture_name
+		"""
+		path = self.gesture_path(gesture_name)
+		num_poses = os.path.getsize(path) // self.record_size if os.path.exists(path) else 0
+		if num_poses == 0:
+			return np.zeros((0,) + self.RECORD_SHAPE, dtype=self.DTYPE)
+		return np.memmap(path, dtype=self.DTYPE, mode='r', shape=(num_poses,) + self.RECORD_SHAPE)
+
+
+	def __len__(self):
+		return sum(len(a) for a in self.arrays.values())
+
+
+	def c_coords(self, gesture_name):
+		"""
+			returns the c_coords positions of gesture_name, (num_poses, NUM_JOINTS, 3)
+		"""
+		return self.arrays[gesture_name][:, 0]
+
+
+	def h_coords(self, gesture_name):
+		"""
+			returns the h_coords positions of gesture_name, (num_poses, NUM_JOINTS, 3)
+		"""
+		return self.arrays[gesture_name][:, 1]
+
+
+	def skeletons(self, gesture_name):
+		"""
+			returns c_skeletons, h_skeletons: lists of Skeletons, as
+			GestureClassifier.load_gesture_data does
+		"""
+		c_skeletons = [Skeleton(p) for p in self.c_coords(gesture_name)]
+		h_skeletons = [Skeleton(p) for p in self.h_coords(gesture_name)]
+		return c_skeletons, h_skeletons
+
+
+
+	################################################################################
+	####################[ WRITING ]#################################################
+	################################################################################
+
+	def append(self, gesture_name, c_coords, h_coords):
+		"""
+			appends one pose (given as Skeletons or (NUM_JOINTS, 3) arrays)
+			to gesture_name, adding the gesture if it is new
+		"""
+		c_coords = getattr(c_coords, 'positions', c_coords)
+		h_coords = getattr(h_coords, 'positions', h_coords)
+		self.append_positions(gesture_name, np.array([[c_coords, h_coords]], dtype=self.DTYPE))
+
+
+	def append_positions(self, gesture_name, records):
+		"""
+			appends an array of records, shape (num_poses, 2, NUM_JOINTS, 3)
+		"""
+		records = np.ascontiguousarray(records, dtype=self.DTYPE).reshape((-1,) + self.RECORD_SHAPE)
+		path = self.gesture_path(gesture_name)
+
+		#=====[ drop a partial record left by an interrupted append	]=====
+		if os.path.exists(path) and os.path.getsize(path) % self.record_size != 0:
+			with open(path, 'r+b') as f:
+				f.truncate(os.path.getsize(path) // self.record_size * self.record_size)
+
+		with open(path, 'ab') as f:
+			f.write(records.tobytes())
+			f.flush()
+			os.fsync(f.fileno())
+
+		if not gesture_name in self.gesture_names:
+			self.gesture_names.append(gesture_name)
+			self.write_index()
+		self.arrays[gesture_name] = self.map_gesture(gesture_name)
+
+
+	@classmethod
+	def from_pose_dirs(cls, gestures_dir, dataset_dir):
+		"""
+			converts a directory of .pose directories (gestures_dir/<gesture_name>/*.pose)
+			into a new dataset at dataset_dir, replacing whatever was there
+		"""
+		dataset = cls(dataset_dir).create()
+		for gesture_name in sorted(os.listdir(gestures_dir)):
+			gesture_dir = os.path.join(gestures_dir, gesture_name)
+			if not os.path.isdir(gesture_dir):
+				continue
+			if os.path.exists(dataset.gesture_path(gesture_name)):
+				os.remove(dataset.gesture_path(gesture_name))
+
+			records = []
+			for filename in sorted(os.listdir(gesture_dir)):
+				if not filename.endswith('.pose'):
+					continue
+				coords = pickle.load(open(os.path.join(gesture_dir, filename)))
+				records.append([Skeleton.from_df(coords['c_coords']).positions, Skeleton.from_df(coords['h_coords']).positions])
+			dataset.append_positions(gesture_name, np.array(records, dtype=cls.DTYPE))
+		return dataset
@@ -0,0 +1,270 @@
+#-------------------------------------------------- #
+# Class: GestureIndex
+# -------------------
+# in-process nearest-neighbour index over
+# featurized gestures
+#-------------------------------------------------- #
+import numpy as np
+
+
+def append_rows(buffers, name, view, rows):
+	"""
+		returns view with rows appended, view being buffers[name][:len(view)]
+		if it was grown here before. The rows are written into the spare
+		room of buffers[name], so appending costs O(len(rows)); when there
+		is none (or no buffer yet) view is copied into one twice as big.
+		Arrays that already had view keep seeing the old rows only.
+	"""
+	count, rows = len(view), np.asarray(rows, dtype=view.dtype)
+	buf = buffers.get(name)
+	if buf is None or not view.base is buf or count + len(rows) > len(buf):
+		buf = np.empty((max(2 * (count + len(rows)), 16),) + view.shape[1:], dtype=view.dtype)
+		buf[:count] = view
+		buffers[name] = buf
+	buf[count:count + len(rows)] = rows
+	return buf[:count + len(rows)]
+
+
+def brute_kneighbors(X, references, reference_sqnorms, k):
+	"""
+		returns the (squared) distances and indices of the k nearest
+		references of every row in X, nearest first
+	"""
+	#=====[ |x - r|^2 = |x|^2 - 2x.r + |r|^2, for all pairs at once	]=====
+	distances = reference_sqnorms - 2 * np.dot(X, references.T) + (X ** 2).sum(axis=1)[:, np.newaxis]
+	indices = np.argpartition(distances, k - 1, axis=1)[:, :k]
+	rows = np.arange(len(X))[:, np.newaxis]
+	order = np.argsort(distances[rows, indices], axis=1)
+	indices = indices[rows, order]
+	return distances[rows, indices], indices
+
+
+class GestureIndex(object):
+	"""
+		Class: GestureIndex
+		===================
+		k-nearest-neighbour classifier over a precomputed reference matrix
+		(and its squared norms). query() returns labels and confidences
+		(fraction of neighbours voting for the label) in one pass, for a
+		single pose or a whole batch.
+
+		normalize z-scores the features first. It is off by default: it
+		upweights low-variance body-shape features, which made predictions
+		on people outside the training set noticeably worse.
+
+		algorithm:
+			- 'brute': one matrix product against every reference (default;
+				fastest for the few hundred references we have)
+			- 'kd_tree': scipy cKDTree
+			- 'ball_tree': sklearn BallTree
+
+		Exposes fit/predict/predict_proba/score/get_params, so it can stand in
+		for an sklearn classifier (e.g. in cross_val_score).
+
+		partial_fit adds references (and new classes) to a fitted index in
+		time proportional to how many there are, not to the index: they
+		go into arrays with room to spare, normalized with the mean and
+		scale of the first fit. A tree only covers the references it was
+		built on; newer ones are searched by brute force next to it until
+		they reach REBUILD_FRACTION of the tree's, when it is rebuilt.
+
+		Ideal Operation:
+		----------------
+
+			index = GestureIndex(n_neighbors=2).fit(X, y)
+			labels, confidences = index.query(X_new)
+	"""
+	ALGORITHMS = ('brute', 'kd_tree', 'ball_tree')
+	MIN_SCALE = 1e-6
+	REBUILD_FRACTION = 0.25
+	_estimator_type = 'classifier'		# so sklearn stratifies its folds, as for its own classifiers
+
+
+	def __init__(self, n_neighbors=2, algorithm='brute', normalize=False):
+		if not algorithm in self.ALGORITHMS:
+			raise TypeError("Algorithm not supported: " + algorithm)
+		self.n_neighbors = n_neighbors
+		self.algorithm = algorithm
+		self.normalize = normalize
+
+
+	################################################################################
+	####################[ FITTING ]#################################################
+	################################################################################
+
+	def fit(self, X, y):
+		"""
+			stores the normalized references and their label codes, and
+			builds the tree if there is one
+		"""
+		X = np.asarray(X, dtype=np.float64)
+		self.classes_, self.codes = np.unique(np.asarray(y), return_inverse=True)
+
+		#=====[ Step 1: normalization	]=====
+		if self.normalize:
+			self.mean = X.mean(axis=0)
+			self.scale = X.std(axis=0)
+
+			#=====[ some h_coords are zero by construction (e.g. torso x); don't blow up their float noise	]=====
+			self.scale[self.scale < self.MIN_SCALE * self.scale.max()] = 1.
+		else:
+			self.mean = np.zeros(X.shape[1])
+			self.scale = np.ones(X.shape[1])
+		self.references = (X - self.mean) / self.scale
+
+		#=====[ Step 2: backing structure	]=====
+		self.build()
+		return self
+
+
+	def build(self):
+		"""
+			precomputes whatever self.algorithm needs from self.references
+		"""
+		self.tree = None
+		self.reference_sqnorms = (self.references ** 2).sum(axis=1)
+		self.num_indexed = len(self.references)
+		if self.algorithm == 'kd_tree':
+			from scipy.spatial import cKDTree
+			self.tree = cKDTree(self.references)
+		elif self.algorithm == 'ball_tree':
+			from sklearn.neighbors import BallTree
+			self.tree = BallTree(self.references)
+
+
+	def transform(self, X):
+		"""
+			normalizes X like the references; missing (nan) features are
+			set to the reference mean, so they don't sway the distances
+		"""
+		X = (np.asarray(X, dtype=np.float64).reshape(-1, len(self.mean)) - self.mean) / self.scale
+		X[np.isnan(X)] = 0.
+		return X
+
+
+
+	################################################################################
+	####################[ QUERYING ]################################################
+	################################################################################
+
+	def kneighbors(self, X):
+		"""
+			returns (squared) distances and indices of the n_neighbors nearest
+			references of every row in X, nearest first
+		"""
+		X = self.transform(X)
+		references = self.references
+		k = min(self.n_neighbors, len(references))
+		if self.tree is None:
+			return brute_kneighbors(X, references, self.reference_sqnorms[:len(references)], k)
+
+		num_indexed = getattr(self, 'num_indexed', len(references))
+		k_tree = min(k, num_indexed)
+		distances, indices = self.tree.query(X, k_tree)
+		distances, indices = np.reshape(distances, (len(X), k_tree))**2, np.reshape(indices, (len(X), k_tree))
+		if num_indexed == len(references):
+			return distances, indices
+
+		#=====[ references added since the tree was built: brute force, then keep the k nearest of both	]=====
+		tail_distances, tail_indices = brute_kneighbors(X, references[num_indexed:], self.reference_sqnorms[num_indexed:len(references)], min(k, len(references) - num_indexed))
+		distances = np.hstack([distances, tail_distances])
+		indices = np.hstack([indices, tail_indices + num_indexed])
+		order = np.argsort(distances, axis=1, kind='mergesort')[:, :k]
+		rows = np.arange(len(X))[:, np.newaxis]
+		return distances[rows, order], indices[rows, order]
+
+
+	################################################################################
+	####################[ ONLINE LEARNING ]#########################################
+	################################################################################
+
+	def partial_fit(self, X, y):
+		"""
+			adds the rows of X, labelled y, to the references; labels not
+			seen before become new classes, after the existing ones.
+			Fits from scratch if the index was never fit.
+		"""
+		if not hasattr(self, 'references'):
+			return self.fit(X, y)
+		X, y = self.transform(X), np.asarray(y)
+		self.num_indexed = getattr(self, 'num_indexed', len(self.references))
+
+		#=====[ Step 1: label codes, new classes at the end	]=====
+		new_classes = [label for label in np.unique(y) if not label in self.classes_]
+		if len(new_classes) > 0:
+			self.classes_ = np.concatenate([self.classes_, np.asarray(new_classes)])
+		code_of = {label:code for code, label in enumerate(self.classes_)}
+		codes = np.array([code_of[label] for label in y], dtype=self.codes.dtype)
+
+		#=====[ Step 2: append; codes and norms before references, which readers size themselves by	]=====
+		self.buffers = dict(getattr(self, 'buffers', {}))
+		self.codes = append_rows(self.buffers, 'codes', self.codes, codes)
+		self.reference_sqnorms = append_rows(self.buffers, 'reference_sqnorms', self.reference_sqnorms, (X ** 2).sum(axis=1))
+		self.references = append_rows(self.buffers, 'references', self.references, X)
+
+		#=====[ Step 3: rebuild the tree once it's missing too much	]=====
+		if not self.tree is None and len(self.references) - self.num_indexed > self.REBUILD_FRACTION * self.num_indexed:
+			self.build()
+		return self
+
+
+	def __getstate__(self):
+		"""
+			pickles without the spare room of the partial_fit buffers
+		"""
+		state = self.__dict__.copy()
+		state.pop('buffers', None)
+		return state
+
+
+	def __copy__(self):
+		"""
+			shallow copy that keeps the partial_fit buffers (copy.copy
+			would go through __getstate__ and drop them), so that learning
+			on a copy still only appends
+		"""
+		index = GestureIndex.__new__(GestureIndex)
+		index.__dict__.update(self.__dict__)
+		return index
+
+
+	def votes(self, X):
+		"""
+			returns an (len(X), num_classes) array of neighbour votes
+		"""
+		distances, indices = self.kneighbors(X)
+		neighbor_codes = self.codes[indices]
+		return (neighbor_codes[:, :, np.newaxis] == np.arange(len(self.classes_))).sum(axis=1)
+
+
+	def query(self, X):
+		"""
+			returns (labels, confidences) for every row in X; ties go to the
+			first class, like sklearn's KNeighborsClassifier
+		"""
+		votes = self.votes(X)
+		best = votes.argmax(axis=1)
+		return self.classes_[best], votes[np.arange(len(best)), best] / votes.sum(axis=1).astype(np.float64)
+
+
+	def predict(self, X):
+		return self.query(X)[0]
+
+
+	def predict_proba(self, X):
+		votes = self.votes(X)
+		return votes / votes.sum(axis=1).astype(np.float64)[:, np.newaxis]
+
+
+	def score(self, X, y):
+		return np.mean(self.predict(X) == np.asarray(y))
+
+
+	def get_params(self, deep=True):
+		return {'n_neighbors':self.n_neighbors, 'algorithm':self.algorithm, 'normalize':self.normalize}
+
+
+	def set_params(self, **params):
+		for key, value in params.items():
+			setattr(self, key, value)
+		return self
@@ -0,0 +1,249 @@
+#-------------------------------------------------- #
+# Class: GestureRecognizer
+# ------------------------
+# streaming, sliding-window gesture recognition
+# for a single player
+#-------------------------------------------------- #
+from collections import Counter
+import numpy as np
+
+
+class GestureRecognizer(object):
+	"""
+		Class: GestureRecognizer
+		========================
+		keeps a fixed-size ring of the last window_length featurized frames
+		(and their per-frame labels) along with running sums, so that the
+		window statistics cost O(1) amortized to update per frame:
+
+			- mean/std of every feature
+			- net velocity of every feature across the window
+			- mean speed of every joint (features are coordinate-major, as
+				returned by GestureClassifier.featurize)
+
+		every hop frames it decides on a gesture: with a sequence_classifier
+		(a SequenceClassifier, or anything with predict, fit on
+		window_features rows - see sequence_to_windows) and a full window,
+		it classifies the window's motion, e.g. ground_charge vs
+		overhead_charge; otherwise it takes the most common per-frame
+		label in the window. window_length/hop trade latency for accuracy.
+
+		Ideal Operation:
+		----------------
+
+			recognizer = GestureRecognizer(num_features, window_length=15, hop=1)
+			gesture = recognizer.push(features, label, frame_seq)
+	"""
+	#=====[ re-sum the window from scratch every this many wraps, against float drift	]=====
+	REFRESH_WRAPS = 64
+
+
+	def __init__(self, num_features, window_length=15, hop=1, sequence_classifier=None, default_gesture='no_gesture'):
+		self.num_features = num_features
+		self.num_joints = num_features // 3
+		self.window_length = window_length
+		self.hop = hop
+		self.sequence_classifier = sequence_classifier
+		self.default_gesture = default_gesture
+		self.reset()
+
+
+	def reset(self):
+		"""
+			empties the window
+		"""
+		W = self.window_length
+		self.features = np.zeros((W, self.num_features))
+		self.valid = np.zeros((W, self.num_features), dtype=bool)
+		self.speeds = np.zeros((W, self.num_joints))
+		self.seqs = np.zeros(W, dtype=np.int64)
+		self.labels = [None] * W
+		self.head = 0		# slot of the oldest frame
+		self.count = 0		# frames in the window
+
+		self.feature_sum = np.zeros(self.num_features)
+		self.feature_sumsq = np.zeros(self.num_features)
+		self.feature_count = np.zeros(self.num_features)
+		self.speed_sum = np.zeros(self.num_joints)
+		self.label_counts = Counter()
+
+		self.last_seq = -1
+		self.last_features = None
+		self.num_pushed = 0
+		self.frames_since_decision = 0
+		self.gesture = self.default_gesture
+		self.confidence = 0.
+
+
+
+	################################################################################
+	####################[ WINDOW MAINTENANCE ]######################################
+	################################################################################
+
+	def evict_oldest(self):
+		"""
+			removes the oldest frame from the window and the running sums
+		"""
+		ix = self.head
+		features = self.features[ix]
+		self.feature_sum -= features
+		self.feature_sumsq -= features * features
+		self.feature_count -= self.valid[ix]
+		self.speed_sum -= self.speeds[ix]
+		label = self.labels[ix]
+		if not label is None:
+			self.label_counts[label] -= 1
+			if self.label_counts[label] == 0:
+				del self.label_counts[label]
+			self.labels[ix] = None
+		self.head = (ix + 1) % self.window_length
+		self.count -= 1
+
+
+	def refresh_sums(self):
+		"""
+			recomputes the running sums from the frames in the window
+		"""
+		ixs = (self.head + np.arange(self.count)) % self.window_length
+		self.feature_sum = self.features[ixs].sum(axis=0)
+		self.feature_sumsq = (self.features[ixs] ** 2).sum(axis=0)
+		self.feature_count = self.valid[ixs].sum(axis=0).astype(np.float64)
+		self.speed_sum = self.speeds[ixs].sum(axis=0)
+
+
+	def push(self, features, label=None, seq=None):
+		"""
+			adds a frame's features (and optionally its per-frame label) to
+			the window; seq is its frame sequence number, so dropped frames
+			age out of the window rather than being papered over.
+			returns the current gesture
+		"""
+		seq = self.last_seq + 1 if seq is None else seq
+		W = self.window_length
+
+		#=====[ Step 1: evict frames that fell out of the window, or the oldest if full	]=====
+		while self.count > 0 and self.seqs[self.head] <= seq - W:
+			self.evict_oldest()
+		if self.count == W:
+			self.evict_oldest()
+
+		#=====[ Step 2: per-joint speed since the last frame; missing (nan) joints count as 0	]=====
+		features = np.asarray(features, dtype=np.float64).ravel()
+		valid = ~np.isnan(features)
+		features = np.where(valid, features, 0.)
+		if self.last_features is None or seq <= self.last_seq:
+			speed = np.zeros(self.num_joints)
+		else:
+			velocity = (features - self.last_features) / float(seq - self.last_seq)
+			speed = np.sqrt(np.sum(velocity.reshape(3, -1)**2, axis=0))
+
+		#=====[ Step 3: add to window and running sums	]=====
+		ix = (self.head + self.count) % W
+		self.features[ix] = features
+		self.valid[ix] = valid
+		self.speeds[ix] = speed
+		self.seqs[ix] = seq
+		self.labels[ix] = label
+		self.feature_sum += features
+		self.feature_sumsq += features * features
+		self.feature_count += valid
+		self.speed_sum += speed
+		if not label is None:
+			self.label_counts[label] += 1
+		self.count += 1
+		self.last_seq, self.last_features = seq, features
+
+		self.num_pushed += 1
+		if self.num_pushed % (self.REFRESH_WRAPS * W) == 0:
+			self.refresh_sums()
+
+		#=====[ Step 4: decide every hop frames	]=====
+		self.frames_since_decision += 1
+		if self.frames_since_decision >= self.hop:
+			self.frames_since_decision = 0
+			self.decide()
+		return self.gesture
+
+
+	def gaps(self):
+		"""
+			returns the number of frames missing from a full window
+		"""
+		return self.window_length - self.count
+
+
+
+	################################################################################
+	####################[ WINDOW FEATURES/DECISION ]################################
+	################################################################################
+
+	def window_features(self):
+		"""
+			returns [mean, std, net velocity] of every feature followed by
+			the mean speed of every joint, over the current window
+		"""
+		n = float(max(self.count, 1))
+		counts = np.maximum(self.feature_count, 1)
+		mean = self.feature_sum / counts
+		std = np.sqrt(np.maximum(self.feature_sumsq / counts - mean**2, 0.))
+
+		velocity = np.zeros(self.num_features)
+		if self.count > 1:
+			newest = (self.head + self.count - 1) % self.window_length
+			velocity = (self.features[newest] - self.features[self.head]) / float(self.seqs[newest] - self.seqs[self.head])
+
+		return np.concatenate([mean, std, velocity, self.speed_sum / n])
+
+
+	def decide(self):
+		"""
+			sets self.gesture/self.confidence from the current window
+		"""
+		if self.count == 0:
+			return
+
+		#=====[ motion: only on full windows, like the ones it was trained on	]=====
+		if not self.sequence_classifier is None and self.count == self.window_length:
+			window = self.window_features().reshape(1, -1)
+			if hasattr(self.sequence_classifier, 'query'):
+				labels, confidences = self.sequence_classifier.query(window)
+				self.gesture, self.confidence = labels[0], confidences[0]
+			else:
+				self.gesture = self.sequence_classifier.predict(window)[0]
+				self.confidence = 1.
+
+		elif len(self.label_counts) > 0:
+			#=====[ ties go to the current gesture	]=====
+			label, n = max(self.label_counts.iteritems(), key=lambda (l, n):(n, l == self.gesture))
+			self.gesture = label
+			self.confidence = n / float(self.window_length)
+
+
+	@classmethod
+	def sequence_to_windows(cls, features, window_length=15, hop=1, seqs=None, labels=None, min_agreement=0.5):
+		"""
+			given a recorded sequence of featurized frames, shape (N, num_features),
+			with their frame sequence numbers (default: consecutive) and
+			per-frame labels, returns (rows, window_labels): the
+			window_features of every full window (one every hop frames, none
+			across a gap), i.e. training rows for a sequence_classifier,
+			computed by the same code as the live path.
+
+			a window's label is its most common frame label (the vote the
+			recognizer takes without a sequence_classifier); windows where it
+			covers less than min_agreement of the frames are left out. Without
+			labels every window is kept, labelled None.
+		"""
+		features = np.asarray(features)
+		seqs = np.arange(len(features)) if seqs is None else np.asarray(seqs)
+		labelled = not labels is None
+		recognizer = cls(features.shape[1], window_length)
+		rows, window_labels = [], []
+		for frame_features, seq, label in zip(features, seqs, labels if labelled else [None] * len(features)):
+			recognizer.push(frame_features, label, seq)
+			if recognizer.count < window_length or (recognizer.num_pushed - window_length) % hop != 0:
+				continue
+			if not labelled or recognizer.confidence >= min_agreement:
+				rows.append(recognizer.window_features())
+				window_labels.append(recognizer.gesture if labelled else None)
+		return np.array(rows), window_labels
@@ -0,0 +1,112 @@
+#-------------------------------------------------- #
+# Class: JointFilter
+# ------------------
+# smooths a player's joints over time and predicts
+# them forward, to hide jitter and latency
+#-------------------------------------------------- #
+import numpy as np
+from Skeleton import Skeleton, NUM_JOINTS
+
+
+def smoothing_factor(cutoff, dt):
+	tau = 1. / (2 * np.pi * cutoff)
+	return 1. / (1. + tau / dt)
+
+
+class JointFilter(object):
+	"""
+		Class: JointFilter
+		==================
+		a One-Euro filter (Casiez et al. 2012) on every joint coordinate at
+		once: a low-pass filter whose cutoff rises with the joint's speed,
+		so joints standing still don't jitter and fast ones don't lag.
+		Positions are then predicted prediction_ms ahead with the filtered
+		velocity, to make up for the time frames spend in the pipeline.
+
+		joints that are missing (nan, which is what the receiver turns
+		parameters' none_substitutes into) or whose confidence is under
+		MIN_CONFIDENCE coast along on their last velocity, slowing down,
+		for up to MAX_COAST frames and are nan after that; when they come
+		back, they start over from the new measurement.
+
+		time goes by frame_seq, at frame_period seconds a frame, so
+		results don't depend on when frames happened to be read.
+
+		Ideal Operation:
+		----------------
+
+			joint_filter = JointFilter(prediction_ms=50)
+			filtered = joint_filter.update(c_coords, frame_seq)	# -> Skeleton
+	"""
+	MIN_CUTOFF = 1.			# Hz; lower is smoother at rest
+	BETA = 0.05				# cutoff gained per mm/s of speed; higher lags less when moving
+	D_CUTOFF = 1.			# Hz; for the velocity estimate
+	FRAME_PERIOD = 1. / 30
+	MIN_CONFIDENCE = 0.5
+	MAX_COAST = 5
+	COAST_DECAY = 0.5		# velocity kept per coasted frame
+
+
+	def __init__(self, prediction_ms=0., min_cutoff=MIN_CUTOFF, beta=BETA, d_cutoff=D_CUTOFF, frame_period=FRAME_PERIOD):
+		self.prediction = prediction_ms / 1000.
+		self.min_cutoff = min_cutoff
+		self.beta = beta
+		self.d_cutoff = d_cutoff
+		self.frame_period = frame_period
+		self.reset()
+
+
+	def reset(self):
+		self.positions = np.full((NUM_JOINTS, 3), np.nan)		# filtered positions
+		self.velocities = np.zeros((NUM_JOINTS, 3))				# filtered velocities (per second)
+		self.coasted = np.zeros(NUM_JOINTS, dtype=int)			# frames each joint has been missing for
+		self.frame_seq = None
+
+
+	def get_valid(self, skeleton):
+		"""
+			returns a (NUM_JOINTS,) mask of the joints that were measured
+		"""
+		valid = ~np.isnan(skeleton.positions).any(axis=1)
+		if not skeleton.confidences is None:
+			valid &= skeleton.confidences >= self.MIN_CONFIDENCE
+		return valid
+
+
+	def update(self, skeleton, frame_seq):
+		"""
+			filters in a new measurement (a Skeleton) from frame_seq;
+			returns the filtered, predicted Skeleton
+		"""
+		x = skeleton.positions.astype(np.float64)
+		valid = self.get_valid(skeleton)
+		dt = self.frame_period * (1 if self.frame_seq is None else max(frame_seq - self.frame_seq, 1))
+		self.frame_seq = frame_seq
+
+		#=====[ Step 1: joints seen for the first time, or again after coasting out, start over	]=====
+		restart = valid & np.isnan(self.positions).any(axis=1)
+		self.positions[restart] = x[restart]
+		self.velocities[restart] = 0.
+
+		#=====[ Step 2: One-Euro on the rest	]=====
+		filtered = valid & ~restart
+		velocities = (x - self.positions) / dt
+		a_d = smoothing_factor(self.d_cutoff, dt)
+		velocities = self.velocities + a_d * (velocities - self.velocities)
+		cutoffs = self.min_cutoff + self.beta * np.abs(velocities)
+		a = smoothing_factor(cutoffs, dt)
+		positions = self.positions + a * (x - self.positions)
+		self.velocities[filtered] = velocities[filtered]
+		self.positions[filtered] = positions[filtered]
+
+		#=====[ Step 3: missing joints coast, then drop out	]=====
+		missing = ~valid
+		self.coasted[valid] = 0
+		self.coasted[missing] += 1
+		self.velocities[missing] *= self.COAST_DECAY
+		self.positions[missing] += self.velocities[missing] * dt
+		self.positions[missing & (self.coasted > self.MAX_COAST)] = np.nan
+
+		#=====[ Step 4: predict	]=====
+		predicted = self.positions + self.velocities * self.prediction
+		return Skeleton(predicted, skeleton.orientations, skeleton.name, skeleton.confidences)
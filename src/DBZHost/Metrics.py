@@ -0,0 +1,288 @@
+#-------------------------------------------------- #
+# Module: Metrics
+# ---------------
+# low-overhead counters and latency histograms for
+# the hot path, plus ways of looking at them live
+#-------------------------------------------------- #
+import json
+import time
+import bisect
+import logging
+import threading
+import BaseHTTPServer
+from timeit import default_timer
+from StoppableThread import StoppableThread
+
+logger = logging.getLogger(__name__)
+
+
+class Histogram(object):
+	"""
+		Class: Histogram
+		================
+		counts of observed durations (seconds) in log-spaced buckets from
+		MIN_VALUE to MAX_VALUE, BUCKETS_PER_DECADE per factor of 10;
+		percentiles are read off the buckets, so they are accurate to
+		about 15%
+	"""
+	__slots__ = ('counts', 'count', 'total', 'max')
+	MIN_VALUE = 1e-6
+	MAX_VALUE = 10.
+	BUCKETS_PER_DECADE = 16
+	BOUNDS = [MIN_VALUE * 10 ** (i / float(BUCKETS_PER_DECADE)) for i in range(7 * BUCKETS_PER_DECADE + 1)]
+
+
+	def __init__(self):
+		self.counts = [0] * (len(self.BOUNDS) + 1)
+		self.count = 0
+		self.total = 0.
+		self.max = 0.
+
+
+	def observe(self, value):
+		self.counts[bisect.bisect_left(self.BOUNDS, value)] += 1
+		self.count += 1
+		self.total += value
+		if value > self.max:
+			self.max = value
+
+
+	def percentile(self, p):
+		"""
+			returns the upper bound of the bucket holding the p'th percentile
+		"""
+		if self.count == 0:
+			return 0.
+		rank, seen = p / 100. * self.count, 0
+		for ix, count in enumerate(self.counts):
+			seen += count
+			if seen >= rank and count > 0:
+				return min(self.BOUNDS[ix], self.max) if ix < len(self.BOUNDS) else self.max
+		return self.max
+
+
+	def summary(self):
+		"""
+			returns {count, mean, p50, p95, p99, max}, durations in milliseconds
+		"""
+		summary = {'count':self.count, 'mean':1000. * self.total / max(self.count, 1), 'max':1000. * self.max}
+		for p in (50, 95, 99):
+			summary['p%d' % p] = 1000. * self.percentile(p)
+		return summary
+
+
+
+class Timer(object):
+	"""
+		context manager that observes the time spent in its block, holding
+		lock while it does
+	"""
+	__slots__ = ('histogram', 'lock', 'start')
+
+	def __init__(self, histogram, lock):
+		self.histogram = histogram
+		self.lock = lock
+
+	def __enter__(self):
+		self.start = default_timer()
+		return self
+
+	def __exit__(self, *exc_info):
+		elapsed = default_timer() - self.start
+		with self.lock:
+			self.histogram.observe(elapsed)
+
+
+
+class NullTimer(object):
+	"""
+		the disabled Timer: does nothing
+	"""
+	__slots__ = ()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		pass
+
+NULL_TIMER = NullTimer()
+
+
+
+class Metrics(object):
+	"""
+		Class: Metrics
+		==============
+		a registry of named counters and latency histograms. Disabled (the
+		default), timer() hands back a shared no-op and increment()/observe()
+		return straight away, so the hooks can stay in the hot path.
+
+		Updates can come from any thread (e.g. Pipeline workers timing
+		classifier.predict, PredictionCache counting its hits): they, and
+		snapshot(), hold one registry lock, which costs a fraction of a
+		microsecond when nobody else has it.
+
+		Ideal Operation:
+		----------------
+
+			from Metrics import metrics
+
+			with metrics.timer('player.update'):
+				...
+			metrics.increment('receiver.decode_errors')
+
+			metrics.enable(dump_interval=10.)	# log a summary every 10s
+			metrics.snapshot()					# -> dict, as served by MetricsServer
+	"""
+
+	def __init__(self):
+		self.enabled = False
+		self.dump_interval = None
+		self.lock = threading.Lock()
+		self.reset()
+
+
+	def enable(self, dump_interval=None):
+		"""
+			starts collecting; if dump_interval is given, maybe_dump logs
+			a summary at most every dump_interval seconds
+		"""
+		self.enabled = True
+		self.dump_interval = dump_interval
+		self.last_dump = time.time()
+
+
+	def disable(self):
+		self.enabled = False
+
+
+	def reset(self):
+		with self.lock:
+			self.counters = {}
+			self.histograms = {}
+		self.start_time = time.time()
+		self.last_dump = self.start_time
+
+
+
+	################################################################################
+	####################[ HOOKS ]###################################################
+	################################################################################
+
+	def increment(self, name, value=1):
+		if self.enabled:
+			with self.lock:
+				self.counters[name] = self.counters.get(name, 0) + value
+
+
+	def histogram(self, name):
+		histogram = self.histograms.get(name)
+		if histogram is None:
+			with self.lock:
+				histogram = self.histograms.get(name)
+				if histogram is None:
+					histogram = self.histograms[name] = Histogram()
+		return histogram
+
+
+	def observe(self, name, value):
+		if self.enabled:
+			histogram = self.histogram(name)
+			with self.lock:
+				histogram.observe(value)
+
+
+	def timer(self, name):
+		"""
+			returns a context manager timing its block into histogram name
+		"""
+		if not self.enabled:
+			return NULL_TIMER
+		return Timer(self.histogram(name), self.lock)
+
+
+
+	################################################################################
+	####################[ REPORTING ]###############################################
+	################################################################################
+
+	def snapshot(self):
+		"""
+			returns {uptime, counters, histograms} as plain, json-able types
+		"""
+		with self.lock:
+			return {
+						'uptime':time.time() - self.start_time,
+						'counters':dict(self.counters),
+						'histograms':{name:h.summary() for name, h in self.histograms.items()}
+					}
+
+
+	def dump(self):
+		"""
+			logs the current snapshot, one line per metric
+		"""
+		snapshot = self.snapshot()
+		logger.info("metrics after %.1fs:", snapshot['uptime'])
+		for name, value in sorted(snapshot['counters'].items()):
+			logger.info("  %-32s %d", name, value)
+		for name, s in sorted(snapshot['histograms'].items()):
+			logger.info("  %-32s n=%d p50=%.3fms p95=%.3fms p99=%.3fms max=%.3fms", name, s['count'], s['p50'], s['p95'], s['p99'], s['max'])
+
+
+	def maybe_dump(self):
+		"""
+			dumps if the dump interval has passed; call once per frame
+		"""
+		if self.enabled and not self.dump_interval is None and time.time() - self.last_dump >= self.dump_interval:
+			self.last_dump = time.time()
+			self.dump()
+
+
+#=====[ the process-wide registry	]=====
+metrics = Metrics()
+
+
+
+class MetricsServer(StoppableThread):
+	"""
+		Class: MetricsServer
+		====================
+		serves metrics.snapshot() as json at http://<host>:<port>/ from
+		its own thread; localhost only by default
+	"""
+
+	def __init__(self, port=8765, host='127.0.0.1', registry=metrics):
+		StoppableThread.__init__(self, "MetricsServer")
+		snapshot = registry.snapshot
+
+		class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+			def do_GET(self):
+				body = json.dumps(snapshot(), indent=4)
+				self.send_response(200)
+				self.send_header('Content-Type', 'application/json')
+				self.send_header('Content-Length', str(len(body)))
+				self.end_headers()
+				self.wfile.write(body)
+
+			def log_message(self, format, *args):
+				logger.debug(format, *args)
+
+		self.server = BaseHTTPServer.HTTPServer((host, port), Handler)
+		self.server.timeout = 0.5
+		self.start()
+
+
+	def thread_iteration(self):
+		self.server.handle_request()
+
+
+	def stop(self):
+		"""
+			stops the thread (within server.timeout) and closes the socket
+		"""
+		StoppableThread.stop(self)
+		if self.is_alive() and not threading.current_thread() is self:
+			self.join()
+		self.server.server_close()
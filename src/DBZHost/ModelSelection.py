@@ -0,0 +1,233 @@
+#-------------------------------------------------- #
+# Class: ModelSelector
+# --------------------
+# cross-validates candidate gesture classifiers in
+# parallel and ranks them by accuracy and latency
+#-------------------------------------------------- #
+import json
+import logging
+import multiprocessing
+from timeit import default_timer
+import numpy as np
+from sklearn.base import clone
+from sklearn.pipeline import make_pipeline
+from sklearn.model_selection import StratifiedKFold
+from sklearn.decomposition import PCA
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.linear_model import LogisticRegression
+from GestureIndex import GestureIndex
+
+logger = logging.getLogger(__name__)
+
+FOLDS = 3
+LATENCY_SAMPLES = 200		# single-pose predictions timed per candidate
+LATENCY_BUDGET_MS = 1.		# per pose; a frame has two players and 33ms for everything else
+
+
+def default_preprocessors():
+	return [
+				('raw', None),
+				('pca_10', PCA(n_components=10)),
+			]
+
+
+def default_models():
+	return [
+				('index_brute', GestureIndex(n_neighbors=2, algorithm='brute')),
+				('index_kd_tree', GestureIndex(n_neighbors=2, algorithm='kd_tree')),
+				('knn_5', KNeighborsClassifier(n_neighbors=5)),
+				('logistic', LogisticRegression()),
+			]
+
+
+
+################################################################################
+####################[ WORKERS ]#################################################
+################################################################################
+#=====[ set once per worker (see init_worker): X, y, folds, preprocessors, models, and the prepared folds	]=====
+worker_state = {}
+
+
+def init_worker(X, y, folds, preprocessors, models):
+	worker_state.clear()
+	worker_state.update(X=X, y=y, folds=folds, preprocessors=preprocessors, models=models, prepared={})
+
+
+def prepare(prep_ix, fold_ix):
+	"""
+		returns (fitted preprocessor or None, X_train, X_test) for a fold;
+		each is only computed once per worker, whatever the models
+	"""
+	key = (prep_ix, fold_ix)
+	if not key in worker_state['prepared']:
+		X, (train, test) = worker_state['X'], worker_state['folds'][fold_ix]
+		preprocessor = worker_state['preprocessors'][prep_ix][1]
+		if preprocessor is None:
+			worker_state['prepared'][key] = (None, X[train], X[test])
+		else:
+			preprocessor = clone(preprocessor)
+			X_train = preprocessor.fit_transform(X[train])
+			worker_state['prepared'][key] = (preprocessor, X_train, preprocessor.transform(X[test]))
+	return worker_state['prepared'][key]
+
+
+def evaluate_task(task):
+	"""
+		fits one model on one preprocessed fold; returns (task, accuracy,
+		fit seconds, the fitted estimator for fold 0, None otherwise)
+	"""
+	prep_ix, model_ix, fold_ix = task
+	y, (train, test) = worker_state['y'], worker_state['folds'][fold_ix]
+	preprocessor, X_train, X_test = prepare(prep_ix, fold_ix)
+	model = clone(worker_state['models'][model_ix][1])
+	start = default_timer()
+	model.fit(X_train, y[train])
+	fit_seconds = default_timer() - start
+	accuracy = model.score(X_test, y[test])
+	estimator = None
+	if fold_ix == 0:
+		estimator = model if preprocessor is None else make_pipeline(preprocessor, model)
+	return task, accuracy, fit_seconds, estimator
+
+
+
+################################################################################
+####################[ SELECTION ]###############################################
+################################################################################
+
+class ModelSelector(object):
+	"""
+		Class: ModelSelector
+		====================
+		cross-validates every (preprocessor, model) pair on a featurized
+		dataset and ranks them on both accuracy and inference cost.
+
+		every (preprocessor, model, fold) is its own task, run on a pool of
+		`workers` processes. The folds are split once, and the processes are
+		forked with X, y and the folds already in memory, so only task
+		indices and results are pickled. Each worker fits a preprocessor
+		on a fold at most once, however many models use it.
+
+		latency is then timed in this process, one pose per call like the
+		live game, on the fold 0 estimators (preprocessing included), so
+		workers don't slow each other's timings down. The ranking puts
+		candidates within latency_budget_ms first, most accurate first;
+		'pareto' marks those no other candidate beats on both counts.
+
+		Ideal Operation:
+		----------------
+
+			selector = ModelSelector(X, y, workers=4)
+			report = selector.run()		# -> ranked list of dicts
+			selector.save('model_selection.json')
+	"""
+
+	def __init__(self, X, y, preprocessors=None, models=None, folds=FOLDS, workers=None, latency_budget_ms=LATENCY_BUDGET_MS):
+		self.X = np.asarray(X, dtype=np.float64)
+		self.y = np.asarray(y)
+		self.preprocessors = preprocessors or default_preprocessors()
+		self.models = models or default_models()
+		self.folds = list(StratifiedKFold(n_splits=folds).split(self.X, self.y))
+		self.workers = workers or multiprocessing.cpu_count()
+		self.latency_budget_ms = latency_budget_ms
+		self.estimators = {}		# candidate name -> estimator fitted on fold 0
+		self.report = None
+
+
+	def candidate_name(self, prep_ix, model_ix):
+		return '%s/%s' % (self.preprocessors[prep_ix][0], self.models[model_ix][0])
+
+
+	def cross_validate(self):
+		"""
+			runs every task; returns {candidate name: (fold accuracies, fit seconds)}
+		"""
+		tasks = [(p, m, f) for p in range(len(self.preprocessors)) for f in range(len(self.folds)) for m in range(len(self.models))]
+		init_args = (self.X, self.y, self.folds, self.preprocessors, self.models)
+		if self.workers > 1:
+			pool = multiprocessing.Pool(self.workers, init_worker, init_args)
+			try:
+				results = pool.map(evaluate_task, tasks)
+			finally:
+				pool.close()
+				pool.join()
+		else:
+			init_worker(*init_args)
+			results = map(evaluate_task, tasks)
+
+		scores = {}
+		for (prep_ix, model_ix, fold_ix), accuracy, fit_seconds, estimator in results:
+			name = self.candidate_name(prep_ix, model_ix)
+			scores.setdefault(name, ([], []))
+			scores[name][0].append(accuracy)
+			scores[name][1].append(fit_seconds)
+			if not estimator is None:
+				self.estimators[name] = estimator
+		return scores
+
+
+	def time_latency(self, estimator):
+		"""
+			returns the p50/p95 milliseconds estimator takes to classify one
+			pose (predict_proba, as GestureClassifier.predict_batch does)
+		"""
+		test = self.folds[0][1]
+		rows = self.X[test[np.linspace(0, len(test) - 1, LATENCY_SAMPLES).astype(int)]]
+		predict = getattr(estimator, 'predict_proba', estimator.predict)
+		durations = []
+		for row in rows:
+			start = default_timer()
+			predict(row[np.newaxis])
+			durations.append(default_timer() - start)
+		return np.percentile(np.array(durations) * 1000., [50, 95])
+
+
+	def run(self):
+		"""
+			cross-validates and times every candidate; returns the ranked
+			report (also kept as self.report)
+		"""
+		start = default_timer()
+		scores = self.cross_validate()
+		logger.info("cross-validated %d candidates in %.1fs", len(scores), default_timer() - start)
+
+		report = []
+		for name, (accuracies, fit_seconds) in scores.items():
+			p50, p95 = self.time_latency(self.estimators[name])
+			report.append({
+							'name':name,
+							'accuracy':float(np.mean(accuracies)),
+							'accuracy_std':float(np.std(accuracies)),
+							'fold_accuracies':[float(a) for a in accuracies],
+							'fit_ms':float(np.mean(fit_seconds) * 1000.),
+							'latency_p50_ms':float(p50),
+							'latency_p95_ms':float(p95),
+							'within_budget':bool(p50 <= self.latency_budget_ms),
+						})
+
+		#=====[ pareto: nobody is at least as accurate and fast, and better at one	]=====
+		for c in report:
+			c['pareto'] = not any(o['accuracy'] >= c['accuracy'] and o['latency_p50_ms'] <= c['latency_p50_ms'] and
+									(o['accuracy'] > c['accuracy'] or o['latency_p50_ms'] < c['latency_p50_ms']) for o in report)
+		report.sort(key=lambda c: (not c['within_budget'], -c['accuracy'], c['latency_p50_ms']))
+		self.report = report
+		return report
+
+
+	def best(self):
+		"""
+			returns (name, fold 0 estimator) of the top-ranked candidate
+		"""
+		name = self.report[0]['name']
+		return name, self.estimators[name]
+
+
+	def save(self, path):
+		json.dump({'folds':len(self.folds), 'workers':self.workers, 'latency_budget_ms':self.latency_budget_ms, 'candidates':self.report}, open(path, 'w'), indent=4)
+
+
+	def print_report(self):
+		print '%-4s %-24s %9s %7s %9s %9s %9s %s' % ('rank', 'candidate', 'accuracy', 'std', 'p50 (ms)', 'p95 (ms)', 'fit (ms)', '')
+		for rank, c in enumerate(self.report):
+			flags = ' '.join([f for f, on in (('pareto', c['pareto']), ('over budget', not c['within_budget'])) if on])
+			print '%-4d %-24s %9.3f %7.3f %9.3f %9.3f %9.1f %s' % (rank + 1, c['name'], c['accuracy'], c['accuracy_std'], c['latency_p50_ms'], c['latency_p95_ms'], c['fit_ms'], flags)
@@ -0,0 +1,285 @@
+#-------------------------------------------------- #
+# Class: Pipeline
+# ---------------
+# pipelined alternative to calling
+# DBZController.update_game in a loop
+#-------------------------------------------------- #
+import time
+import Queue
+import signal
+import logging
+import threading
+import multiprocessing
+from copy import copy
+from timeit import default_timer
+import numpy as np
+from StoppableThread import StoppableThread
+from Skeleton import NUM_JOINTS
+from Metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class SharedRing(object):
+	"""
+		Class: SharedRing
+		=================
+		capacity float32 slots of a fixed shape, for handing arrays from
+		one stage to the next without pickling them. shared=True puts them
+		in shared memory, so processes forked after it was made see each
+		other's writes.
+
+		ring[ix] is the slot of the ix'th frame (wrapping around); it's up
+		to the caller not to have two frames in flight on the same slot
+	"""
+
+	def __init__(self, capacity, shape, shared=False):
+		size = capacity * int(np.prod(shape))
+		if shared:
+			buf = np.frombuffer(multiprocessing.RawArray('f', size), dtype=np.float32)
+		else:
+			buf = np.zeros(size, dtype=np.float32)
+		self.capacity = capacity
+		self.slots = buf.reshape((capacity,) + tuple(shape))
+
+
+	def __getitem__(self, ix):
+		return self.slots[ix % self.capacity]
+
+
+
+def classify_worker(classifier, poses, features, jobs, results):
+	"""
+		classify stage: for every (ix, num_poses) job, featurizes the
+		first num_poses poses of frame ix into its features slot and
+		classifies them all at once; puts (ix, labels) on results, with
+		labels None if that failed. stops at a None job.
+	"""
+	for ix, num_poses in iter(jobs.get, None):
+		try:
+			X = features[ix][:num_poses]
+			X[:] = classifier.featurize_batch(poses[ix][:num_poses])
+			labels = list(classifier.predict_batch(X)[0])
+		except Exception:
+			logger.exception("classifying frame %d failed", ix)
+			labels = None
+		results.put((ix, labels))
+
+
+def classify_process(*args):
+	"""
+		classify_worker in a forked process; ctrl-c is left to the parent,
+		which stops the workers itself
+	"""
+	signal.signal(signal.SIGINT, signal.SIG_IGN)
+	classify_worker(*args)
+
+
+
+class SendStage(StoppableThread):
+	"""
+		the thread the send stage runs in
+	"""
+
+	def __init__(self, pipeline):
+		StoppableThread.__init__(self, "Pipeline.SendStage")
+		self.pipeline = pipeline
+		self.start()
+
+
+	def thread_iteration(self):
+		self.pipeline.collect(self.pipeline.POLL_INTERVAL)
+
+
+
+class Pipeline(object):
+	"""
+		Class: Pipeline
+		===============
+		runs a DBZController as a pipeline of stages, so that consecutive
+		frames are worked on at the same time:
+
+			- decode: the receiver's own thread, as always
+			- track: (the thread calling run) set_frame and SkeletonTracker.update,
+				on copies of the players; the updated players' h_coords go into
+				the poses ring
+			- classify: `workers` threads or processes featurize a frame's
+				poses into the features ring and classify them, in any order
+			- send: one thread takes the results back in frame order, hands
+				each player its tracked coords, features and label, sends the
+				player states and publishes the frame
+
+		at most depth frames are in flight: when classify/send fall behind,
+		tracking waits for them and the receiver drops what it can't get
+		to, as in the synchronous loop. frames come out in the order they
+		went in, so gesture recognition sees exactly the same sequence.
+
+		mode 'thread' keeps the workers in this process, which only helps
+		as far as numpy releases the GIL; mode 'process' forks them (each
+		with its own copy of the classifier), with the rings in shared
+		memory, so featurizing/classifying gets cores of its own.
+
+		Ideal Operation:
+		----------------
+
+			controller = DBZController(num_players=2)
+			Pipeline(controller, mode='process', workers=2).run()
+	"""
+	MODES = ('thread', 'process')
+	WORKERS = 2
+	DEPTH = 8
+	POLL_INTERVAL = 0.1
+
+
+	def __init__(self, controller, mode='thread', workers=WORKERS, depth=DEPTH):
+		if not mode in self.MODES:
+			raise TypeError("Pipeline mode not supported: " + mode)
+		self.controller = controller
+		self.mode = mode
+		self.depth = depth
+		self.running = False
+
+		#=====[ Step 1: tracking works on its own copies of the players	]=====
+		self.players = controller.players
+		self.trackers = [copy(player) for player in self.players]
+		self.in_flight = {}		# frame ix -> (start time, record, its skeletons, tracked state of every player, indices of the updated ones)
+		self.results = {}		# frame ix -> labels, for frames classified ahead of their turn
+		self.num_tracked = 0
+		self.num_sent = 0
+		self.sent = threading.Event()
+
+		#=====[ Step 2: rings between the stages	]=====
+		classifier = controller.gesture_classifier
+		num_features = classifier.featurize_batch(np.zeros((1, NUM_JOINTS, 3))).shape[1]
+		shared = mode == 'process'
+		self.poses = SharedRing(depth, (len(self.players), NUM_JOINTS, 3), shared)
+		self.features = SharedRing(depth, (len(self.players), num_features), shared)
+
+		#=====[ Step 3: start the workers and the send stage	]=====
+		if shared:
+			self.job_queue, self.result_queue = multiprocessing.Queue(), multiprocessing.Queue()
+			self.workers = [multiprocessing.Process(target=classify_process, args=(classifier, self.poses, self.features, self.job_queue, self.result_queue)) for i in range(workers)]
+		else:
+			self.job_queue, self.result_queue = Queue.Queue(), Queue.Queue()
+			self.workers = [threading.Thread(target=classify_worker, args=(classifier, self.poses, self.features, self.job_queue, self.result_queue)) for i in range(workers)]
+		for worker in self.workers:
+			worker.daemon = True
+			worker.start()
+		self.send_stage = SendStage(self)
+
+
+
+	################################################################################
+	####################[ STAGES ]##################################################
+	################################################################################
+
+	def track(self, record):
+		"""
+			track stage: tracks the players in record, then queues the
+			updated ones' poses for classification
+		"""
+		ix, start = self.num_tracked, default_timer()
+		with metrics.timer('controller.track'):
+			self.controller.set_frame(record)
+			skeleton_c_coords = copy(self.controller.skeleton_poses_c)
+			is_updated = self.controller.skeleton_tracker.update(self.trackers, skeleton_c_coords, record.seq)
+			updated = [p for p, u in enumerate(is_updated) if u]
+			poses = self.poses[ix]
+			for row, p in enumerate(updated):
+				poses[row] = self.trackers[p].h_coords.positions
+		self.in_flight[ix] = (start, record, self.controller.skeleton_poses_c, [tracker.get_track_state() for tracker in self.trackers], updated)
+		self.num_tracked += 1
+		if len(updated) > 0:
+			self.job_queue.put((ix, len(updated)))
+		else:
+			self.result_queue.put((ix, []))
+
+
+	def collect(self, timeout=None):
+		"""
+			send stage: waits up to timeout for a classified frame, then
+			sends every frame whose turn it is
+		"""
+		try:
+			ix, labels = self.result_queue.get(timeout=timeout)
+		except Queue.Empty:
+			return
+		self.results[ix] = labels
+		while self.num_sent in self.results:
+			self.send(self.num_sent, self.results.pop(self.num_sent))
+			self.num_sent += 1
+			self.sent.set()
+
+
+	def send(self, ix, labels):
+		"""
+			hands the players their tracked state, features and labels for
+			frame ix, then sends their states and publishes the frame
+		"""
+		start, record, skeletons, states, updated = self.in_flight.pop(ix)
+		for player, state in zip(self.players, states):
+			player.set_track_state(state)
+		if not labels is None:
+			features = self.features[ix]
+			for row, (p, label) in enumerate(zip(updated, labels)):
+				self.players[p].update_gesture(features[row], label)
+		self.controller.send_player_states()
+		self.controller.publish_frame(skeletons, record.seq, record.timestamp)
+		metrics.observe('pipeline.latency', default_timer() - start)
+		metrics.increment('controller.frames')
+
+
+
+	################################################################################
+	####################[ RUNNING ]#################################################
+	################################################################################
+
+	def wait_for_slot(self):
+		"""
+			blocks while depth frames are in flight
+		"""
+		while self.num_tracked - self.num_sent >= self.depth:
+			self.sent.wait(self.POLL_INTERVAL)
+			self.sent.clear()
+
+
+	def run(self, max_frames=None):
+		"""
+			tracks frames until stop() (or KeyboardInterrupt), max_frames
+			frames were tracked, or a replay is over; then closes
+		"""
+		self.running = True
+		receiver = self.controller.receiver
+		has_frames = getattr(receiver, 'has_frames', lambda: True)
+		try:
+			while self.running and (max_frames is None or self.num_tracked < max_frames) and has_frames():
+				self.wait_for_slot()
+				record = receiver.get_record(None, self.POLL_INTERVAL)
+				if not record is None:
+					self.track(record)
+				metrics.maybe_dump()
+		except KeyboardInterrupt:
+			pass
+		self.running = False
+		self.close()
+
+
+	def stop(self):
+		self.running = False
+
+
+	def close(self, timeout=1.):
+		"""
+			gives the frames in flight up to timeout to be sent, then stops
+			the workers and the send stage
+		"""
+		deadline = time.time() + timeout
+		while self.num_sent < self.num_tracked and time.time() < deadline:
+			self.sent.wait(self.POLL_INTERVAL)
+			self.sent.clear()
+		for worker in self.workers:
+			self.job_queue.put(None)
+		for worker in self.workers:
+			worker.join(timeout)
+		self.send_stage.stop()
+		self.send_stage.join()
@@ -3,13 +3,15 @@
 # -------------
 # wrapper class for representing a single Player
 ####################
-from collections import Counter
+import logging
 import numpy as np 
-import scipy as sp
-from scipy.stats import mode
-import pandas as pd
-from UnitySocket import UnitySocket
-from GestureClassifier import GestureClassifier
+from StateBroadcaster import player_topic
+from StateFormat import PlayerState, coords_to_dict
+from Skeleton import Skeleton, JOINT_INDEX, COORD_NAMES
+from GestureRecognizer import GestureRecognizer
+from SkeletonTracker import SkeletonTracker, SEARCHING
+
+logger = logging.getLogger(__name__)
 
 class Player:
 	"""
@@ -21,19 +23,45 @@ class Player:
 	DISTANCE_THRESHOLD = 500.
 	SCALING_CONSTANT = 400.
 	GESTURE_LENGTH = 15
+	GESTURE_HOP = 1
+
+	#=====[ attributes set by update(); see get_track_state	]=====
+	TRACK_STATE = (	'frame_seq', 'c_coords', 'h_coords', 'origin', 'axes', 'x_axis', 'y_axis', 'z_axis',
+					'track_status', 'velocity', 'misses', 'last_seen_seq', 'filtered_coords')
 
 
-	def __init__(self, index, gesture_classifier):
+	def __init__(self, index, gesture_classifier, gesture_length=GESTURE_LENGTH, gesture_hop=GESTURE_HOP, broadcaster=None, joint_filter=None):
 		"""
 			intializes this player's coordinates
+			gesture_length/gesture_hop: window length and hop (in frames) of 
+				the gesture recognizer; longer is steadier, shorter reacts faster
+			broadcaster: StateBroadcaster that send_state sends through, on 
+				this player's topic
+			joint_filter: JointFilter for the coordinates that are sent (not
+				the ones that are tracked/classified); None sends them raw
 		"""
-		self.socket = UnitySocket(index)
+		self.broadcaster = broadcaster
 		self.index = index
+		self.topic = player_topic(index)
 		self.gesture_classifier = gesture_classifier
 		self.c_coords = None
 		self.h_coords = None
+		self.origin = None
+		self.frame_seq = -1
+		self.joint_filter = joint_filter
+		self.filtered_coords = None
+
+		#=====[ tracking (see SkeletonTracker)	]=====
+		self.track_status = SEARCHING
+		self.velocity = np.zeros(3)
+		self.misses = 0
+		self.last_seen_seq = -1
+
 		self.gesture = 'no_gesture'
-		self.gesture_history = []
+		self.gesture_length = gesture_length
+		self.gesture_hop = gesture_hop
+		self.gesture_recognizer = None
+		self.gesture_history_gaps = 0
 		self.state_history = []
 
 
@@ -41,7 +69,39 @@ class Player:
 		"""
 			given a skeleton in c_coords, this will return its origin 
 		"""
-		return np.array((c_coords['left_shoulder'] + c_coords['right_shoulder'])/2.)
+		return (c_coords['left_shoulder'] + c_coords['right_shoulder'])/2.
+
+
+	@staticmethod
+	def get_body_basis(positions):
+		"""
+			given joint positions in c_coords, shape (..., NUM_JOINTS, 3), returns:
+				origin: (..., 3) midpoint of the shoulders
+				axes: (..., 3, 3) orthonormal basis, rows are the body's x/y/z axes
+			works on a single pose or on a whole stack of frames at once
+		"""
+		left_shoulder = positions[..., JOINT_INDEX['left_shoulder'], :]
+		right_shoulder = positions[..., JOINT_INDEX['right_shoulder'], :]
+		origin = (left_shoulder + right_shoulder)/2.
+
+		#=====[ z is re-derived from x, y so the basis is exactly orthonormal	]=====
+		x_axis = right_shoulder - origin
+		y_axis = np.cross(origin - positions[..., JOINT_INDEX['torso'], :], x_axis)
+		z_axis = np.cross(x_axis, y_axis)
+		axes = np.stack([x_axis, y_axis, z_axis], axis=-2)
+		axes /= np.linalg.norm(axes, axis=-1)[..., np.newaxis]
+		return origin, axes
+
+
+	@classmethod
+	def to_body_coords(cls, positions):
+		"""
+			given joint positions in c_coords, shape (..., NUM_JOINTS, 3), returns 
+			them in each pose's own h_coords; e.g. for re-projecting whole 
+			recorded sessions or gesture datasets in bulk
+		"""
+		origin, axes = cls.get_body_basis(positions)
+		return np.matmul(positions - origin[..., np.newaxis, :], np.swapaxes(axes, -1, -2))
 
 
 	def get_origin_axes(self, c_coords):
@@ -50,13 +110,8 @@ class Player:
 				origin
 				x/y/z_axis
 		"""
-		self.origin = self.get_origin(c_coords)
-		x_axis = np.array(c_coords['right_shoulder'] - self.origin)
-		z_axis = np.array(self.origin - c_coords['torso'])
-		y_axis = np.cross(z_axis, x_axis)
-		self.x_axis = x_axis / np.linalg.norm(x_axis)
-		self.y_axis = y_axis / np.linalg.norm(y_axis)
-		self.z_axis = z_axis / np.linalg.norm(z_axis)
+		self.origin, self.axes = self.get_body_basis(c_coords.positions)
+		self.x_axis, self.y_axis, self.z_axis = self.axes
 
 
 	def c_coords_to_h_coords(self, c_coords):
@@ -64,21 +119,11 @@ class Player:
 			converts c_coords to this player's coordinate system 
 			(h_coords)
 
+			axes is orthonormal, so its transpose is its inverse and every
+			joint is mapped with a single matrix multiply
 		"""
-		#=====[ Step 1: get differences	]=====
-		differences = c_coords.copy()
-		for label in c_coords.columns:
-			differences[label] = differences[label] - self.origin
-
-		#=====[ Step 2: transform each one	]=====
-		M = np.eye(3)
-		M[:, 0], M[:,1], M[:,2] = self.x_axis, self.y_axis, self.z_axis
-		# M*[a, b, c] = d
-		# ==> pinv(M)*d = [a, b, c]
-		h_coords = differences.copy()
-		for label in h_coords.columns:
-			h_coords[label] = np.dot(np.linalg.pinv(M), h_coords[label])
-		return h_coords
+		h_positions = np.dot(c_coords.positions - self.origin, self.axes.T)
+		return Skeleton(h_positions, name=c_coords.name)
 
 
 	def update_coords(self, new_c_coords):
@@ -90,6 +135,25 @@ class Player:
 		self.get_origin_axes(self.c_coords)
 		self.h_coords = self.c_coords_to_h_coords(self.c_coords)
 
+		#=====[ filter what gets sent; a (re)acquired player starts over	]=====
+		if not self.joint_filter is None:
+			if self.track_status == SEARCHING:
+				self.joint_filter.reset()
+			self.filtered_coords = self.joint_filter.update(self.c_coords, self.frame_seq)
+
+
+	def get_track_state(self):
+		"""
+			returns everything update() sets, as a dict; another copy of
+			this player can pick it up with set_track_state
+		"""
+		return {name:getattr(self, name, None) for name in self.TRACK_STATE}
+
+
+	def set_track_state(self, state):
+		for name, value in state.items():
+			setattr(self, name, value)
+
 
 	def get_similarity(self, c_coords):
 		"""
@@ -97,109 +161,130 @@ class Player:
 			represented with c_coords 
 		"""
 		origin_other = self.get_origin(c_coords)
-		return np.linalg.norm(np.array(self.origin) - np.array(origin_other))
+		return np.linalg.norm(self.origin - origin_other)
 
 
-	def update(self, skeleton_c_coords):
+	def update(self, skeleton_c_coords, frame_seq=None):
 		"""
 			skeleton_c_coords: list of c_coords of skeletons, passed in 
 				from parent PrimeSense object
+			frame_seq: sequence number of the frame they came from; 
+				defaults to the one after the last
 
 			this will pick the one out that most likely corresponds to 
 			this player; it will then update its own coordinates 
 			accordingly and *REMOVE* the corresponding coords from its own
-			frame
-		"""
-		if len(skeleton_c_coords) == 0:
-			return #no update
-
-		if type(self.c_coords) == type(None):
-			self.update_coords(skeleton_c_coords.pop(0))
-			self.update_gesture()
-			return
+			frame. returns True if this player was updated.
 
+			with several players, use a SkeletonTracker on all of them at
+			once instead (see DBZController.update_players), so they don't
+			take each other's skeletons. gestures are not classified here; 
+			see update_gesture
+		"""
+		frame_seq = self.frame_seq + 1 if frame_seq is None else frame_seq
+		return SkeletonTracker(self.DISTANCE_THRESHOLD).update([self], skeleton_c_coords, frame_seq)[0]
 
-		distances = [self.get_similarity(c_coords) for c_coords in skeleton_c_coords]
-		if not min(distances) < self.DISTANCE_THRESHOLD:
-			return #no update
 
-		else:
-			best_ix = np.argmin(distances)
-			self.update_coords(skeleton_c_coords.pop(best_ix)) #update with best
-			self.update_gesture()
+	def make_gesture_recognizer(self, num_features):
+		"""
+			returns a GestureRecognizer for this player, classifying motion
+			with the gesture classifier's sequence_classifier if it has one
+			(over the window length that was trained on), voting on the
+			per-frame labels otherwise
+		"""
+		sequence_classifier = self.gesture_classifier.sequence_classifier
+		window_length = self.gesture_length
+		if not sequence_classifier is None and sequence_classifier.window_length != window_length:
+			logger.info("player %d: gesture window of %d frames, as the sequence classifier was trained on", self.index, sequence_classifier.window_length)
+			window_length = sequence_classifier.window_length
+		return GestureRecognizer(num_features, window_length, self.gesture_hop, sequence_classifier)
 
 
-	def update_gesture(self):
+	def update_gesture(self, features=None, label=None):
 		"""
-			sets self.gesture to the prediction of self.gesture_classifier 
+			sets self.gesture from self.gesture_recognizer, which is fed the 
+			featurized frames and per-frame predictions of 
+			self.gesture_classifier (see make_gesture_recognizer); frames that 
+			were dropped or had no update for this player leave gaps 
+			(self.gesture_history_gaps) rather than older, stale votes
+
+			features/label: this frame's featurized h_coords and predicted
+				label, when the caller classified several players at once
+				(see DBZController.update_gestures); computed here otherwise
 		"""
-		if type(self.h_coords) != type(None) :
-			self.gesture_history.append(self.gesture_classifier.predict(self.h_coords)[0])
-
-		if len(self.gesture_history) > 0:
-			self.gesture = Counter(self.gesture_history[-15:]).most_common(1)[0][0]
-		print self.gesture
+		if not self.h_coords is None:
+			if features is None:
+				features = self.gesture_classifier.featurize(self.h_coords)
+				label = self.gesture_classifier.predict_features(features)[0]
+			if self.gesture_recognizer is None:
+				self.gesture_recognizer = self.make_gesture_recognizer(len(features))
+			self.gesture = self.gesture_recognizer.push(features, label, self.frame_seq)
+			self.gesture_history_gaps = self.gesture_recognizer.gaps()
+		logger.debug("player %d: %s", self.index, self.gesture)
 
 		#=====[ Get direction	]=====
 		if self.gesture == 'blast':
-			hands = [self.c_coords['right_hand'], self.c_coords['left_hand']]
-			top_hand = max(hands, key=lambda x:x['y'])
 			self.direction = self.c_coords['right_hand'] - self.c_coords['neck']
 		else:
 			self.direction = None
 
 
-	def format_coordinates(self, coords, lower_foot):
+	def scale_coordinates(self, coords, lower_foot_y):
 		"""
-			given coordinates as a pandas series, this will format them
-			for sending to the phone 
+			given coordinates as a Skeleton (or a single (x, y, z) array),
+			returns their positions as the phone wants them: scaled, and
+			with the lower foot at y = 0
 		"""
-		coords = coords.copy()
-		coords = coords / float(self.SCALING_CONSTANT)
+		positions = getattr(coords, 'positions', coords) / float(self.SCALING_CONSTANT)
 
 		#=====[ Get Z value for foot to zero	]=====
-		coords.loc['y'] = coords.loc['y'] - lower_foot.loc['y']
-		return coords.to_dict()
+		positions[..., 1] -= lower_foot_y
+		return positions
 
 
+	def format_coordinates(self, coords, lower_foot_y):
+		"""
+			given coordinates as a Skeleton (or a single (x, y, z) array),
+			this will format them for sending to the phone 
+		"""
+		positions = self.scale_coordinates(coords, lower_foot_y)
+		if positions.ndim == 1:
+			return dict(zip(COORD_NAMES, positions.tolist()))
+		return coords_to_dict(positions)
 
-	def send_state(self, opponent):
+
+
+	def get_state(self, opponent):
 		"""
-			sends this Player's state from the primesense to the 
-			actual player via UnitySocket 
+			returns this Player's state, as a PlayerState
 		"""
-		message = {}
+		coords = self.c_coords if self.filtered_coords is None else self.filtered_coords
 
 		#=====[ Step 0: get lower foot	]=====
-		self_feet = [self.c_coords.left_foot / float(self.SCALING_CONSTANT), self.c_coords.right_foot / float(self.SCALING_CONSTANT)]
-		# op_feet = [opponent.c_coords.left_foot / float(self.SCALING_CONSTANT), opponent.c_coords.right_foot / float(self.SCALING_CONSTANT)]
-		self_lower_foot = min(self_feet, key=lambda f:f['y'])
-		# op_lower_foot = min(op_feet, key=lambda f:f['y'])		
-		# print op_lower_foot.loc['y']
-
+		self_lower_foot_y = min(coords['left_foot'][1], coords['right_foot'][1]) / float(self.SCALING_CONSTANT)
+		# op_lower_foot_y = min(opponent.c_coords['left_foot'][1], opponent.c_coords['right_foot'][1]) / float(self.SCALING_CONSTANT)
 
 		#=====[ Step 1: self	]=====
-		message['self_coords'] = self.format_coordinates(self.c_coords, self_lower_foot)
-		message['self_gesture'] = self.gesture
-		if not self.direction is None:
-			message['self_direction'] = self.format_coordinates(self.direction, self_lower_foot)
-
-		#=====[ Step 2: other	]=====
-		message['opponent_coords'] = self.format_coordinates(self.c_coords, self_lower_foot)
-		message['opponent_gesture'] = 'no_gesture'
-		# if not opponent.direction is None:
-			# message['opponent_direction'] = self.format_coordinates(opponent.direction, op_lower_foot)
+		positions = self.scale_coordinates(coords, self_lower_foot_y)
+		direction = None if self.direction is None else self.scale_coordinates(self.direction, self_lower_foot_y)
 
+		#=====[ Step 2: other (for now, the opponent coords are our own)	]=====
+		return PlayerState(self.index, self.frame_seq, positions, self.gesture, direction, None, 'no_gesture')
 
 		# if not opponent is None:
-		# 	message['opponent_coords'] = self.format_coordinates(opponent.c_coords, op_lower_foot)
-		# 	message['opponent_gesture'] = opponent.gesture
-		# 	if not opponent.direction is None:
-		# 		message['opponent_direction'] = self.format_coordinates(opponent.direction, op_lower_foot)
-
-		# print message, '\n\n'
-		self.state_history.append(message)
-		self.socket.send(message)
+		# 	opponent_positions = self.scale_coordinates(opponent.c_coords, op_lower_foot_y)
+		# 	return PlayerState(self.index, self.frame_seq, positions, self.gesture, direction, opponent_positions, opponent.gesture)
+
+
+	def send_state(self, opponent):
+		"""
+			sends this Player's state from the primesense to the 
+			actual player (and whoever else listens) via the broadcaster
+		"""
+		state = self.get_state(opponent)
+		self.state_history.append(state)
+		if not self.broadcaster is None:
+			self.broadcaster.send(self.topic, state)
 
 
 	def __str__ (self):
@@ -0,0 +1,118 @@
+#-------------------------------------------------- #
+# Class: PredictionCache
+# ----------------------
+# LRU cache of classifier predictions, keyed on
+# quantized feature vectors
+#-------------------------------------------------- #
+import threading
+from collections import OrderedDict
+import numpy as np
+from Metrics import metrics
+
+SIZE = 256
+STEP = 50.		# feature units (mm) per quantization step
+
+#=====[ quantized value standing in for nan features	]=====
+NAN_KEY = np.iinfo(np.int32).min
+
+
+class PredictionCache(object):
+	"""
+		Class: PredictionCache
+		======================
+		bounded LRU map from a featurized pose, quantized to step, to the
+		(label, confidence) the classifier gave it; poses that round to
+		the same grid cell (e.g. a player holding still) reuse it instead
+		of querying the classifier again. Larger steps hit more often, and
+		are more likely to answer for a pose that would have been
+		classified differently.
+
+		entries belong to one model: lookups with any other classifier
+		object (e.g. after GestureClassifier.learn swapped it, or a
+		reload) clear the cache first.
+
+		hits/misses/invalidations count since it was made, and go to
+		metrics as classifier.cache_*.
+
+		Ideal Operation:
+		----------------
+
+			cache = PredictionCache(size=256, step=50.)
+			labels, confidences, missing = cache.get(classifier, X)
+			cache.put(classifier, X[missing], labels[missing], confidences[missing])
+	"""
+
+	def __init__(self, size=SIZE, step=STEP):
+		self.size = size
+		self.step = float(step)
+		self.entries = OrderedDict()		# key -> (label, confidence), least recently used first
+		self.model = None
+		self.lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+		self.invalidations = 0
+
+
+	def keys(self, X):
+		"""
+			returns the cache key of every row of X
+		"""
+		Q = np.round(np.asarray(X, dtype=np.float64) / self.step)
+		Q[np.isnan(Q)] = NAN_KEY
+		return [row.tostring() for row in Q.astype(np.int32)]
+
+
+	def check_model(self, model):
+		if not model is self.model:
+			if len(self.entries) > 0:
+				self.invalidations += 1
+				metrics.increment('classifier.cache_invalidations')
+			self.entries.clear()
+			self.model = model
+
+
+	def get(self, model, X):
+		"""
+			returns (labels, confidences, missing): labels/confidences of
+			the rows of X that model's predictions are cached for (None/nan
+			elsewhere), and the indices of the rows that aren't
+		"""
+		keys = self.keys(X)
+		labels, confidences = np.empty(len(keys), dtype=object), np.full(len(keys), np.nan)
+		missing = []
+		with self.lock:
+			self.check_model(model)
+			for ix, key in enumerate(keys):
+				entry = self.entries.pop(key, None)
+				if entry is None:
+					missing.append(ix)
+				else:
+					self.entries[key] = entry
+					labels[ix], confidences[ix] = entry
+			self.hits += len(keys) - len(missing)
+			self.misses += len(missing)
+		metrics.increment('classifier.cache_hits', len(keys) - len(missing))
+		metrics.increment('classifier.cache_misses', len(missing))
+		return labels, confidences, np.array(missing, dtype=int)
+
+
+	def put(self, model, X, labels, confidences):
+		"""
+			caches model's labels and confidences for the rows of X,
+			evicting the least recently used entries past size
+		"""
+		with self.lock:
+			self.check_model(model)
+			for key, label, confidence in zip(self.keys(X), labels, confidences):
+				self.entries[key] = (label, confidence)
+			while len(self.entries) > self.size:
+				self.entries.popitem(last=False)
+
+
+	def hit_rate(self):
+		return self.hits / float(max(self.hits + self.misses, 1))
+
+
+	def clear(self):
+		with self.lock:
+			self.entries.clear()
@@ -0,0 +1,237 @@
+#-------------------------------------------------- #
+# Class: Recording
+# ----------------
+# append-only, memory-mapped recording of raw
+# skeleton frames, seekable by frame number
+#-------------------------------------------------- #
+import os
+import json
+import pickle
+import numpy as np
+from Skeleton import Skeleton, JOINT_NAMES
+from WireFormat import SKELETON_DTYPE
+
+#=====[ one row per frame: when it was received, and which skeleton rows belong to it	]=====
+FRAME_DTYPE = np.dtype([
+						('timestamp', '<f8'),
+						('first_skeleton', '<u8'),
+						('num_skeletons', '<u4'),
+						('reserved', '<u4')
+					])
+
+
+def skeleton_index(name, default):
+	"""
+		ex: skeleton_3 -> 3
+	"""
+	try:
+		return int(name.rsplit('_', 1)[-1])
+	except ValueError:
+		return default
+
+
+def load_video(path):
+	"""
+		returns the frames at path: a Recording if it is one (or if an old
+		.vid/.pkl at path has been converted to one next to it), otherwise
+		the pickled list of raw frames
+	"""
+	converted_path = os.path.splitext(path)[0] + Recording.EXTENSION
+	for recording_path in [path, converted_path]:
+		if Recording.is_recording(recording_path):
+			return Recording(recording_path).load()
+	return pickle.load(open(path, 'r'))
+
+
+class Recording(object):
+	"""
+		Class: Recording
+		================
+		a recorded session as a directory of three files:
+
+			- skeletons.bin: one WireFormat.SKELETON_DTYPE row per skeleton
+			- frames.bin: one FRAME_DTYPE row per frame (timestamp, and the
+				range of skeletons.bin rows holding its skeletons)
+			- index.json: format version and joint table
+
+		Frames are written in chunks of chunk_size: skeleton rows first,
+		then the frame rows that point at them. Reading only trusts frame
+		rows whose skeletons are all on disk, so a crash loses at most the
+		last chunk. When reading, both files are memory-mapped and
+		recording[i] returns frame i as {skeleton_name:Skeleton}, like
+		the raw frames in video mode. The arrays are views onto the map.
+
+		Ideal Operation:
+		----------------
+
+			recording = Recording('../data/session.rec').create()
+			recording.append(frame, timestamp)
+			recording.close()
+
+			recording = Recording('../data/session.rec').load()
+			recording[100]		# -> {'skeleton_0':Skeleton, ...}
+	"""
+	VERSION = 1
+	EXTENSION = '.rec'
+	INDEX_NAME = 'index.json'
+	FRAMES_NAME = 'frames.bin'
+	SKELETONS_NAME = 'skeletons.bin'
+
+
+	def __init__(self, path, chunk_size=30):
+		self.path = path
+		self.chunk_size = chunk_size
+		self.index_path = os.path.join(path, self.INDEX_NAME)
+		self.frames_path = os.path.join(path, self.FRAMES_NAME)
+		self.skeletons_path = os.path.join(path, self.SKELETONS_NAME)
+		self.frames = np.zeros(0, dtype=FRAME_DTYPE)
+		self.skeletons = np.zeros(0, dtype=SKELETON_DTYPE)
+		self.writing = False
+
+
+	@classmethod
+	def is_recording(cls, path):
+		return os.path.isdir(path) and os.path.exists(os.path.join(path, cls.INDEX_NAME))
+
+
+
+	################################################################################
+	####################[ WRITING ]#################################################
+	################################################################################
+
+	def create(self):
+		"""
+			starts a new, empty recording at self.path
+		"""
+		if not os.path.exists(self.path):
+			os.makedirs(self.path)
+		index = {'version':self.VERSION, 'joint_names':JOINT_NAMES}
+		json.dump(index, open(self.index_path, 'w'), indent=4)
+		self.frames_file = open(self.frames_path, 'wb')
+		self.skeletons_file = open(self.skeletons_path, 'wb')
+		self.num_frames_written = 0
+		self.num_skeletons_written = 0
+		self.pending_frames, self.pending_skeletons = [], []
+		self.writing = True
+		return self
+
+
+	def append(self, frame, timestamp=None):
+		"""
+			adds a raw frame (dict of skeleton_name -> joint dict or Skeleton)
+			to the recording; written out every chunk_size frames
+		"""
+		skeletons = np.zeros(len(frame), dtype=SKELETON_DTYPE)
+		for ix, (name, s_frame) in enumerate(sorted(frame.items())):
+			skeleton = s_frame if isinstance(s_frame, Skeleton) else Skeleton.from_dict(s_frame, name)
+			skeletons[ix]['skeleton_index'] = skeleton_index(name, ix)
+			skeletons[ix]['positions'] = skeleton.positions
+			skeletons[ix]['orientations'] = np.nan if skeleton.orientations is None else skeleton.orientations
+			skeletons[ix]['confidences'] = 1. if skeleton.confidences is None else skeleton.confidences
+
+		first = self.num_skeletons_written + sum(len(s) for s in self.pending_skeletons)
+		timestamp = np.nan if timestamp is None else timestamp
+		self.pending_frames.append((timestamp, first, len(skeletons), 0))
+		self.pending_skeletons.append(skeletons)
+		if len(self.pending_frames) >= self.chunk_size:
+			self.flush()
+
+
+	def flush(self):
+		"""
+			writes out the pending chunk: skeletons first, then the frames
+		"""
+		if len(self.pending_frames) == 0:
+			return
+		skeletons = np.concatenate(self.pending_skeletons)
+		frames = np.array(self.pending_frames, dtype=FRAME_DTYPE)
+		for f, rows in [(self.skeletons_file, skeletons), (self.frames_file, frames)]:
+			f.write(rows.tostring())
+			f.flush()
+			os.fsync(f.fileno())
+		self.num_skeletons_written += len(skeletons)
+		self.num_frames_written += len(frames)
+		self.pending_frames, self.pending_skeletons = [], []
+
+
+	def close(self):
+		if self.writing:
+			self.flush()
+			self.frames_file.close()
+			self.skeletons_file.close()
+			self.writing = False
+		return self
+
+
+	@classmethod
+	def from_frames(cls, frames, path, timestamps=None):
+		"""
+			converts a list of raw frames (e.g. an old pickled .vid) into a
+			Recording at path; returns it loaded
+		"""
+		recording = cls(path).create()
+		for ix, frame in enumerate(frames):
+			recording.append(frame, None if timestamps is None else timestamps[ix])
+		return recording.close().load()
+
+
+
+	################################################################################
+	####################[ READING ]#################################################
+	################################################################################
+
+	def map_rows(self, path, dtype):
+		"""
+			returns a read-only memmap over the complete rows in path
+		"""
+		num_rows = os.path.getsize(path) // dtype.itemsize
+		if num_rows == 0:
+			return np.zeros(0, dtype=dtype)
+		return np.memmap(path, dtype=dtype, mode='r', shape=(num_rows,))
+
+
+	def load(self):
+		"""
+			memory-maps the recording at self.path
+		"""
+		index = json.load(open(self.index_path))
+		if index['version'] != self.VERSION or tuple(index['joint_names']) != JOINT_NAMES:
+			raise ValueError("Incompatible recording: %s" % self.path)
+		self.skeletons = self.map_rows(self.skeletons_path, SKELETON_DTYPE)
+		frames = self.map_rows(self.frames_path, FRAME_DTYPE)
+
+		#=====[ drop trailing frames whose skeletons never made it to disk	]=====
+		complete = frames['first_skeleton'] + frames['num_skeletons'] <= len(self.skeletons)
+		self.frames = frames[:complete.sum()]
+		return self
+
+
+	def __len__(self):
+		return len(self.frames)
+
+
+	def __getitem__(self, frame_number):
+		"""
+			returns frame frame_number as {skeleton_name:Skeleton}
+		"""
+		first = int(self.frames['first_skeleton'][frame_number])
+		records = self.skeletons[first:first + int(self.frames['num_skeletons'][frame_number])]
+		positions, orientations, confidences = records['positions'], records['orientations'], records['confidences']
+		frame = {}
+		for ix, index in enumerate(records['skeleton_index']):
+			name = 'skeleton_%d' % index
+			frame[name] = Skeleton(positions[ix], orientations[ix], name, confidences[ix])
+		return frame
+
+
+	def __iter__(self):
+		for frame_number in range(len(self)):
+			yield self[frame_number]
+
+
+	@property
+	def timestamps(self):
+		"""
+			(num_frames,) array of receive times; nan where unknown
+		"""
+		return self.frames['timestamp']
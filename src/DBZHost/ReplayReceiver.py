@@ -0,0 +1,215 @@
+#-------------------------------------------------- #
+# Class: ReplayReceiver
+# ---------------------
+# plays back recorded frames through the same
+# interface as DeviceReceiver
+#-------------------------------------------------- #
+import time
+import logging
+import numpy as np
+from StoppableThread import StoppableThread
+from FrameBuffer import FrameBuffer
+
+logger = logging.getLogger(__name__)
+
+
+class ReplayReceiver (StoppableThread):
+    """
+        class for replaying a recording (a Recording, or a list of raw
+        frames) as if it came from a device:
+        - get_frame () / get_record () / get_stats () as in DeviceReceiver
+        - has_frames () is False once a non-looping replay is used up
+
+        pacing:
+        - 'timestamp': frames are put at their recorded receive times
+            (falls back to 'fps' if the recording has none)
+        - 'fps': frames are put every 1/fps seconds
+        - 'max_speed': no thread; each read produces the next frame, so
+            every frame is seen exactly once, in order (deterministic)
+
+        paced replays run in their own thread and fill the FrameBuffer like
+        DeviceReceiver does, so 'latest' reads drop frames the reader is too
+        slow for, just like live. frames start_frame..end_frame-1 are played,
+        from the top again if loop.
+
+        decode: if given, the recording holds wire messages and every
+        frame is passed through decode as it is put, like a device's
+        frames are as they are received
+    """
+
+    _name = "ReplayReceiver"
+    PACINGS = ('timestamp', 'fps', 'max_speed')
+    DEFAULT_FPS = 30.
+    POLL_INTERVAL = 0.1
+
+
+    #==========[ Constructor ]==========
+    def __init__ (self, video, pacing='max_speed', fps=DEFAULT_FPS, loop=False, start_frame=0, end_frame=None, mode=None, capacity=64, decode=None):
+        """
+            PUBLIC: Constructor
+            -------------------
+            given a recording, gets ready to play it back (starts the
+            thread for paced replays)
+            mode: default read mode for get_frame (see FrameBuffer); 'every'
+                for max_speed replays, 'latest' otherwise
+        """
+        #=====[ Step 1: initialize StoppableThread ]=====
+        StoppableThread.__init__ (self, self._name)
+
+        #=====[ Step 2: IPC setup ]=====
+        if not pacing in self.PACINGS:
+            raise TypeError ("Pacing not supported: " + pacing)
+        self.pacing = pacing
+        self.paced = pacing != 'max_speed'
+        self.mode = mode or ('latest' if self.paced else 'every')
+        if not self.mode in FrameBuffer.MODES:
+            raise TypeError ("Read mode not supported: " + self.mode)
+        self.frame_buffer = FrameBuffer (capacity)
+        self.num_received = 0
+        self.num_decoded = 0
+
+        #=====[ Step 3: frame range and schedule ]=====
+        self.video = video
+        self.decode = decode
+        self.loop = loop
+        self.start_frame = start_frame
+        self.end_frame = len(video) if end_frame is None else min(end_frame, len(video))
+        self.num_frames = self.end_frame - self.start_frame
+        if self.num_frames <= 0:
+            raise ValueError ("Empty frame range: [%d, %d)" % (self.start_frame, self.end_frame))
+        self.fps = fps
+        self.offsets = self.get_schedule ()
+        self.pass_duration = self.offsets[-1] + 1. / fps
+        self.finished = False
+
+        #=====[ Step 4: start this thread ]=====
+        if self.paced:
+            self.start_time = time.time ()
+            self.start ()
+
+
+    #==========[ Destructor ]==========
+    def __del__ (self):
+        """
+            PUBLIC: Destructor
+            ------------------
+            stops/joins this thread
+        """
+        self.stop ()
+        if self.is_alive ():
+            self.join ()
+
+
+    #==========[ Playback ]==========
+    def get_schedule (self):
+        """
+            PRIVATE: get_schedule
+            ---------------------
+            returns the time of every frame in the range, in seconds since
+            the first one
+        """
+        timestamps = getattr (self.video, 'timestamps', None)
+        if self.pacing == 'timestamp' and not timestamps is None:
+            offsets = np.asarray (timestamps[self.start_frame:self.end_frame], dtype=np.float64)
+            if np.all (np.isfinite (offsets)) and np.all (np.diff (offsets) >= 0):
+                return offsets - offsets[0]
+            logger.warning ("recording has no usable timestamps, replaying at %.1f fps", self.fps)
+        return np.arange (self.num_frames) / float(self.fps)
+
+
+    def frame_number (self, seq):
+        """
+            PUBLIC: frame_number
+            --------------------
+            returns the recording's frame number for a record's seq
+        """
+        return self.start_frame + seq % self.num_frames
+
+
+    def put_next (self):
+        """
+            PRIVATE: put_next
+            -----------------
+            puts the next frame of the recording into self.frame_buffer
+        """
+        frame = self.video[self.frame_number (self.num_received)]
+        self.num_received += 1
+        if not self.decode is None:
+            frame = self.decode (frame)
+        self.num_decoded += 1
+        self.frame_buffer.put (frame)
+        if not self.loop and self.num_received >= self.num_frames:
+            self.finished = True
+            self.stop ()
+
+
+    def thread_iteration (self):
+        """
+            PRIVATE: thread_iteration
+            -------------------------
+            waits until the next frame is due, then puts it
+        """
+        num_passes, ix = divmod (self.num_received, self.num_frames)
+        due = self.start_time + num_passes * self.pass_duration + self.offsets[ix]
+        delay = due - time.time ()
+        if delay > 0:
+            self._stop.wait (delay)
+            if self._stop.isSet ():
+                return
+        self.put_next ()
+
+
+    #==========[ Reading ]==========
+    def has_frames (self):
+        """
+            PUBLIC: has_frames
+            ------------------
+            returns False once the replay is over and everything was read
+        """
+        return not self.finished or self.frame_buffer.read_seq < self.frame_buffer.write_seq
+
+
+    def get_record (self, mode=None, timeout=None):
+        """
+            PUBLIC: get_record
+            ------------------
+            as in DeviceReceiver; returns None once the replay is over
+        """
+        if not self.paced and not self.finished and self.frame_buffer.read_seq >= self.frame_buffer.write_seq:
+            self.put_next ()
+
+        deadline = None if timeout is None else time.time () + timeout
+        while self.has_frames ():
+            wait = self.POLL_INTERVAL if deadline is None else min (self.POLL_INTERVAL, deadline - time.time ())
+            record = self.frame_buffer.get (mode or self.mode, max (wait, 0))
+            if record:
+                return record
+            if not deadline is None and time.time () >= deadline:
+                break
+        return None
+
+
+    def get_frame (self, mode=None, timeout=None):
+        """
+            PUBLIC: get_frame
+            -----------------
+            as in DeviceReceiver
+        """
+        record = self.get_record (mode, timeout)
+        if isinstance (record, list):
+            return [r.frame for r in record]
+        return None if record is None else record.frame
+
+
+    def get_stats (self):
+        """
+            PUBLIC: get_stats
+            -----------------
+            as in DeviceReceiver
+        """
+        return {
+                    'received':self.num_received,
+                    'decoded':self.num_decoded,
+                    'dropped':self.frame_buffer.dropped,
+                    'overwritten':self.frame_buffer.overwritten
+                }
@@ -0,0 +1,215 @@
+#-------------------------------------------------- #
+# Class: SequenceClassifier
+# -------------------------
+# classifies the motion in a window of frames,
+# trained on labelled recordings
+#-------------------------------------------------- #
+import os
+import json
+import pickle
+import logging
+import numpy as np
+from Skeleton import Skeleton, NUM_JOINTS
+from Player import Player
+from SkeletonTracker import SkeletonTracker
+from Recording import load_video
+from GestureIndex import GestureIndex
+from GestureRecognizer import GestureRecognizer
+
+logger = logging.getLogger(__name__)
+
+LABELS_EXTENSION = '.labels.json'
+DEFAULT_GESTURE = 'no_gesture'		# frames no segment covers
+N_NEIGHBORS = 5
+MIN_AGREEMENT = 0.5					# see GestureRecognizer.sequence_to_windows
+DRAFT_MIN_LENGTH = 10				# frames a drafted segment lasts, at least
+
+
+
+################################################################################
+####################[ LABELS ]##################################################
+################################################################################
+# a recording's labels sit next to it, in <recording>.labels.json:
+#
+# 	{"segments": [{"player": 0, "start": 120, "end": 168, "gesture": "ground_charge"}, ...]}
+#
+# start/end are frame numbers in the recording (end excluded); player is
+# the index of the player (as tracked) doing it, 0 if left out.
+
+def labels_path(recording_path):
+	return os.path.splitext(recording_path.rstrip(os.sep))[0] + LABELS_EXTENSION
+
+
+def load_segments(path):
+	return json.load(open(path, 'r'))['segments']
+
+
+def save_segments(segments, path):
+	json.dump({'segments':segments}, open(path, 'w'), indent=4)
+
+
+def frame_labels(segments, num_frames, player=0):
+	"""
+		returns the gesture of every frame of a recording, for player
+	"""
+	labels = [DEFAULT_GESTURE] * num_frames
+	for segment in segments:
+		if segment.get('player', 0) == player:
+			for ix in range(max(segment['start'], 0), min(segment['end'], num_frames)):
+				labels[ix] = segment['gesture']
+	return labels
+
+
+
+################################################################################
+####################[ RECORDINGS ]##############################################
+################################################################################
+
+def track_recording(frames, gesture_classifier, num_players):
+	"""
+		replays frames (see load_video) through a SkeletonTracker, as
+		DBZController.update_players does; returns, for each player,
+		(seqs, features): the frame numbers it was tracked in, and its
+		featurized h_coords in each
+	"""
+	players = [Player(ix, gesture_classifier) for ix in range(num_players)]
+	tracker = SkeletonTracker(Player.DISTANCE_THRESHOLD)
+	tracked = [([], []) for player in players]
+	for seq, frame in enumerate(frames):
+		skeletons = [s_frame if isinstance(s_frame, Skeleton) else Skeleton.from_dict(s_frame, name=s_name) for s_name, s_frame in frame.iteritems()]
+		for (seqs, positions), player, updated in zip(tracked, players, tracker.update(players, skeletons, seq)):
+			if updated:
+				seqs.append(seq)
+				positions.append(player.h_coords.positions)
+	return [(np.array(seqs, dtype=np.int64), gesture_classifier.featurize_batch(np.array(positions).reshape(-1, NUM_JOINTS, 3))) for seqs, positions in tracked]
+
+
+def recording_windows(path, gesture_classifier, num_players, window_length, hop=1, min_agreement=MIN_AGREEMENT):
+	"""
+		returns (X, y): the labelled windows of the recording at path (see
+		labels_path), every player's, in the order they happened
+	"""
+	segments = load_segments(labels_path(path))
+	frames = load_video(path)
+	rows, window_labels = [], []
+	for player, (seqs, features) in enumerate(track_recording(frames, gesture_classifier, num_players)):
+		labels = frame_labels(segments, len(frames), player)
+		X, y = GestureRecognizer.sequence_to_windows(features, window_length, hop, seqs, [labels[seq] for seq in seqs], min_agreement)
+		if len(X) > 0:
+			rows.append(X)
+			window_labels += y
+	if len(rows) == 0:
+		return np.zeros((0, 0)), np.array([], dtype=object)
+	return np.concatenate(rows), np.array(window_labels, dtype=object)
+
+
+def draft_segments(path, gesture_classifier, num_players, window_length, min_length=DRAFT_MIN_LENGTH):
+	"""
+		returns segments for the recording at path as the per-frame pose
+		classifier sees them (runs of at least min_length frames where its
+		windowed vote isn't DEFAULT_GESTURE): a starting point to correct
+		by hand, not labels to train on as they are
+	"""
+	segments = []
+	for player, (seqs, features) in enumerate(track_recording(load_video(path), gesture_classifier, num_players)):
+		if len(seqs) == 0:
+			continue
+		labels, confidences = gesture_classifier.predict_batch(features)
+		recognizer = GestureRecognizer(features.shape[1], window_length)
+		gestures = [recognizer.push(f, label, seq) for f, label, seq in zip(features, labels, seqs)]
+
+		#=====[ runs of one gesture, broken by a change or a gap	]=====
+		start = 0
+		for ix in range(1, len(seqs) + 1):
+			if ix == len(seqs) or gestures[ix] != gestures[start] or seqs[ix] != seqs[ix - 1] + 1:
+				if gestures[start] != DEFAULT_GESTURE and ix - start >= min_length:
+					segments.append({'player':player, 'start':int(seqs[start]), 'end':int(seqs[ix - 1]) + 1, 'gesture':gestures[start]})
+				start = ix
+	return segments
+
+
+
+################################################################################
+####################[ CLASSIFIER ]##############################################
+################################################################################
+
+class SequenceClassifier(object):
+	"""
+		Class: SequenceClassifier
+		=========================
+		a GestureIndex over GestureRecognizer.window_features rows: what a
+		player's motion over the last window_length frames was, e.g.
+		ground_charge vs overhead_charge, where single poses can look
+		alike. Trained on recordings with labelled segments (see
+		labels_path); GestureClassifier loads it from data/classifiers if
+		there is one, and Players then hand it to their recognizers.
+
+		window_length is part of the model: windows of any other length
+		have different statistics, so Players use this one.
+
+		Ideal Operation:
+		----------------
+
+			classifier = SequenceClassifier(window_length=15)
+			classifier.train([('../data/jay_alone.vid', 1)], gesture_classifier)
+			classifier.save('../data/classifiers/seq_clf.pkl')
+			labels, confidences = classifier.query(windows)
+	"""
+
+	def __init__(self, window_length=Player.GESTURE_LENGTH, hop=1, n_neighbors=N_NEIGHBORS, min_agreement=MIN_AGREEMENT):
+		self.window_length = window_length
+		self.hop = hop
+		self.min_agreement = min_agreement
+		self.index = GestureIndex(n_neighbors=n_neighbors, algorithm='brute', normalize=True)
+
+
+	def windows(self, recordings, gesture_classifier):
+		"""
+			given (path, num_players) of labelled recordings, returns their
+			(X, y), one pair per recording
+		"""
+		return [recording_windows(path, gesture_classifier, num_players, self.window_length, self.hop, self.min_agreement) for path, num_players in recordings]
+
+
+	def train(self, recordings, gesture_classifier):
+		"""
+			fits on every labelled window of recordings (see windows)
+		"""
+		windows = [(X, y) for X, y in self.windows(recordings, gesture_classifier) if len(X) > 0]
+		if len(windows) == 0:
+			raise ValueError("No labelled windows in " + ', '.join(path for path, num_players in recordings))
+		return self.fit(np.concatenate([X for X, y in windows]), np.concatenate([y for X, y in windows]))
+
+
+	def fit(self, X, y):
+		self.index.fit(X, y)
+		self.classes_ = self.index.classes_
+		return self
+
+
+	def query(self, X):
+		"""
+			returns (labels, confidences) for every window in X
+		"""
+		return self.index.query(X)
+
+
+	def predict(self, X):
+		return self.index.predict(X)
+
+
+	def predict_proba(self, X):
+		return self.index.predict_proba(X)
+
+
+	def score(self, X, y):
+		return np.mean(self.predict(X) == np.asarray(y))
+
+
+	def save(self, path):
+		pickle.dump(self, open(path, 'w'))
+
+
+	@classmethod
+	def load(cls, path):
+		return pickle.load(open(path, 'r'))
@@ -0,0 +1,166 @@
+#-------------------------------------------------- #
+# Class: Skeleton
+# ---------------
+# compact, array-backed representation of a single
+# skeleton as reported by the primesense
+#-------------------------------------------------- #
+import numpy as np
+from parameters import connect_parameters
+
+#=====[ Joint table: alphabetical, i.e. the column order of the old pose DataFrames	]=====
+JOINT_NAMES = (
+				'head',
+				'left_elbow',
+				'left_foot',
+				'left_hand',
+				'left_hip',
+				'left_knee',
+				'left_shoulder',
+				'neck',
+				'right_elbow',
+				'right_foot',
+				'right_hand',
+				'right_hip',
+				'right_knee',
+				'right_shoulder',
+				'torso'
+			)
+JOINT_INDEX = {name:ix for ix, name in enumerate(JOINT_NAMES)}
+NUM_JOINTS = len(JOINT_NAMES)
+COORD_NAMES = ('x', 'y', 'z')
+ORIENTATION_NAMES = ('w', 'x', 'y', 'z')
+
+
+def raw_joint_key(joint_name, suffix):
+	"""
+		ex: left_shoulder, POSITION -> JOINT_LEFT_SHOULDER_POSITION
+	"""
+	return 'JOINT_' + joint_name.upper() + '_' + suffix
+
+
+def to_float(value):
+	"""
+		goes from a raw frame value to a float; missing values (None or
+		one of the receiver's none_substitutes) become nan
+	"""
+	if value is None or value in connect_parameters['none_substitutes']:
+		return np.nan
+	return float(value)
+
+
+class Skeleton(object):
+	"""
+		Class: Skeleton
+		===============
+		a single skeleton as a fixed (NUM_JOINTS, 3) float32 array of joint
+		positions, rows ordered as in JOINT_NAMES; orientations are an
+		optional (NUM_JOINTS, 4) float32 block of (w, x, y, z) quaternions,
+		and confidences an optional (NUM_JOINTS,) float32 block.
+
+		Ideal Operation:
+		----------------
+
+			skeleton = Skeleton.from_dict(frame['skeleton_0'], name='skeleton_0')
+			skeleton['left_shoulder']	# -> array([x, y, z])
+			skeleton.to_df()			# -> DataFrame view for notebooks/Visualizer
+	"""
+	__slots__ = ('positions', 'orientations', 'confidences', 'name')
+
+
+	def __init__(self, positions, orientations=None, name=None, confidences=None):
+		self.positions = np.asarray(positions, dtype=np.float32)
+		assert self.positions.shape == (NUM_JOINTS, 3)
+		if not orientations is None:
+			orientations = np.asarray(orientations, dtype=np.float32)
+			assert orientations.shape == (NUM_JOINTS, 4)
+		if not confidences is None:
+			confidences = np.asarray(confidences, dtype=np.float32)
+			assert confidences.shape == (NUM_JOINTS,)
+		self.orientations = orientations
+		self.confidences = confidences
+		self.name = name
+
+
+	################################################################################
+	####################[ CONVERSION ]##############################################
+	################################################################################
+
+	@classmethod
+	def from_dict(cls, s_frame, name=None):
+		"""
+			performs the following conversion:
+				{
+					JOINT_HEAD_POSITION:{'x':..., 'y':..., 'z':...},
+					JOINT_HEAD_ORIENTATION:{'w':..., 'x':..., 'y':..., 'z':...},
+					..
+				}
+				==>
+				Skeleton
+		"""
+		positions = np.empty((NUM_JOINTS, 3), dtype=np.float32)
+		for ix, joint_name in enumerate(JOINT_NAMES):
+			coords = s_frame[raw_joint_key(joint_name, 'POSITION')]
+			positions[ix] = [to_float(coords[c]) for c in COORD_NAMES]
+
+		orientations = None
+		if raw_joint_key(JOINT_NAMES[0], 'ORIENTATION') in s_frame:
+			orientations = np.empty((NUM_JOINTS, 4), dtype=np.float32)
+			for ix, joint_name in enumerate(JOINT_NAMES):
+				quat = s_frame[raw_joint_key(joint_name, 'ORIENTATION')]
+				orientations[ix] = [to_float(quat[c]) for c in ORIENTATION_NAMES]
+
+		return cls(positions, orientations, name)
+
+
+	@classmethod
+	def from_df(cls, df, name=None):
+		"""
+			given a pose DataFrame (indexed by x/y/z, one column per joint),
+			returns the corresponding Skeleton
+		"""
+		return cls(np.array(df[list(JOINT_NAMES)].loc[list(COORD_NAMES)], dtype=np.float32).T, name=name)
+
+
+	def to_df(self):
+		"""
+			returns a DataFrame view of the positions, indexed by x/y/z with
+			one column per joint; only meant for notebooks and the Visualizer
+		"""
+		import pandas as pd
+		return pd.DataFrame(self.positions.T, index=COORD_NAMES, columns=JOINT_NAMES)
+
+
+	def to_dict(self):
+		"""
+			returns {joint_name:{'x':..., 'y':..., 'z':...}, ...}
+		"""
+		return {name:dict(zip(COORD_NAMES, coords)) for name, coords in zip(JOINT_NAMES, self.positions.tolist())}
+
+
+	def copy(self):
+		orientations = None if self.orientations is None else self.orientations.copy()
+		confidences = None if self.confidences is None else self.confidences.copy()
+		return Skeleton(self.positions.copy(), orientations, self.name, confidences)
+
+
+	################################################################################
+	####################[ ACCESS ]##################################################
+	################################################################################
+
+	def __getitem__(self, joint_name):
+		"""
+			returns the (x, y, z) position of the named joint
+		"""
+		return self.positions[JOINT_INDEX[joint_name]]
+
+
+	def __getstate__(self):
+		return (self.positions, self.orientations, self.name, self.confidences)
+
+
+	def __setstate__(self, state):
+		self.positions, self.orientations, self.name, self.confidences = state
+
+
+	def __str__(self):
+		return str(self.to_df())
@@ -0,0 +1,153 @@
+#-------------------------------------------------- #
+# Class: SkeletonTracker
+# ----------------------
+# decides which skeleton in a frame belongs to
+# which player
+#-------------------------------------------------- #
+import logging
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from Skeleton import JOINT_INDEX
+
+logger = logging.getLogger(__name__)
+
+#=====[ track states	]=====
+TRACKED = 'tracked'			# seen in the last frame
+LOST = 'lost'				# not seen for a few frames; still looked for near where it should be
+SEARCHING = 'searching'		# never seen, or lost for too long; takes any skeleton nobody else has
+
+
+class SkeletonTracker(object):
+	"""
+		Class: SkeletonTracker
+		======================
+		assigns a frame's skeletons to players, all at once: every
+		tracked or lost player's origin (midpoint of the shoulders) is
+		predicted forward with its velocity, the distances from every
+		prediction to every skeleton's origin form one matrix, and the
+		assignment with the least total distance (under distance_threshold
+		per pair) wins. So the result doesn't depend on the order of the
+		players, and two players crossing keep their identities as long as
+		they keep moving the way they were.
+
+		a player that isn't matched is LOST for up to max_lost frames, then
+		SEARCHING: it takes the first skeleton no other player has, like it
+		did when it was first seen.
+
+		the per-track state (track_status, velocity, misses, last_seen_seq)
+		lives on the Players, next to their coordinates.
+
+		Ideal Operation:
+		----------------
+
+			tracker = SkeletonTracker()
+			updated = tracker.update(players, skeleton_poses_c, frame_seq)
+	"""
+	DISTANCE_THRESHOLD = 500.
+	MAX_LOST = 30
+	MAX_PREDICTION = 5			# frames to extrapolate a lost player's motion for, at most
+	VELOCITY_SMOOTHING = 0.5	# weight of the newest velocity estimate
+
+
+	def __init__(self, distance_threshold=DISTANCE_THRESHOLD, max_lost=MAX_LOST):
+		self.distance_threshold = distance_threshold
+		self.max_lost = max_lost
+
+
+	@staticmethod
+	def get_origins(skeletons):
+		"""
+			returns the (len(skeletons), 3) origins of a list of Skeletons
+		"""
+		if len(skeletons) == 0:
+			return np.zeros((0, 3))
+		positions = np.array([s.positions for s in skeletons])
+		return (positions[:, JOINT_INDEX['left_shoulder']] + positions[:, JOINT_INDEX['right_shoulder']])/2.
+
+
+	def predict(self, players, frame_seq):
+		"""
+			returns the (len(players), 3) origins the players should be at
+			by frame_seq
+		"""
+		origins = np.array([player.origin for player in players], dtype=np.float64).reshape(-1, 3)
+		velocities = np.array([player.velocity for player in players], dtype=np.float64).reshape(-1, 3)
+		elapsed = np.array([frame_seq - player.last_seen_seq for player in players], dtype=np.float64)
+		return origins + velocities * np.clip(elapsed, 0, self.MAX_PREDICTION)[:, np.newaxis]
+
+
+	def assign(self, players, skeletons, frame_seq):
+		"""
+			returns, for each player, the index of its skeleton in skeletons
+			(or None)
+		"""
+		assignment = [None] * len(players)
+		taken = set()
+
+		#=====[ Step 1: optimal assignment of the players being tracked	]=====
+		tracked = [ix for ix, player in enumerate(players) if player.track_status != SEARCHING]
+		if len(tracked) > 0 and len(skeletons) > 0:
+			predicted = self.predict([players[ix] for ix in tracked], frame_seq)
+			distances = np.linalg.norm(predicted[:, np.newaxis, :] - self.get_origins(skeletons)[np.newaxis, :, :], axis=-1)
+			distances[~(distances < self.distance_threshold)] = np.inf		# too far, or nan
+			costs = np.where(np.isinf(distances), 2 * self.distance_threshold * len(skeletons), distances)
+			for row, col in zip(*linear_sum_assignment(costs)):
+				if np.isfinite(distances[row, col]):
+					assignment[tracked[row]] = col
+					taken.add(col)
+
+		#=====[ Step 2: searching players take what's left, in order	]=====
+		free = [col for col in range(len(skeletons)) if not col in taken]
+		for ix, player in enumerate(players):
+			if player.track_status == SEARCHING and len(free) > 0:
+				assignment[ix] = free.pop(0)
+		return assignment
+
+
+	def update(self, players, skeleton_c_coords, frame_seq):
+		"""
+			assigns skeleton_c_coords (a list of Skeletons) to the players,
+			updates each matched one's coordinates and every player's track
+			state, and *REMOVES* the assigned skeletons from the list.
+			returns, for each player, whether it was updated.
+		"""
+		assignment = self.assign(players, skeleton_c_coords, frame_seq)
+		for player, col in zip(players, assignment):
+			player.frame_seq = frame_seq
+			if col is None:
+				self.miss(player)
+			else:
+				self.hit(player, skeleton_c_coords[col], frame_seq)
+		for col in sorted([col for col in assignment if not col is None], reverse=True):
+			skeleton_c_coords.pop(col)
+		return [not col is None for col in assignment]
+
+
+	def hit(self, player, c_coords, frame_seq):
+		"""
+			player was matched to c_coords in frame_seq
+		"""
+		last_origin, last_seen_seq = player.origin, player.last_seen_seq
+		player.update_coords(c_coords)
+		if player.track_status == SEARCHING:
+			if not last_origin is None:
+				logger.info("player %d reacquired", player.index)
+			player.velocity = np.zeros(3)
+		elif frame_seq > last_seen_seq:
+			velocity = (player.origin - last_origin) / float(frame_seq - last_seen_seq)
+			player.velocity = self.VELOCITY_SMOOTHING * velocity + (1 - self.VELOCITY_SMOOTHING) * player.velocity
+		player.track_status, player.misses, player.last_seen_seq = TRACKED, 0, frame_seq
+
+
+	def miss(self, player):
+		"""
+			player wasn't matched in this frame
+		"""
+		if player.track_status == SEARCHING:
+			return
+		player.misses += 1
+		if player.misses > self.max_lost:
+			logger.info("player %d lost", player.index)
+			player.track_status = SEARCHING
+		else:
+			player.track_status = LOST
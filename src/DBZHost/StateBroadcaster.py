@@ -0,0 +1,409 @@
+#-------------------------------------------------- #
+# Class: StateBroadcaster
+# -----------------------
+# sends game state to any number of clients over
+# one listening socket
+#-------------------------------------------------- #
+import json
+import errno
+import select
+import socket
+import logging
+from collections import deque
+from Metrics import metrics
+from StateFormat import PlayerState, StateEncoder, encode_json, is_keyframe
+
+logger = logging.getLogger(__name__)
+
+COMPUTER_PORT = 5557
+
+#=====[ messages queued per client, by default	]=====
+QUEUE_SIZE = 2
+
+#=====[ what to do with a message for a client whose queue is full	]=====
+DROP_POLICIES = ('oldest', 'newest', 'disconnect')
+
+#=====[ 'json': plain json messages, back to back; 'compact': length-framed StateFormat messages	]=====
+ENCODINGS = ('json', 'compact')
+
+GAME_TOPIC = 'game'
+
+
+def player_topic(index):
+	return 'player_%d' % index
+
+
+def request_error(request):
+	"""
+		returns what is wrong with a subscription request (see
+		BroadcastClient.subscribe), or None if nothing is
+	"""
+	if not isinstance(request, dict):
+		return "not a json object"
+	topics = request.get('topics', [])
+	if not isinstance(topics, list) or not all(isinstance(topic, basestring) for topic in topics):
+		return "topics must be a list of strings"
+	queue_size = request.get('queue_size', 1)
+	if not isinstance(queue_size, (int, long)) or isinstance(queue_size, bool):
+		return "queue_size must be an integer"
+	if not request.get('drop', DROP_POLICIES[0]) in DROP_POLICIES:
+		return "drop must be one of %s" % ', '.join(DROP_POLICIES)
+	if not request.get('encoding', ENCODINGS[0]) in ENCODINGS:
+		return "encoding must be one of %s" % ', '.join(ENCODINGS)
+	return None
+
+
+
+class BroadcastClient(object):
+	"""
+		Class: BroadcastClient
+		======================
+		one connected client: the topics it gets, the encoding it gets
+		them in, and its own bounded outbox. When the outbox is full,
+		drop_policy says what goes:
+
+			- 'oldest': the stalest queued message (best for live state)
+			- 'newest': the message being sent
+			- 'disconnect': the client (for ones that must see everything,
+				e.g. recorders, with a big queue_size)
+
+		a message that was started is always finished, so the stream stays
+		intact whatever is dropped. Compact keyframes are never dropped,
+		since the deltas after them are useless without them: the oldest
+		queued delta goes instead, or an older keyframe of the same topic
+		that the new one replaces. Failing that, the keyframe is queued
+		anyway, over queue_size (at most one per topic).
+	"""
+
+	def __init__(self, sock, address, topics=(), queue_size=QUEUE_SIZE, drop_policy='oldest'):
+		self.sock = sock
+		self.address = address
+		self.topics = set(topics)
+		self.defaulted = True		# topics were picked for it; it never subscribed
+		self.outbox = deque()
+		self.queue_size = queue_size
+		self.drop_policy = drop_policy
+		self.encoding = 'json'
+		self.pending = ''
+		self.inbox = ''
+		self.num_sent = 0
+		self.num_dropped = 0
+		self.closed = False
+
+
+	def fileno(self):
+		return self.sock.fileno()
+
+
+	def subscribe(self, request):
+		"""
+			applies a subscription request, a dict with any of:
+				topics: list of topics to get (replaces the current ones)
+				queue_size: outbox size
+				drop: drop policy
+				encoding: 'json' or 'compact'
+			read() only returns requests that request_error passes
+		"""
+		if 'topics' in request:
+			self.topics = set(request['topics'])
+			self.defaulted = False
+		self.queue_size = max(request.get('queue_size', self.queue_size), 1)
+		self.drop_policy = request.get('drop', self.drop_policy)
+		self.encoding = request.get('encoding', self.encoding)
+		while len(self.outbox) > self.queue_size and self.evict():
+			pass
+		logger.info("client %s: topics %s, queue %d, drop %s, %s", self.address, sorted(self.topics), self.queue_size, self.drop_policy, self.encoding)
+
+
+	def evict(self, topic=None):
+		"""
+			removes the oldest queued message that isn't a keyframe, or
+			else the oldest keyframe of topic (about to be replaced by a
+			newer one); returns False if there was none
+		"""
+		for ix, (data, queued_topic, keyframe) in enumerate(self.outbox):
+			if not keyframe:
+				del self.outbox[ix]
+				return True
+		if not topic is None:
+			for ix, (data, queued_topic, keyframe) in enumerate(self.outbox):
+				if queued_topic == topic:
+					del self.outbox[ix]
+					return True
+		return False
+
+
+	def queue(self, data, topic=None, keyframe=False):
+		"""
+			queues data (keyframe: a compact keyframe of topic) according
+			to the drop policy; returns False if something was dropped
+		"""
+		dropped = len(self.outbox) >= self.queue_size
+		if dropped:
+			if self.drop_policy == 'disconnect':
+				logger.info("client %s fell behind, disconnecting", self.address)
+				self.close()
+			elif keyframe:
+				dropped = self.evict(topic)
+			elif self.drop_policy == 'oldest':
+				dropped, evicted = True, self.evict()
+				if not evicted:
+					data = None		# only keyframes queued: drop this delta instead
+			else:
+				data = None
+		if dropped:
+			self.num_dropped += 1
+			metrics.increment('broadcaster.dropped')
+		if not self.closed and not data is None:
+			self.outbox.append((data, topic, keyframe))
+		return not dropped
+
+
+	def wants_write(self):
+		return not self.closed and (len(self.pending) > 0 or len(self.outbox) > 0)
+
+
+	def flush(self):
+		"""
+			writes queued messages until the socket would block
+		"""
+		while not self.closed and (self.pending or self.outbox):
+			if not self.pending:
+				self.pending = self.outbox.popleft()[0]
+			try:
+				sent = self.sock.send(self.pending)
+			except socket.error as e:
+				if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+					return
+				logger.info("client %s disconnected (%s)", self.address, e)
+				self.close()
+				return
+			metrics.increment('broadcaster.bytes', sent)
+			self.pending = self.pending[sent:]
+			if not self.pending:
+				self.num_sent += 1
+
+
+	def read(self):
+		"""
+			reads what the client sent; returns the subscription requests
+			(one json object per line) it completed. Malformed ones are
+			logged and skipped, so no client can take the game down.
+		"""
+		try:
+			data = self.sock.recv(4096)
+		except socket.error as e:
+			if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+				return []
+			data = ''
+		if not data:
+			logger.info("client %s disconnected", self.address)
+			self.close()
+			return []
+		self.inbox += data
+		requests = []
+		while '\n' in self.inbox:
+			line, self.inbox = self.inbox.split('\n', 1)
+			try:
+				request = json.loads(line)
+			except ValueError:
+				logger.warning("client %s: bad subscription request %r", self.address, line)
+				continue
+			error = request_error(request)
+			if error is None:
+				requests.append(request)
+			else:
+				logger.warning("client %s: bad subscription request %r (%s)", self.address, line, error)
+		return requests
+
+
+	def close(self):
+		if not self.closed:
+			self.closed = True
+			self.sock.close()
+			self.outbox.clear()
+			self.pending = ''
+
+
+
+class StateBroadcaster(object):
+	"""
+		Class: StateBroadcaster
+		=======================
+		one listening socket for every client (phones, spectator displays,
+		recorders). Clients stay connected until they hang up, and each one
+		gets the topics it asked for:
+
+			- 'player_<n>': the state of player n (see Player.send_state)
+			- 'game': the state of the whole game (see DBZController)
+
+		a client that doesn't ask gets the first player topic nobody else
+		has yet (so phones that just connect are handed out in order),
+		or 'game' once every player has one. To ask, a client sends a line
+		of json, e.g.
+
+			{"topics": ["game"], "queue_size": 64, "drop": "disconnect"}
+
+		messages are json by default: clients with a single topic get them
+		as is, clients with several get {"topic": topic, "message": message}.
+		Clients that ask for "encoding": "compact" get length-framed
+		StateFormat messages instead: PlayerStates as keyframes/deltas
+		(each topic has its own StateEncoder; a client's first message on a
+		topic is a keyframe, and so is the next one after it drops a delta),
+		anything else as framed json. Either way, a message is encoded once
+		per send however many clients get it.
+
+		nothing blocks: send() queues on each client's outbox (see
+		BroadcastClient for the drop policies) and writes what it can;
+		poll() accepts clients, reads their requests and writes the rest.
+		Call poll() regularly, e.g. once per frame.
+
+		Ideal Operation:
+		----------------
+
+			broadcaster = StateBroadcaster(num_players=2)
+			broadcaster.send(player_topic(0), state)
+			broadcaster.poll()
+	"""
+
+	def __init__(self, num_players=1, port=COMPUTER_PORT, queue_size=QUEUE_SIZE, drop_policy='oldest'):
+		if not drop_policy in DROP_POLICIES:
+			raise TypeError("Drop policy not supported: " + drop_policy)
+		self.num_players = num_players
+		self.queue_size = queue_size
+		self.drop_policy = drop_policy
+		self.clients = []
+		self.encoders = {}					# topic -> StateEncoder for its compact messages
+		self.keyframe_topics = set()		# topics with a compact client that still needs a keyframe
+		self.num_bytes = 0
+
+		self.s_computer = socket.socket()
+		self.s_computer.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+		self.s_computer.setblocking(0)
+		self.s_computer.bind(('', port))
+		self.s_computer.listen(5)
+
+
+
+	################################################################################
+	####################[ CLIENTS ]#################################################
+	################################################################################
+
+	def default_topics(self):
+		"""
+			topics for a client that didn't ask for any
+		"""
+		taken = set(topic for client in self.clients if client.defaulted for topic in client.topics)
+		for index in range(self.num_players):
+			if not player_topic(index) in taken:
+				return [player_topic(index)]
+		return [GAME_TOPIC]
+
+
+	def accept(self):
+		"""
+			accepts every waiting client
+		"""
+		while True:
+			try:
+				sock, address = self.s_computer.accept()
+			except socket.error:
+				return
+			sock.setblocking(0)
+			client = BroadcastClient(sock, address, self.default_topics(), self.queue_size, self.drop_policy)
+			self.clients.append(client)
+			metrics.increment('broadcaster.connects')
+			logger.info("client %s connected: %s", address, sorted(client.topics))
+
+
+	def has_subscribers(self, topic):
+		return any(topic in client.topics for client in self.clients)
+
+
+	def subscribe(self, client, request):
+		client.subscribe(request)
+		if client.encoding == 'compact':
+			self.keyframe_topics.update(client.topics)
+
+
+	def remove_closed(self):
+		self.clients = [client for client in self.clients if not client.closed]
+
+
+
+	################################################################################
+	####################[ SENDING ]#################################################
+	################################################################################
+
+	def encode(self, topic, msg, encoding, wrapped=False):
+		"""
+			returns msg (a PlayerState, or anything json-able) encoded for
+			clients of topic that want encoding (wrapped: in a topic envelope)
+		"""
+		if encoding == 'compact':
+			if not isinstance(msg, PlayerState):
+				return encode_json(msg)
+			if not topic in self.encoders:
+				self.encoders[topic] = StateEncoder()
+			keyframe = topic in self.keyframe_topics
+			self.keyframe_topics.discard(topic)
+			return self.encoders[topic].encode(msg, keyframe)
+		if isinstance(msg, PlayerState):
+			msg = msg.to_message()
+		return json.dumps({'topic':topic, 'message':msg} if wrapped else msg)
+
+
+	def send(self, topic, msg):
+		"""
+			queues msg (a PlayerState, or anything json-able) for every
+			client with topic and writes what it can; returns the number of
+			clients it was queued for
+		"""
+		clients = [client for client in self.clients if topic in client.topics]
+		if len(clients) == 0:
+			metrics.increment('broadcaster.no_subscribers')
+			return 0
+		with metrics.timer('broadcaster.send'):
+			encoded = {}
+			for client in clients:
+				key = (client.encoding, client.encoding == 'json' and len(client.topics) > 1)
+				if not key in encoded:
+					encoded[key] = self.encode(topic, msg, *key)
+				keyframe = client.encoding == 'compact' and isinstance(msg, PlayerState) and is_keyframe(encoded[key])
+				queued = client.queue(encoded[key], topic, keyframe)
+
+				#=====[ a compact client that dropped a delta gets a keyframe next, in case it had none queued	]=====
+				if not queued and client.encoding == 'compact' and not keyframe and not client.closed:
+					self.keyframe_topics.add(topic)
+				client.flush()
+				self.num_bytes += len(encoded[key])
+			self.remove_closed()
+		return len(clients)
+
+
+	def poll(self, timeout=0):
+		"""
+			waits up to timeout for any socket to be ready, then accepts
+			clients, reads their requests and writes to the writable ones
+		"""
+		writers = [client for client in self.clients if client.wants_write()]
+		readable, writable, _ = select.select([self.s_computer] + self.clients, writers, [], timeout)
+		for ready in readable:
+			if ready is self.s_computer:
+				self.accept()
+			else:
+				for request in ready.read():
+					self.subscribe(ready, request)
+		for client in writable:
+			client.flush()
+		self.remove_closed()
+
+
+	def close(self):
+		"""
+			closes all sockets
+		"""
+		for client in self.clients:
+			client.close()
+		self.clients = []
+		self.s_computer.close()
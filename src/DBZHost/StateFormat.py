@@ -0,0 +1,242 @@
+#-------------------------------------------------- #
+# Module: StateFormat
+# -------------------
+# player states, and the compact, length-framed
+# binary encoding they can be sent to clients in
+#-------------------------------------------------- #
+import json
+import struct
+import numpy as np
+from Skeleton import JOINT_NAMES, COORD_NAMES, NUM_JOINTS
+
+#=====[ every message: u32 length of what follows, then a u8 kind	]=====
+LENGTH = struct.Struct('<I')
+KEYFRAME, DELTA, JSON = 1, 2, 3
+
+#=====[ keyframe/delta: kind, flags, player, (pad), seq, seq of the keyframe the positions are relative to	]=====
+STATE_HEADER = struct.Struct('<BBBxII')
+HAS_DIRECTION = 1
+HAS_OPPONENT_COORDS = 2		# otherwise the opponent coords are the player's own
+
+#=====[ positions are fixed point: multiples of QUANTUM phone units (int16 in keyframes, int8 from the keyframe in deltas)	]=====
+QUANTUM = 1. / 512
+KEYFRAME_INTERVAL = 30
+
+
+class PlayerState(object):
+	"""
+		Class: PlayerState
+		==================
+		what Player.send_state sends: a player's joint positions (and its
+		opponent's) as (NUM_JOINTS, 3) float32 arrays, already scaled and
+		zeroed at the lower foot as for the phone; direction is an (x, y, z)
+		array or None.
+
+		to_message() gives the json message clients have always gotten;
+		StateEncoder the compact binary one.
+	"""
+	__slots__ = ('player', 'seq', 'positions', 'gesture', 'direction', 'opponent_positions', 'opponent_gesture')
+
+
+	def __init__(self, player, seq, positions, gesture, direction=None, opponent_positions=None, opponent_gesture='no_gesture'):
+		self.player = player
+		self.seq = seq
+		self.positions = positions
+		self.gesture = gesture
+		self.direction = direction
+		self.opponent_positions = positions if opponent_positions is None else opponent_positions
+		self.opponent_gesture = opponent_gesture
+
+
+	def to_message(self):
+		"""
+			returns the state as a json-able dict:
+				self_coords, self_gesture, [self_direction,] opponent_coords, opponent_gesture
+		"""
+		message = {}
+		message['self_coords'] = coords_to_dict(self.positions)
+		message['self_gesture'] = self.gesture
+		if not self.direction is None:
+			message['self_direction'] = dict(zip(COORD_NAMES, self.direction.tolist()))
+		message['opponent_coords'] = coords_to_dict(self.opponent_positions)
+		message['opponent_gesture'] = self.opponent_gesture
+		return message
+
+
+def coords_to_dict(positions):
+	return {name:dict(zip(COORD_NAMES, p)) for name, p in zip(JOINT_NAMES, positions.tolist())}
+
+
+
+################################################################################
+####################[ ENCODING ]################################################
+################################################################################
+
+def quantize(positions, dtype=np.int16):
+	info = np.iinfo(dtype)
+	return np.clip(np.round(np.asarray(positions) / QUANTUM), info.min, info.max).astype(dtype)
+
+
+def pack_string(s):
+	s = s.encode('utf-8')
+	return struct.pack('<B', len(s)) + s
+
+
+def frame(kind, payload):
+	"""
+		returns payload as a message of the given kind: length, kind, payload
+		(all messages are framed like this, so clients can split the stream)
+	"""
+	return LENGTH.pack(len(payload) + 1) + struct.pack('<B', kind) + payload
+
+
+def is_keyframe(message):
+	return struct.unpack_from('<B', message, LENGTH.size)[0] == KEYFRAME
+
+
+def encode_json(message):
+	"""
+		returns a json-able message as a length-framed JSON message
+	"""
+	return frame(JSON, json.dumps(message))
+
+
+class StateEncoder(object):
+	"""
+		Class: StateEncoder
+		===================
+		encodes one stream of PlayerStates (e.g. one player's) compactly:
+		a keyframe holds the positions as int16 fixed point, the deltas
+		after it only their int8 differences from it (not from the previous
+		message, so clients that drop deltas lose nothing). A new keyframe
+		goes out every keyframe_interval messages, when a difference no
+		longer fits in int8, or when asked for (e.g. for a new client).
+
+		Ideal Operation:
+		----------------
+
+			encoder = StateEncoder()
+			data = encoder.encode(state)
+			StateDecoder().decode(data)	# -> state (positions quantized)
+	"""
+
+	def __init__(self, keyframe_interval=KEYFRAME_INTERVAL):
+		self.keyframe_interval = keyframe_interval
+		self.key = None						# (seq, quantized positions, quantized opponent positions or None)
+		self.since_key = 0
+
+
+	def encode(self, state, keyframe=False):
+		"""
+			returns state as a length-framed keyframe or delta message
+		"""
+		flags = 0
+		q_positions = quantize(state.positions)
+		q_opponent = None
+		if not state.opponent_positions is state.positions:
+			flags |= HAS_OPPONENT_COORDS
+			q_opponent = quantize(state.opponent_positions)
+
+		#=====[ Step 1: delta from the last keyframe, if it fits	]=====
+		deltas = None
+		if not keyframe and not self.key is None and self.since_key < self.keyframe_interval and (q_opponent is None) == (self.key[2] is None):
+			diffs = [q_positions.astype(np.int32) - self.key[1]] + ([] if q_opponent is None else [q_opponent.astype(np.int32) - self.key[2]])
+			if all(np.abs(d).max() <= 127 for d in diffs):
+				deltas = [d.astype(np.int8) for d in diffs]
+		if deltas is None:
+			self.key, self.since_key = (state.seq, q_positions, q_opponent), 0
+		self.since_key += 1
+
+		#=====[ Step 2: pack	]=====
+		if not state.direction is None:
+			flags |= HAS_DIRECTION
+		kind = KEYFRAME if deltas is None else DELTA
+		parts = [STATE_HEADER.pack(kind, flags, state.player, state.seq, self.key[0])[1:]]
+		parts += [pack_string(state.gesture), pack_string(state.opponent_gesture)]
+		if not state.direction is None:
+			parts.append(quantize(state.direction).tostring())
+		parts += [a.tostring() for a in ([q_positions] + ([] if q_opponent is None else [q_opponent]) if deltas is None else deltas)]
+		return frame(kind, ''.join(parts))
+
+
+
+################################################################################
+####################[ DECODING ]################################################
+################################################################################
+
+def split_messages(buf):
+	"""
+		given a buffer of received bytes, returns (list of complete
+		messages, the bytes left over)
+	"""
+	messages, offset = [], 0
+	while offset + LENGTH.size <= len(buf):
+		length, = LENGTH.unpack_from(buf, offset)
+		if offset + LENGTH.size + length > len(buf):
+			break
+		messages.append(buf[offset:offset + LENGTH.size + length])
+		offset += LENGTH.size + length
+	return messages, buf[offset:]
+
+
+def unpack_string(buf, offset):
+	length, = struct.unpack_from('<B', buf, offset)
+	return buf[offset + 1:offset + 1 + length].decode('utf-8'), offset + 1 + length
+
+
+class StateDecoder(object):
+	"""
+		Class: StateDecoder
+		===================
+		decodes the messages of a stream (see StateEncoder): PlayerStates
+		from keyframes/deltas, dicts from JSON messages. A delta whose
+		keyframe was never seen decodes to None.
+	"""
+
+	def __init__(self):
+		self.keys = {}		# player -> (seq, quantized positions, quantized opponent positions or None)
+
+
+	def read_positions(self, buf, offset, dtype):
+		count = NUM_JOINTS * 3
+		positions = np.frombuffer(buf, dtype=dtype, count=count, offset=offset).reshape(NUM_JOINTS, 3)
+		return positions, offset + count * positions.itemsize
+
+
+	def decode(self, message):
+		"""
+			given one length-framed message, returns what it holds
+		"""
+		kind, = struct.unpack_from('<B', message, LENGTH.size)
+		if kind == JSON:
+			return json.loads(message[LENGTH.size + 1:])
+		if not kind in (KEYFRAME, DELTA):
+			raise ValueError("Unknown message kind: %d" % kind)
+
+		#=====[ Step 1: header and gestures	]=====
+		_, flags, player, seq, key_seq = STATE_HEADER.unpack_from(message, LENGTH.size)
+		gesture, offset = unpack_string(message, LENGTH.size + STATE_HEADER.size)
+		opponent_gesture, offset = unpack_string(message, offset)
+		direction = None
+		if flags & HAS_DIRECTION:
+			direction = np.frombuffer(message, dtype=np.int16, count=3, offset=offset) * np.float32(QUANTUM)
+			offset += 6
+
+		#=====[ Step 2: positions, relative to the keyframe for deltas	]=====
+		dtype = np.int16 if kind == KEYFRAME else np.int8
+		q_positions, offset = self.read_positions(message, offset, dtype)
+		q_opponent = None
+		if flags & HAS_OPPONENT_COORDS:
+			q_opponent, offset = self.read_positions(message, offset, dtype)
+		if kind == KEYFRAME:
+			self.keys[player] = (seq, q_positions, q_opponent)
+		else:
+			key = self.keys.get(player)
+			if key is None or key[0] != key_seq:
+				return None
+			q_positions = key[1] + q_positions.astype(np.int16)
+			q_opponent = None if q_opponent is None else key[2] + q_opponent.astype(np.int16)
+
+		positions = q_positions * np.float32(QUANTUM)
+		opponent_positions = positions if q_opponent is None else q_opponent * np.float32(QUANTUM)
+		return PlayerState(player, seq, positions, gesture, direction, opponent_positions, opponent_gesture)
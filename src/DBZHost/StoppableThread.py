@@ -3,8 +3,11 @@
 # ----------------------
 # abstract class for threads that can be 'stopped'
 #-------------------------------------------------- #
+import logging
 import threading
 
+logger = logging.getLogger(__name__)
+
 class StoppableThread (threading.Thread):
 
 	def __init__ (self, _name="<UNKNOWN_THREAD>"):
@@ -23,7 +26,7 @@ class StoppableThread (threading.Thread):
 		"""
 		while not self._stop.isSet ():
 			self.thread_iteration ()
-		print "stoppablethread.run()"
+		logger.debug ("%s stopped", self._name)
 
 
 	def stop (self):
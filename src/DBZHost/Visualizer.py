@@ -3,13 +3,7 @@
 # -----------------
 # class for creating visualizations of body poses
 #-------------------------------------------------- #
-#==========[ Matplotlib tools	]==========
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-from mpl_toolkits.mplot3d import Axes3D
-import matplotlib.animation as animation
-from matplotlib.widgets import Slider, Button, RadioButtons
 
 
 class Visualizer:
@@ -20,7 +14,7 @@ class Visualizer:
 
 		Ideal Operation:
 		----------------
-		visualizer.visualize(pose_df)
+		visualizer.visualize(skeleton)
 
 	"""
 
@@ -64,10 +58,15 @@ class Visualizer:
 		return self.ax.plot (xs, ys, zs, color='#780000', linewidth=4, marker='o', markersize=12)
 
 
-	def visualize(self, pose_df):
+	def visualize(self, pose):
 		"""
-			draws the pose on the figure 
+			draws the pose (a Skeleton or a pose DataFrame) on the figure 
 		"""
+		#==========[ Matplotlib tools: only loaded once something is drawn	]==========
+		import matplotlib.pyplot as plt
+		from mpl_toolkits.mplot3d import Axes3D
+		pose_df = pose.to_df() if hasattr(pose, 'to_df') else pose
+
 		#=====[ Create figure/axes	]=====
 		self.fig 			= plt.figure (figsize=plt.figaspect(1)*1.5)
 		self.ax 			= Axes3D (self.fig, axisbg='#B0B0B0')
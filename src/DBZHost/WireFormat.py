@@ -0,0 +1,58 @@
+#-------------------------------------------------- #
+# Module: WireFormat
+# ------------------
+# packed binary skeleton frames, as sent by 
+# primesense_receiver --binary (see PortInterface.h)
+#-------------------------------------------------- #
+import struct
+import numpy as np
+from Skeleton import Skeleton, NUM_JOINTS
+
+MAGIC = 'DBZF'
+VERSION = 1
+
+#=====[ header: magic, version, num_skeletons, num_joints, reserved, frame_index	]=====
+HEADER = struct.Struct('<4sHHHHI')
+
+#=====[ one fixed-size record per skeleton; joints in Skeleton.JOINT_NAMES order	]=====
+SKELETON_DTYPE = np.dtype([
+							('skeleton_index', '<u4'),
+							('positions', '<f4', (NUM_JOINTS, 3)),
+							('orientations', '<f4', (NUM_JOINTS, 4)),
+							('confidences', '<f4', (NUM_JOINTS,))
+						])
+
+
+def decode_frame(buf, offset=0):
+	"""
+		given a buffer holding a binary frame starting at offset, returns
+		(frame_index, {skeleton_name:Skeleton}); the Skeletons' arrays are 
+		views onto buf, nothing is copied
+	"""
+	data = np.asarray(memoryview(buf)).view(np.uint8)
+	magic, version, num_skeletons, num_joints, _, frame_index = HEADER.unpack_from(data, offset)
+	if magic != MAGIC or version != VERSION or num_joints != NUM_JOINTS:
+		raise ValueError("Not a v%d binary frame: %r (version %d, %d joints)" % (VERSION, magic, version, num_joints))
+
+	start = offset + HEADER.size
+	records = data[start:start + num_skeletons*SKELETON_DTYPE.itemsize].view(SKELETON_DTYPE)
+	positions, orientations, confidences = records['positions'], records['orientations'], records['confidences']
+	frame = {}
+	for ix, skeleton_index in enumerate(records['skeleton_index']):
+		name = 'skeleton_%d' % skeleton_index
+		frame[name] = Skeleton(positions[ix], orientations[ix], name, confidences[ix])
+	return frame_index, frame
+
+
+def encode_frame(skeletons, frame_index=0):
+	"""
+		given a list of Skeletons, returns the binary frame primesense_receiver
+		would have sent for them (without the topic prefix)
+	"""
+	records = np.zeros(len(skeletons), dtype=SKELETON_DTYPE)
+	for ix, skeleton in enumerate(skeletons):
+		records[ix]['skeleton_index'] = ix
+		records[ix]['positions'] = skeleton.positions
+		records[ix]['orientations'] = np.nan if skeleton.orientations is None else skeleton.orientations
+		records[ix]['confidences'] = 1. if skeleton.confidences is None else skeleton.confidences
+	return HEADER.pack(MAGIC, VERSION, len(skeletons), NUM_JOINTS, 0, frame_index) + records.tostring()
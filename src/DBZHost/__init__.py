@@ -1,5 +1,9 @@
-__all__ = ['DBZController', 'GestureClassifier', 'Player', 'Visualizer']
+__all__ = ['DBZController', 'GestureClassifier', 'Player', 'Skeleton', 'Visualizer']
+import logging
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
 from DBZController import DBZController
 from GestureClassifier import GestureClassifier
 from Player import Player
+from Skeleton import Skeleton
 from Visualizer import Visualizer
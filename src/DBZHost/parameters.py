@@ -4,6 +4,11 @@ connect_parameters = {
 }
 device_filters = { 
 					'primesense':'__primesense__',
+					'primesense_binary':'__primesense_bin__',
 					'leap':'__leap__',
 					'eyetribe':'__eyetribe__'
+}
+wire_formats = {
+					'__primesense__':'json',
+					'__primesense_bin__':'binary'
 }
\ No newline at end of file